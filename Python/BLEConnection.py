@@ -1,87 +1,168 @@
 import argparse
 import asyncio
+import struct
 import time
 
-from bleak import BleakClient, BleakScanner
-
-address = "D4:8A:FC:C9:CA:EA"
-
-name = "ESP32"
-characteristics = {"1": "e2f5435e-634f-44d3-9c7f-54bfe8c96e64", "2":  "0eb71bcb-eb31-4f19-88b9-116a4e52a2c4", "3":  "801b2ee2-e7b6-4aa8-ae2d-4e82b426d157" }
-duration = "50000"
- 
-class DeviceNotFoundError(Exception):
-    pass
-
-async def run_ble_client(queues: dict):
-    """Scans for the BLE device and starts notification for multiple characteristics."""
-    print("Starting scan...")
-
-#   //  if address:
-#         device = await BleakScanner.find_device_by_address(address)
-#         if device is None:
-#             print("Could not find device with address '%s'", address)
-#             raise DeviceNotFoundError
-    if name:
-        device = await BleakScanner.find_device_by_name(name)
-        if device is None:
-            print("Could not find device with name '%s'", name)
-            raise DeviceNotFoundError
-
+from packets import PACKED_CHARACTERISTIC_UUID, PacketDecoder, PacketError
+from alignment import FrameAligner
+from discovery import AXIS_CHARACTERISTICS, COUNTER_CHARACTERISTIC_UUID, DEVICE_NAME, DeviceNotFoundError, connected
+from recorder import Recorder
+from ring_buffer import RingBuffer, capacity_for
+from session_format import DEFAULT_SAMPLE_RATE
+from strokes import StrokeDetector, load_strokes
+
+address = None  # set to skip the address cache, e.g. "D4:8A:FC:C9:CA:EA"
+
+name = DEVICE_NAME
+characteristics = AXIS_CHARACTERISTICS
+counter_characteristic = COUNTER_CHARACTERISTIC_UUID
+duration = 50000
+stall_timeout = 0.2  # seconds without frames before incomplete ones are flushed
+buffer_hours = 3.0  # live sample buffer is sized for a full practice
+
+async def run_ble_client(ring: RingBuffer, data_ready: asyncio.Event, aligner=None, decoder=None,
+                         device_address=None):
+    """Scans for the BLE device and starts notification for multiple characteristics.
+
+    Per-axis notifications are fed straight into the FrameAligner, whose
+    finished frames are written to the ring buffer. With a PacketDecoder the
+    client uses packed mode instead: a single characteristic carries batches
+    of samples (see packets.py) that go to the ring buffer as a block.
+    data_ready is set after every write; the ring is closed when the client stops.
+    """
     print("Connecting to device...")
 
-    async with BleakClient(device) as client:
+    # Known address first, then a scan that stops at the first unit advertising our service
+    async with connected(name, device_address or address) as client:
         print("Connected!")
 
-        async def callback_handler(characteristic, data):
-            """Handles incoming BLE notifications."""
+        def counter_handler(characteristic, data):
+            """Handles the firmware's uint32 reading counter."""
+            aligner.push_counter(struct.unpack_from("<I", data)[0], time.time())
+
+        def axis_handler(axis):
+            def handler(characteristic, data):
+                """Handles one axis' float32 value."""
+                aligner.push_value(axis, struct.unpack_from("<f", data)[0], time.time())
+            return handler
+
+        def packed_handler(characteristic, data):
+            """Decodes a packed notification in place; no per-sample Python objects."""
             timestamp = time.time()
-            print(f"[{characteristic}] Received: {data}")  # Log to console
-            await queues[characteristic].put((timestamp, data))  # Store in queue
+            try:
+                decoder.feed(data, timestamp)
+            except PacketError as e:
+                print(f"[{characteristic.uuid}] Bad packet: {e}")
+                return
+            seq, host_time, values = decoder.drain()
+            ring.write_many(host_time, seq, values)
+            data_ready.set()
+
+        if decoder is not None:
+            handlers = {PACKED_CHARACTERISTIC_UUID: packed_handler}
+        else:
+            handlers = {uuid: axis_handler(axis) for axis, uuid in characteristics.items()}
+            if aligner.use_counter:
+                handlers[counter_characteristic] = counter_handler
 
         # Start notification for each characteristic
-        tasks = []
-        for characteristic in characteristics:
-            queues[characteristic] = asyncio.Queue()
-            await client.start_notify(characteristic, lambda c, d: callback_handler(c, d))
+        for characteristic, handler in handlers.items():
+            await client.start_notify(characteristic, handler)
             print(f"Started notifications for {characteristic}")
         
         await asyncio.sleep(duration)  # Keep connection open for set time
 
         # Stop notifications
-        for characteristic in characteristics:
+        for characteristic in handlers:
             await client.stop_notify(characteristic)
-            await queues[characteristic].put((time.time(), None))  # Exit signal
+        if aligner is not None:
+            aligner.flush(everything=True)
+        ring.close()  # Exit signal
+        data_ready.set()
         
         print("Disconnected from BLE device.")
 
-async def run_queue_consumer(queues: dict):
-    """Consumes data from multiple BLE characteristic queues and logs it in real-time."""
+async def run_queue_consumer(ring: RingBuffer, data_ready: asyncio.Event, aligner=None, detector=None):
+    """Reads new samples from the ring buffer as soon as they are written.
+
+    With a StrokeDetector, every block read is also run through it.
+    """
     print("Starting queue consumer...")
+    reader = ring.reader("console")
 
     while True:
-        for characteristic, queue in queues.items():
-            try:
-                epoch, data = await asyncio.wait_for(queue.get(), timeout=0.1)
-                if data is None:
-                    print(f"[{characteristic}] Stopping consumer...")
-                    return
-                else:
-                    print(f"[{characteristic}] Processed data at {epoch}: {data}")
-            except asyncio.TimeoutError:
-                continue  # No data, continue checking other queues
-
-async def main():
-    queues = {}  # Dictionary to hold queues per characteristic
-    client_task = run_ble_client(queues)
-    consumer_task = run_queue_consumer(queues)
+        try:
+            await asyncio.wait_for(data_ready.wait(), timeout=stall_timeout)
+        except asyncio.TimeoutError:
+            # Stream went quiet: release frames that can no longer complete
+            if aligner is not None:
+                aligner.flush()
+            continue
+        data_ready.clear()
+
+        while reader.available:
+            host_time, seq, values = reader.read()
+            if len(seq) > 1:
+                print(f"{len(seq)} samples up to #{seq[-1]} at {host_time[-1]}: {values[-1]}")
+            elif len(seq):
+                print(f"[{seq[0]}] Frame at {host_time[0]}: {values[0]}")
+            if detector is not None:
+                for stroke in detector.push_many(host_time, values):
+                    print(f"Stroke {len(detector.strokes)}: {stroke.finish - stroke.start:.2f} s, "
+                          f"peak {stroke.peak_speed:.0f} deg/s")
+
+        if ring.closed:
+            print("Stopping consumer...")
+            print(ring.status())
+            if aligner is not None:
+                print(aligner.status())
+            if detector is not None:
+                detector.flush()
+                print(detector.status())
+            return
+
+async def main(packed=False, channels=3, use_counter=True, hours=buffer_hours, rate=DEFAULT_SAMPLE_RATE,
+               device_address=None, record=None, strokes=False):
+    ring = RingBuffer(capacity_for(hours, rate), channels)
+    # Frames go to disk from the recorder's own thread, never from the notification handlers
+    recorder = Recorder(record, ring, rate).start() if record else None
+    data_ready = asyncio.Event()
+
+    def on_frame(frame):
+        ring.write(frame.time, frame.counter, frame.values)
+        data_ready.set()
+
+    decoder = PacketDecoder(channels) if packed else None
+    aligner = None if packed else FrameAligner(list(characteristics), on_frame=on_frame,
+                                               use_counter=use_counter, sample_rate=rate)
+    client_task = run_ble_client(ring, data_ready, aligner, decoder, device_address)
+    detector = StrokeDetector() if strokes else None
+    consumer_task = run_queue_consumer(ring, data_ready, aligner, detector)
 
     try:
         await asyncio.gather(client_task, consumer_task)
     except DeviceNotFoundError:
         pass
+    finally:
+        if recorder is not None:
+            recorder.close()
+            print(recorder.status())
+            if strokes:
+                # Index the whole log, including anything recorded to it before this run
+                print(f"Indexed {len(load_strokes(record, rebuild=True))} strokes in {record}")
 
     print("Main process done.")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Stream sensor notifications from the ESP32.")
+    parser.add_argument("--packed", action="store_true", help="use the packed multi-sample characteristic")
+    parser.add_argument("--channels", type=int, default=3, help="channels per sample in packed mode")
+    parser.add_argument("--no-counter", action="store_true", help="align axes by arrival time instead of the counter")
+    parser.add_argument("--buffer-hours", type=float, default=buffer_hours, help="live buffer length in hours")
+    parser.add_argument("--rate", type=float, default=DEFAULT_SAMPLE_RATE, help="expected samples per second")
+    parser.add_argument("--address", help="connect to this address instead of the cached one")
+    parser.add_argument("--record", metavar="LOG", help="append every frame to this session log (.aplog)")
+    parser.add_argument("--strokes", action="store_true", help="report strokes as they finish (and index the log)")
+    args = parser.parse_args()
+    asyncio.run(main(args.packed, args.channels, not args.no_counter, args.buffer_hours, args.rate, args.address,
+                     args.record, args.strokes))
\ No newline at end of file
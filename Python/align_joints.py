@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from data_loader import load_session, offset_path
+from resample import resample_angles, clean_times
+from session_format import DEFAULT_JOINT_NAMES
+
+# Time alignment of separately recorded joint files.
+#
+# Each joint's sensor was started whenever someone hit record, so frame 0 is
+# a different moment in every file. A swing moves the whole arm at once, so
+# the joints' angular-speed signals line up when their recordings do. The lag
+# is the peak of their FFT cross-correlation, found coarse to fine: first on
+# block-averaged signals over the full lag range, then at each finer level
+# only around the previous estimate, ending with a sub-sample parabolic fit.
+#
+# Offsets are written next to each capture (<file>.align.json) and applied by
+# data_loader.load_session, so the viewers and analytics see aligned times.
+#
+#   python align_joints.py ../Data                 # every take in the folder
+#   python align_joints.py shoulder.csv elbow.csv  # one take; the first file is the reference
+
+JOINT_PREFIXES = {"s": "shoulder", "e": "elbow", "w": "wrist"}  # E_Colton_..., S_Colton_...
+DECIMATION = (16, 4, 1)  # coarse-to-fine block sizes
+MIN_COARSE_SAMPLES = 64  # skip levels that would leave fewer samples than this
+MIN_OVERLAP = 0.5        # fraction of the shorter signal two lagged signals must share
+MIN_SCORE = 0.3          # weaker correlation peaks are reported but not written
+CAPTURE_SUFFIXES = (".csv", ".txt", ".apms", ".aplog")
+
+
+# --- Capture names ---
+
+def parse_capture_name(path):
+    """(athlete, joint, take) from names like 'Bella elbow 1.csv', 'Halla_Wrist_Armside_1.csv'
+    or 'E_Colton_Calibration1_2_19.txt'. joint is None when the name has none."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    tokens = [t for t in re.split(r"[\s_]+", stem) if t]
+    joint = None
+    if len(tokens) > 1 and tokens[0].lower() in JOINT_PREFIXES:
+        joint = JOINT_PREFIXES[tokens.pop(0).lower()]
+    rest = []
+    for token in tokens:
+        m = re.fullmatch(r"(shoulder|elbow|wrist)(\d*)", token, re.IGNORECASE)
+        if m and joint is None:
+            joint = m.group(1).lower()
+            if m.group(2):
+                rest.append(m.group(2))
+        else:
+            rest.append(token)
+    athlete = rest.pop(0) if rest else ""
+    take = "_".join(t.lower() for t in rest) + ext.lower()
+    return athlete, joint, take
+
+
+def group_captures(paths):
+    """{(folder, athlete, take): {joint: path}} for takes recorded on more than one joint."""
+    groups = defaultdict(dict)
+    for path in sorted(paths):
+        athlete, joint, take = parse_capture_name(path)
+        if joint is not None:
+            groups[(os.path.dirname(path), athlete.lower(), take)].setdefault(joint, path)
+    return {key: joints for key, joints in groups.items() if len(joints) > 1}
+
+
+def find_captures(folder):
+    return [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+            if name.lower().endswith(CAPTURE_SUFFIXES)]
+
+
+# --- Signals ---
+
+def angular_speed(times, angles, rate):
+    """(grid start, standardized speed) on a uniform grid at rate, from (frames, channels) degrees."""
+    times, angles = clean_times(np.asarray(times, dtype=np.float64), np.asarray(angles, dtype=np.float64))
+    grid = times[0] + np.arange(int((times[-1] - times[0]) * rate) + 1) / rate
+    uniform = resample_angles(times, angles, grid)
+    step = np.diff(uniform, axis=0)
+    step -= 360.0 * np.round(step / 360.0)  # the short way round
+    speed = np.linalg.norm(step, axis=1) * rate
+    return grid[0], standardize(speed)
+
+
+def standardize(x):
+    std = x.std()
+    return (x - x.mean()) / std if std > 0 else x - x.mean()
+
+
+def decimate(x, factor):
+    """Block means of factor samples."""
+    n = len(x) // factor
+    return x[:n * factor].reshape(n, factor).mean(axis=1)
+
+
+# --- Cross-correlation ---
+
+def _overlap(lags, n_a, n_b):
+    """[lo, hi) of a shared with b shifted by each lag."""
+    return np.maximum(0, lags), np.minimum(n_a, lags + n_b)
+
+
+def _normalize(c, a, b, lags):
+    """Divide raw lagged products by the signals' energy over each overlap (-1..1)."""
+    lo, hi = _overlap(lags, len(a), len(b))
+    ea = np.concatenate([[0.0], np.cumsum(a * a)])
+    eb = np.concatenate([[0.0], np.cumsum(b * b)])
+    energy = (ea[hi] - ea[lo]) * (eb[hi - lags] - eb[lo - lags])
+    return np.where(energy > 0, c / np.sqrt(np.maximum(energy, 1e-300)), 0.0)
+
+
+def cross_correlation(a, b):
+    """(lags, normalized correlation) for every lag, with b[n] ~ a[n + lag] at the peak."""
+    size = 1 << (len(a) + len(b) - 2).bit_length()
+    c = np.fft.irfft(np.fft.rfft(a, size) * np.conj(np.fft.rfft(b, size)), size)
+    lags = np.arange(-(len(b) - 1), len(a))
+    c = np.concatenate([c[size - (len(b) - 1):], c[:len(a)]])
+    return lags, _normalize(c, a, b, lags)
+
+
+def local_correlation(a, b, lags):
+    """Normalized correlation at a few lags, without an FFT."""
+    lo, hi = _overlap(lags, len(a), len(b))
+    c = np.array([np.dot(a[l:h], b[l - lag:h - lag]) for l, h, lag in zip(lo, hi, lags)])
+    return _normalize(c, a, b, lags)
+
+
+def _allowed(lags, n_a, n_b, max_lag):
+    lo, hi = _overlap(lags, n_a, n_b)
+    overlap = hi - lo
+    return (np.abs(lags) <= max_lag) & (overlap >= MIN_OVERLAP * min(n_a, n_b))
+
+
+def _parabolic(c, i):
+    if 0 < i < len(c) - 1 and np.isfinite(c[i - 1]) and np.isfinite(c[i + 1]):
+        denom = c[i - 1] - 2 * c[i] + c[i + 1]
+        if denom < 0:
+            return 0.5 * (c[i - 1] - c[i + 1]) / denom
+    return 0.0
+
+
+def estimate_lag(a, b, max_lag=None, levels=DECIMATION):
+    """(lag in samples, peak correlation) of b against a, coarse to fine."""
+    if max_lag is None:
+        max_lag = min(len(a), len(b))
+    levels = [f for f in levels if min(len(a), len(b)) // f >= MIN_COARSE_SAMPLES] or [1]
+    if levels[-1] != 1:
+        levels.append(1)
+
+    factor = levels[0]
+    ca, cb = decimate(a, factor), decimate(b, factor)
+    lags, c = cross_correlation(ca, cb)
+    c = np.where(_allowed(lags, len(ca), len(cb), max_lag / factor), c, -np.inf)
+    lag = lags[np.argmax(c)] * factor
+
+    for finer in levels[1:]:
+        fa, fb = decimate(a, finer), decimate(b, finer)
+        radius = 2 * factor // finer
+        lags = np.arange(lag // finer - radius, lag // finer + radius + 1)
+        c = local_correlation(fa, fb, lags)
+        c = np.where(_allowed(lags, len(fa), len(fb), max_lag / finer), c, -np.inf)
+        lag = lags[np.argmax(c)] * finer
+        factor = finer
+
+    best = int(np.argmax(c))
+    return lag + _parabolic(c, best), float(c[best])
+
+
+def estimate_offset(reference, other, rate, max_lag=None):
+    """(seconds to add to other's times to line it up with reference, correlation score).
+
+    reference, other: Sessions (the first joint of each is used).
+    """
+    t_ref, a = angular_speed(reference.times(), reference.angles[:, 0], rate)
+    t_other, b = angular_speed(other.times(), other.angles[:, 0], rate)
+    lag, score = estimate_lag(a, b, None if max_lag is None else max_lag * rate)
+    return t_ref - t_other + lag / rate, score
+
+
+def fastest_rate(sessions):
+    steps = [np.median(np.diff(s.times())) for s in sessions if len(s) > 1]
+    return 1.0 / min(steps)
+
+
+def align_take(joints, rate=None, max_lag=None, ordered=False):
+    """({joint: (path, offset, score)}, rate used) for one take; the reference joint gets offset 0.
+
+    joints: {joint: path}. The reference is the first of the usual joint order
+    (shoulder, elbow, wrist) that was recorded, or the first entry if ordered.
+    """
+    order = list(joints)
+    if not ordered:
+        order.sort(key=lambda j: DEFAULT_JOINT_NAMES.index(j) if j in DEFAULT_JOINT_NAMES else len(DEFAULT_JOINT_NAMES))
+    sessions = {j: load_session(joints[j], aligned=False) for j in order}
+    rate = rate or fastest_rate(sessions.values())
+    reference = order[0]
+    result = {reference: (joints[reference], 0.0, 1.0)}
+    for joint in order[1:]:
+        offset, score = estimate_offset(sessions[reference], sessions[joint], rate, max_lag)
+        result[joint] = (joints[joint], offset, score)
+    return result, rate
+
+
+def write_offsets(result, reference_path, rate, min_score=MIN_SCORE):
+    """Write a sidecar for every joint whose alignment scored at least min_score.
+
+    A weaker joint's sidecar from an earlier run is removed, so load_session
+    stops applying an offset this run rejected.
+    """
+    for joint, (path, offset, score) in result.items():
+        if score < min_score:
+            if os.path.exists(offset_path(path)):
+                os.remove(offset_path(path))
+            continue
+        with open(offset_path(path), "w") as f:
+            json.dump({"offset": offset, "score": score, "joint": joint,
+                       "reference": os.path.basename(reference_path), "rate": rate}, f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate and store the time offsets between joint recordings.")
+    parser.add_argument("inputs", nargs="+", help="an athlete folder, or the files of one take (reference first)")
+    parser.add_argument("--rate", type=float, help="correlation sample rate in Hz (default: the fastest file)")
+    parser.add_argument("--max-lag", type=float, help="largest offset to consider, in seconds")
+    parser.add_argument("--min-score", type=float, default=MIN_SCORE,
+                        help="only write offsets whose correlation peak reaches this (default %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="print the offsets without writing them")
+    args = parser.parse_args()
+
+    ordered = not all(os.path.isdir(p) for p in args.inputs)
+    if ordered:
+        # One explicit take, in the given order: the first file is the reference
+        joints = {}
+        for i, path in enumerate(args.inputs):
+            joint = parse_capture_name(path)[1]
+            joints[joint if joint and joint not in joints else f"joint{i}"] = path
+        takes = {("", "", "files"): joints}
+    else:
+        takes = {}
+        for folder in args.inputs:
+            takes.update(group_captures(find_captures(folder)))
+
+    if not takes:
+        print("No takes with more than one joint found.")
+        return
+
+    start = time.perf_counter()
+    for (_, athlete, take), joints in sorted(takes.items()):
+        result, rate = align_take(joints, args.rate, args.max_lag, ordered)
+        reference_path = next(iter(result.values()))[0]
+        print(f"{athlete or 'take'} {take}:")
+        for joint, (path, offset, score) in result.items():
+            weak = "  (weak, not written; any earlier offset removed)" if score < args.min_score else ""
+            print(f"  {joint:<9} {offset:+8.3f} s  score {score:5.2f}  {os.path.basename(path)}{weak}")
+        if not args.dry_run:
+            write_offsets(result, reference_path, rate, args.min_score)
+    print(f"{len(takes)} take(s) in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
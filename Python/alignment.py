@@ -0,0 +1,177 @@
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from session_format import DEFAULT_SAMPLE_RATE
+
+# Joins the per-axis characteristic streams of one sensor into frames.
+#
+# The firmware notifies its `value` counter and then x, y and z as four
+# separate notifications per reading. The aligner is fed from the
+# notification handlers themselves (no polling): a counter opens a frame and
+# each axis value goes to the frame of the newest counter seen. Values never
+# open frames of their own. Each axis arrives in order, so a value that finds
+# its slot taken is either the next value after a reordered one (the previous
+# reading's value came after this counter: it moves back into the previous
+# frame's gap) or a value whose own counter is delayed behind it (it is held
+# for half a sample period until that counter arrives, and dropped as late
+# if it does not). Frames are released in counter order as soon as they are
+# complete. Frames that stay incomplete for longer than `window`
+# (WINDOW_PERIODS sample periods), or that fall out of the bounded reorder
+# buffer, are released with NaN for the missing axes.
+#
+# Without a counter characteristic, frames are formed from arrival windows: a
+# value starts a new frame when the newest one already has that axis or was
+# opened more than half a sample period ago.
+
+DEFAULT_CHANNELS = ("x", "y", "z")
+WINDOW_PERIODS = 3.0  # a reordered value can arrive up to two readings late
+DEFAULT_MAX_PENDING = 8
+
+Frame = namedtuple("Frame", ["counter", "time", "values", "complete"])
+
+
+class _Pending:
+    __slots__ = ("counter", "time", "values", "missing")
+
+    def __init__(self, counter, t, n_channels):
+        self.counter = counter
+        self.time = t
+        self.values = np.full(n_channels, np.nan)
+        self.missing = n_channels
+
+
+class FrameAligner:
+    """Merges counter and per-channel notifications into complete frames.
+
+    on_frame is called with every released Frame(counter, time, values,
+    complete); time is the host arrival time of the frame's first
+    notification. use_counter=False selects arrival-window alignment.
+    sample_rate is the sensor's reading rate; window defaults to
+    WINDOW_PERIODS of its periods.
+    """
+
+    def __init__(self, channels=DEFAULT_CHANNELS, on_frame=None, use_counter=True,
+                 sample_rate=DEFAULT_SAMPLE_RATE, window=None, max_pending=DEFAULT_MAX_PENDING,
+                 clock=time.time):
+        self.channels = list(channels)
+        self._index = {c: i for i, c in enumerate(self.channels)}
+        self.on_frame = on_frame if on_frame is not None else (lambda frame: None)
+        self.use_counter = use_counter
+        self.period = 1.0 / sample_rate
+        self.window = WINDOW_PERIODS * self.period if window is None else window
+        self.max_pending = max_pending
+        self.clock = clock
+
+        self._pending = OrderedDict()  # counter -> _Pending, oldest first
+        self._latest = None             # newest counter seen
+        self._held = {}                 # channel -> (value, time) waiting for a delayed counter
+        self._last_released = None
+        self._next_key = 0
+
+        self.complete = 0
+        self.incomplete = 0
+        self.late = 0       # notifications that arrived after their frame was released or filled
+
+    # --- Input ---
+
+    def push_counter(self, counter, t=None):
+        """A counter notification: opens frame `counter`."""
+        t = self.clock() if t is None else t
+        if self._latest is not None and counter <= self._latest:
+            self.late += 1  # delivered after a newer counter (or a repeat)
+        else:
+            self._latest = counter
+            frame = self._open(counter, t)
+            if self._held:
+                self._take_held(frame, t)
+        self._release(t)
+
+    def push_value(self, channel, value, t=None):
+        """One channel's value: fills the frame of the newest counter."""
+        t = self.clock() if t is None else t
+        c = self._index[channel]
+        if self.use_counter:
+            self._place(c, value, t)
+        else:
+            frame = self._window_target(c, t)
+            frame.values[c] = value
+            frame.missing -= 1
+        self._release(t)
+
+    def flush(self, t=None, everything=False):
+        """Release expired frames (or all of them); call when the stream goes quiet."""
+        t = self.clock() if t is None else t
+        self._release(t, everything)
+
+    # --- Internals ---
+
+    def _open(self, counter, t):
+        frame = _Pending(counter, t, len(self.channels))
+        self._pending[counter] = frame
+        self._next_key = max(self._next_key, counter + 1)
+        return frame
+
+    def _place(self, c, value, t):
+        frame = self._pending.get(self._latest)
+        if frame is not None and c > 0 and len(self._pending) > 1 and np.isnan(frame.values[:c]).all():
+            # None of the axes sent before this one has arrived for the newest
+            # reading yet: this is the previous reading's value, delivered
+            # after the newest counter
+            previous = self._pending[list(self._pending)[-2]]
+            if np.isnan(previous.values[c]):
+                previous.values[c] = value
+                previous.missing -= 1
+                return
+        if frame is not None and np.isnan(frame.values[c]) and not any(h < c for h in self._held):
+            frame.values[c] = value
+            frame.missing -= 1
+            return
+        # Slot taken (or no open frame, or an axis sent before this one is
+        # already waiting): this value belongs to the next reading, whose
+        # counter is delayed or lost. Hold it until that counter comes.
+        if c in self._held:
+            self.late += 1
+        self._held[c] = (value, t)
+
+    def _take_held(self, frame, t):
+        for c, (value, held_at) in self._held.items():
+            if t - held_at <= self.period / 2 and np.isnan(frame.values[c]):
+                frame.values[c] = value
+                frame.missing -= 1
+            else:
+                self.late += 1  # its counter was lost
+        self._held.clear()
+
+    def _window_target(self, c, t):
+        newest = self._pending[next(reversed(self._pending))] if self._pending else None
+        if newest is not None and np.isnan(newest.values[c]) and t - newest.time <= self.period / 2:
+            return newest
+        # The start of a new reading
+        key = self._next_key
+        if self._last_released is not None:
+            key = max(key, self._last_released + 1)
+        return self._open(key, t)
+
+    def _release(self, t, everything=False):
+        while self._pending:
+            counter, frame = next(iter(self._pending.items()))
+            expired = t - frame.time > self.window or len(self._pending) > self.max_pending
+            if frame.missing and not (expired or everything):
+                break
+            del self._pending[counter]
+            self._last_released = counter
+            if frame.missing:
+                self.incomplete += 1
+            else:
+                self.complete += 1
+            self.on_frame(Frame(counter, frame.time, frame.values, not frame.missing))
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def status(self):
+        return (f"complete {self.complete}  incomplete {self.incomplete}  late {self.late}  "
+                f"pending {self.pending}")
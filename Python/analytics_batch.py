@@ -0,0 +1,229 @@
+import argparse
+import csv
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import data_loader
+from align_joints import find_captures, parse_capture_name
+from data_loader import load_session
+from resample import clean_times
+from strokes import detect
+
+# Per-session metrics for every capture in Data/, computed in parallel.
+#
+# Captures are found by their names (athlete, joint, side and take, as in
+# Halla_Shoulder_Armside_1.csv) and each one gets range of motion per
+# channel, its peak angular velocity, and swing count and tempo from the
+# stroke detector. Results are cached by the SHA-1 of the file's contents,
+# so a rerun after adding one capture only computes that one; renamed or
+# copied files hit the cache too. Bump METRICS_VERSION when a metric changes.
+#
+#   python analytics_batch.py ../Data -o metrics.csv
+#   python analytics_batch.py ../Data --pattern "*_Armside_1.csv" -j 4
+
+METRICS_VERSION = 1
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(data_loader.CACHE_DIR), "analytics")
+HASH_BLOCK = 1 << 20
+CHANNEL_NAMES = ("x", "y", "z")
+SIDE_TOKEN = re.compile(r"[a-z]*side|left|right", re.IGNORECASE)  # Armside, left, ...
+NAME_FIELDS = ("athlete", "joint", "side", "take", "file")
+
+
+# --- Discovery ---
+
+def describe_capture(path):
+    """{athlete, joint, side, take, file} from the capture's name ('' where the name has none)."""
+    athlete, joint, take = parse_capture_name(path)
+    ext = os.path.splitext(path)[1]
+    tokens = [t for t in take[:len(take) - len(ext)].split("_") if t]
+    sides = [t for t in tokens if SIDE_TOKEN.fullmatch(t)]
+    rest = [t for t in tokens if not SIDE_TOKEN.fullmatch(t)]
+    return {"athlete": athlete, "joint": joint or "", "side": sides[0].lower() if sides else "",
+            "take": "_".join(rest), "file": os.path.basename(path)}
+
+
+def find_sessions(inputs, pattern="*"):
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            paths.extend(p for p in find_captures(path) if fnmatch.fnmatch(os.path.basename(p), pattern))
+        else:
+            paths.append(path)
+    return paths
+
+
+# --- Metrics ---
+
+def channel_label(joint_name, channel):
+    axis = CHANNEL_NAMES[channel] if channel < len(CHANNEL_NAMES) else str(channel)
+    return f"{joint_name}_{axis}" if joint_name else axis
+
+
+def session_metrics(session):
+    """Metrics of one Session as a flat dict of numbers.
+
+    rom_<joint>_<axis>: range of motion in degrees, with steps across the
+    0/360 wrap taken the short way (rom_<axis> for one-joint captures,
+    whose joint is in the file name). peak_speed: largest sample-to-sample
+    angular speed of all channels together (deg/s). swings, swings_per_min,
+    swing_interval (median seconds between impacts), swing_duration and
+    swing_peak_speed (medians) come from the stroke detector.
+    """
+    times, angles = clean_times(np.asarray(session.times(), dtype=np.float64),
+                                np.asarray(session.angles, dtype=np.float64))
+    n_joints, n_channels = angles.shape[1:]
+    result = {"frames": len(times), "duration": float(times[-1] - times[0]) if len(times) else 0.0}
+
+    step = np.diff(angles, axis=0)
+    step -= 360.0 * np.round(step / 360.0)
+    path = np.cumsum(step, axis=0)
+    rom = np.ptp(np.concatenate([np.zeros((1, n_joints, n_channels)), path]), axis=0) if len(times) \
+        else np.zeros((n_joints, n_channels))
+    names = session.joint_names[:n_joints] if n_joints > 1 else [""]
+    for j, name in enumerate(names):
+        for c in range(n_channels):
+            result[f"rom_{channel_label(name, c)}"] = round(float(rom[j, c]), 2)
+
+    speed = np.linalg.norm(step.reshape(len(step), -1), axis=1) / np.diff(times) if len(times) > 1 else np.zeros(0)
+    result["peak_speed"] = round(float(speed.max()), 1) if len(speed) else 0.0
+
+    strokes = detect(times, angles).strokes
+    impacts = np.array([s.impact for s in strokes])
+    minutes = result["duration"] / 60.0
+    result["swings"] = len(strokes)
+    result["swings_per_min"] = round(len(strokes) / minutes, 2) if minutes > 0 else 0.0
+    result["swing_interval"] = round(float(np.median(np.diff(impacts))), 3) if len(strokes) > 1 else 0.0
+    result["swing_duration"] = round(float(np.median([s.finish - s.start for s in strokes])), 3) if strokes else 0.0
+    result["swing_peak_speed"] = round(float(np.median([s.peak_speed for s in strokes])), 1) if strokes else 0.0
+    return result
+
+
+def analyze(path):
+    """Worker: (path, metrics) for one capture."""
+    return path, session_metrics(load_session(path, aligned=False))
+
+
+# --- Result cache ---
+
+def content_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_path(digest, cache_dir=RESULT_CACHE_DIR):
+    return os.path.join(cache_dir, f"{digest}-v{METRICS_VERSION}.json")
+
+
+def read_result(digest, cache_dir=RESULT_CACHE_DIR):
+    try:
+        with open(result_path(digest, cache_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_result(digest, metrics, cache_dir=RESULT_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = result_path(digest, cache_dir)
+    with open(path + ".tmp", "w") as f:
+        json.dump(metrics, f)
+    os.replace(path + ".tmp", path)  # a reader never sees half a result
+
+
+def run_batch(paths, workers=None, use_cache=True, cache_dir=RESULT_CACHE_DIR):
+    """{path: metrics} for every capture; only uncached ones are computed (in a process pool).
+
+    Returns (results, number computed, failures {path: error}).
+    """
+    results, failures, pending = {}, {}, {}
+    for path in paths:
+        digest = content_hash(path)
+        cached = read_result(digest, cache_dir) if use_cache else None
+        if cached is not None:
+            results[path] = cached
+        else:
+            pending[path] = digest
+
+    if pending:
+        workers = max(1, min(workers or os.cpu_count(), len(pending)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(analyze, path): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    _, metrics = future.result()
+                except Exception as e:
+                    failures[path] = e
+                    continue
+                results[path] = metrics
+                write_result(pending[path], metrics, cache_dir)
+    return results, len(pending) - len(failures), failures
+
+
+# --- Output ---
+
+def rows(results):
+    """One dict per capture: its name fields then its metrics, sorted by athlete, joint and take."""
+    table = [{**describe_capture(path), **metrics} for path, metrics in results.items()]
+    return sorted(table, key=lambda r: (r["athlete"].lower(), r["joint"], r["side"], r["take"], r["file"]))
+
+
+def write_csv(path, table):
+    columns = list(NAME_FIELDS)
+    for row in table:
+        columns.extend(key for key in row if key not in columns)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="")
+        writer.writeheader()
+        writer.writerows(table)
+
+
+def print_table(table):
+    print(f"{'athlete':<10} {'joint':<9} {'side':<8} {'take':<14} {'frames':>7} {'secs':>7} "
+          f"{'max ROM':>8} {'peak deg/s':>11} {'swings':>7} {'per min':>8}")
+    for r in table:
+        rom = max((v for k, v in r.items() if k.startswith("rom_")), default=0.0)
+        print(f"{r['athlete']:<10} {r['joint']:<9} {r['side']:<8} {r['take'][:14]:<14} {r['frames']:>7} "
+              f"{r['duration']:>7.1f} {rom:>8.1f} {r['peak_speed']:>11.0f} {r['swings']:>7} "
+              f"{r['swings_per_min']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute per-session metrics for every capture, in parallel.")
+    parser.add_argument("inputs", nargs="+", help="captures or directories to search")
+    parser.add_argument("--pattern", default="*", help="file pattern inside directories (default %(default)s)")
+    parser.add_argument("-o", "--output", help="write every metric to this CSV file")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every capture")
+    args = parser.parse_args()
+
+    paths = find_sessions(args.inputs, args.pattern)
+    if not paths:
+        parser.error("no captures found")
+
+    start = time.perf_counter()
+    results, computed, failures = run_batch(paths, args.workers, not args.no_cache)
+    wall = time.perf_counter() - start
+    for path, error in failures.items():
+        print(f"{path}: failed: {error}")
+
+    table = rows(results)
+    print_table(table)
+    print(f"{len(results)} sessions ({computed} computed, {len(results) - computed} cached) in {wall:.1f} s")
+    if args.output:
+        write_csv(args.output, table)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import numpy as np
+import pyvista as pv
+
+# Whole-skeleton renderer for the PyVista viewers.
+#
+# All joints of all athletes live in one PolyData: joint points, line cells for
+# the segments between consecutive joints and vertex cells for the joint
+# glyphs. A frame update is a single bulk write into the preallocated point
+# buffer, which marks the points modified once, so the per-frame cost does not
+# grow with the number of joints, segments or athletes.
+
+
+class ArmRenderer:
+    """One polydata (segments plus joint glyphs) for n_athletes chains of n_points joints."""
+
+    def __init__(self, plotter, n_points, n_athletes=1, glyph_points=None,
+                 segment_color="brown", glyph_colors=("red", "blue"),
+                 line_width=4, point_size=12, name="Arm"):
+        self.n_points = n_points
+        self.n_athletes = n_athletes
+        if glyph_points is None:
+            glyph_points = range(n_points)
+        glyph_points = list(glyph_points)
+
+        offsets = np.arange(n_athletes) * n_points
+
+        # Vertex cells for the joint glyphs: [1, point]
+        glyph_ids = (offsets[:, None] + np.asarray(glyph_points)[None, :]).ravel()
+        verts = np.column_stack([np.ones_like(glyph_ids), glyph_ids]).ravel()
+
+        # Line cells for the segments: [2, joint, next joint]
+        seg = np.arange(n_points - 1)
+        starts = (offsets[:, None] + seg[None, :]).ravel()
+        lines = np.column_stack([np.full_like(starts, 2), starts, starts + 1]).ravel()
+
+        self.mesh = pv.PolyData(np.zeros((n_athletes * n_points, 3)), verts=verts, lines=lines)
+
+        # Per-cell colors; VTK orders cells as verts first, then lines
+        glyph_rgb = np.array([pv.Color(glyph_colors[i % len(glyph_colors)]).int_rgb
+                              for i in range(len(glyph_points))], dtype=np.uint8)
+        colors = np.vstack([
+            np.tile(glyph_rgb, (n_athletes, 1)),
+            np.tile(np.array(pv.Color(segment_color).int_rgb, dtype=np.uint8), (len(starts), 1)),
+        ])
+        self.mesh.cell_data["colors"] = colors
+
+        self.actor = plotter.add_mesh(self.mesh, scalars="colors", rgb=True, line_width=line_width,
+                                      point_size=point_size, render_points_as_spheres=True, name=name)
+
+        # Preallocated view of the VTK point array; writing it flags one modification
+        self._points = self.mesh.points
+
+    def update(self, positions):
+        """Write all joint positions at once: (n_points, 3) or (n_athletes, n_points, 3)."""
+        self._points[:] = np.reshape(positions, (-1, 3))
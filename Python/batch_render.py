@@ -0,0 +1,242 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from data_loader import load_session
+from interpolation import Interpolator
+from playback import PlaybackClock
+from kinematics import SHOULDER_POS, forward_kinematics, forward_kinematics_hinged
+
+# Headless batch rendering of recorded sessions to video or PNG frames.
+#
+# Every worker process owns one offscreen renderer (PyVista or matplotlib/Agg)
+# that is reused for all the sessions it is handed, so no window, Qt/Tk event
+# loop or file dialog is needed. Output frames are sampled from the session
+# timeline at a fixed output rate, the same way the viewers sample it on the
+# wall clock.
+#
+#   python batch_render.py ../Data --pattern "*_Armside_1.csv" -o ../renders --format mp4
+
+DEFAULT_PATTERN = "*_Armside_1.csv"
+DEFAULT_FPS = 30
+DEFAULT_SIZE = (800, 600)
+DEFAULT_SUBSTEPS = 10
+FORMATS = ("mp4", "gif", "png")
+
+# Fixed hinge angles for shoulder-only sessions (pyVis3DData's slider defaults)
+ELBOW_ANGLE = 90.0
+WRIST_ANGLE = 180.0
+
+
+def session_positions(session):
+    """(frames, 3, 3) elbow, wrist and racket end positions for a session."""
+    if session.n_joints >= 3:
+        return forward_kinematics(session.angles[:, :3])
+    return forward_kinematics_hinged(session.angles[:, 0], ELBOW_ANGLE, WRIST_ANGLE)
+
+
+def output_path(session_path, out_dir, fmt):
+    """<out_dir>/<stem>.<fmt>, or a <out_dir>/<stem>/ directory of frames for png."""
+    stem = os.path.splitext(os.path.basename(session_path))[0]
+    if fmt == "png":
+        return os.path.join(out_dir, stem)
+    return os.path.join(out_dir, f"{stem}.{fmt}")
+
+
+def frame_schedule(times, n_frames, substeps, fps, speed=1.0):
+    """(frame, substep) pairs for each output frame at fps, covering the session once."""
+    clock = PlaybackClock(times, n_frames=n_frames, substeps=substeps, speed=speed, loop=False)
+    duration = (clock.end_time - clock.start_time) / clock.speed
+    out_times = clock.start_time + np.arange(max(int(duration * fps), 1)) * clock.speed / fps
+    return [clock.locate(t) for t in out_times]
+
+
+# --- Renderers (one per worker process) ---
+
+class PyVistaRenderer:
+    """Offscreen PyVista scene: the arm and, optionally, the racket image at the wrist."""
+
+    def __init__(self, size=DEFAULT_SIZE, texture=None):
+        import pyvista as pv
+        from arm_renderer import ArmRenderer
+
+        self.plotter = pv.Plotter(off_screen=True, window_size=list(size))
+        self.plotter.set_background("white")
+        self.arm = ArmRenderer(self.plotter, n_points=3, glyph_points=(0, 1), segment_color="brown",
+                               glyph_colors=("red", "blue"), line_width=4, point_size=10)
+        self.arm_points = np.zeros((3, 3))
+        self.arm_points[0] = SHOULDER_POS
+
+        self.image_plane_actor = None
+        if texture:
+            from PIL import Image
+            image_plane = pv.Plane(center=(0, 0.5, 0), direction=(0, 0, 1), i_size=1, j_size=1)
+            image_plane.rotate_z(180, inplace=True)
+            self.image_plane_actor = self.plotter.add_mesh(
+                image_plane, texture=pv.numpy_to_texture(np.array(Image.open(texture))), name="ImagePlane")
+        self.plotter.camera_position = [(2.5, -2.5, 2.0), (0.0, 0.0, 0.0), (0.0, 0.0, 1.0)]
+
+    def set_title(self, text):
+        self.plotter.add_text(text, position="upper_left", font_size=8, color="black", name="Title")
+
+    def draw(self, points):
+        self.arm_points[1:] = points[:2]
+        self.arm.update(self.arm_points)
+        if self.image_plane_actor is not None:
+            self.image_plane_actor.SetPosition(*points[1])
+        self.plotter.render()
+
+    def render(self, frames, path, fmt, fps):
+        if fmt == "png":
+            os.makedirs(path, exist_ok=True)
+            for i, points in enumerate(frames):
+                self.draw(points)
+                self.plotter.screenshot(os.path.join(path, f"frame_{i:05d}.png"))
+            return
+        if fmt == "gif":
+            self.plotter.open_gif(path, fps=fps)
+        else:
+            self.plotter.open_movie(path, framerate=fps)
+        try:
+            for points in frames:
+                self.draw(points)
+                self.plotter.write_frame()
+        finally:
+            self.plotter.mwriter.close()
+            self.plotter.mwriter = None
+
+
+class MatplotlibRenderer:
+    """Agg 3D axes with persistent arm artists (tennis.py style)."""
+
+    def __init__(self, size=DEFAULT_SIZE, texture=None):
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        dpi = 100
+        self.fig = plt.figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        ax = self.fig.add_subplot(111, projection='3d')
+        ax.set_xlim([-1, 1])
+        ax.set_ylim([-1, 1])
+        ax.set_zlim([-1, 1])
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_zlabel('Z')
+        self.title = ax.set_title('')
+        self.arm_line, = ax.plot([0, 0, 0], [0, 0, 0], [0, 0, 0], color='brown', linewidth=4)
+        self.joints, = ax.plot([0, 0], [0, 0], [0, 0], 'o', color='blue', markersize=8)
+
+    def draw(self, points):
+        arm = np.vstack([SHOULDER_POS, points[:2]])
+        self.arm_line.set_data_3d(arm[:, 0], arm[:, 1], arm[:, 2])
+        self.joints.set_data_3d(arm[:2, 0], arm[:2, 1], arm[:2, 2])
+
+    def render(self, frames, path, fmt, fps):
+        from matplotlib import animation
+
+        if fmt == "png":
+            os.makedirs(path, exist_ok=True)
+            for i, points in enumerate(frames):
+                self.draw(points)
+                self.fig.savefig(os.path.join(path, f"frame_{i:05d}.png"))
+            return
+        writer = animation.PillowWriter(fps=fps) if fmt == "gif" else animation.FFMpegWriter(fps=fps)
+        with writer.saving(self.fig, path, dpi=self.fig.dpi):
+            for points in frames:
+                self.draw(points)
+                writer.grab_frame()
+
+    def set_title(self, text):
+        self.title.set_text(text)
+
+
+RENDERERS = {"pyvista": PyVistaRenderer, "matplotlib": MatplotlibRenderer}
+
+# Per-process renderer, created by the pool initializer
+_renderer = None
+
+
+def init_worker(backend, size, texture):
+    global _renderer
+    if backend == "pyvista":
+        import pyvista as pv
+        pv.OFF_SCREEN = True
+    _renderer = RENDERERS[backend](size, texture)
+
+
+def render_session(session_path, out_dir, fmt=FORMATS[0], fps=DEFAULT_FPS, substeps=DEFAULT_SUBSTEPS, speed=1.0):
+    """Render one session with this process's renderer. Returns (path, output, frames, seconds)."""
+    start = time.perf_counter()
+    session = load_session(session_path)
+    positions = session_positions(session)
+    times = session.times() if len(positions) == len(session) else None
+    schedule = frame_schedule(times, len(positions), substeps, fps, speed)
+    interpolator = Interpolator(positions, substeps=substeps, timestamps=times, loop=False)
+
+    _renderer.set_title(os.path.basename(session_path))
+    out = output_path(session_path, out_dir, fmt)
+    frames = (interpolator.frame(frame)[substep] for frame, substep in schedule)
+    _renderer.render(frames, out, fmt, fps)
+    return session_path, out, len(schedule), time.perf_counter() - start
+
+
+def find_sessions(inputs, pattern=DEFAULT_PATTERN):
+    """Files given directly, plus files matching pattern inside directories."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, pattern))))
+        else:
+            paths.append(item)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render recorded sessions to video or PNG frames without a display.")
+    parser.add_argument("inputs", nargs="+", help="session files or directories to search")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="file pattern inside directories (default %(default)s)")
+    parser.add_argument("-o", "--out", default="renders", help="output directory (default %(default)s)")
+    parser.add_argument("--format", choices=FORMATS, default=FORMATS[0])
+    parser.add_argument("--backend", choices=sorted(RENDERERS), default="pyvista")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="output frame rate")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+    parser.add_argument("--substeps", type=int, default=DEFAULT_SUBSTEPS, help="interpolated substeps per sample")
+    parser.add_argument("--size", type=int, nargs=2, default=DEFAULT_SIZE, metavar=("W", "H"))
+    parser.add_argument("--texture", help="racket image drawn at the wrist (pyvista only)")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.inputs, args.pattern)
+    if not sessions:
+        parser.error("no sessions found")
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    total_frames = 0
+    workers = max(1, min(args.workers, len(sessions)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(args.backend, tuple(args.size), args.texture)) as pool:
+        futures = {pool.submit(render_session, path, args.out, args.format, args.fps, args.substeps, args.speed): path
+                   for path in sessions}
+        for future in as_completed(futures):
+            try:
+                path, out, n_frames, seconds = future.result()
+            except Exception as e:
+                print(f"{futures[future]}: failed: {e}")
+                continue
+            total_frames += n_frames
+            print(f"{os.path.basename(path)}: {n_frames} frames in {seconds:.1f} s "
+                  f"({n_frames / seconds:.1f} fps) -> {out}")
+
+    wall = time.perf_counter() - start
+    print(f"{len(sessions)} sessions, {total_frames} frames in {wall:.1f} s wall time "
+          f"({total_frames / wall:.1f} fps overall, {workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import data_loader
+from alignment import FrameAligner
+from data_loader import load_session, load_values
+from interpolation import Interpolator
+from kinematic_chain import euler_to_quat, quat_to_matrix
+from kinematics import forward_kinematics
+from packets import PacketDecoder, encode_session
+from racket_mesh import DEFAULT_TEXTURE_SIZE, FacetCache, make_grid
+from ring_buffer import RingBuffer
+
+# Benchmarks for the hot paths, from file to pixels.
+#
+# Every stage is timed on the real captures in Data/ and on synthetic
+# sessions of 10^3 to 10^7 frames. A stage's setup (writing the synthetic
+# file, encoding packets, opening a window) is not timed; the timed call is
+# repeated and the best and median wall times are kept. Results are written
+# as JSON and, given a baseline from an earlier run, compared per stage and
+# dataset so a slowdown shows up before it reaches the court.
+#
+#   python benchmarks.py --scales 1e3 1e5 1e7 -o bench.json --baseline baseline.json
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Data")
+DEFAULT_SCALES = (1e3, 1e4, 1e5, 1e6)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2  # relative slowdown per frame that counts as a regression
+SUBSTEPS = 10
+SAMPLES_PER_PACKET = 19
+RENDER_FRAMES = 100      # render stages time this many frames, once per run
+SEED = 0
+
+
+# --- Datasets ---
+
+def synthetic_angles(n_frames, n_joints=3, seed=SEED):
+    """(frames, joints, 3) random-walk joint angles in degrees."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, 2.0, size=(n_frames, n_joints, 3))
+    return np.cumsum(steps, axis=0) % 360.0 - 180.0
+
+
+def real_angles(paths):
+    """Every capture's angles stacked as (frames, 3, 3); one-joint files drive all three joints."""
+    parts = []
+    for path in paths:
+        angles = load_session(path, use_cache=False).angles
+        if angles.shape[1:] == (1, 3):
+            angles = np.repeat(angles, 3, axis=1)
+        if angles.shape[1:] == (3, 3):
+            parts.append(np.asarray(angles, dtype=np.float64))
+    return np.concatenate(parts) if parts else np.zeros((0, 3, 3))
+
+
+def write_capture(path, angles):
+    """Synthetic capture in the space-separated layout of Data/ (9 columns)."""
+    np.savetxt(path, angles.reshape(len(angles), -1), fmt="%.2f")
+
+
+# --- Stages ---
+#
+# A setup function takes (angles, files, workdir) and returns the call to
+# time. files are the text captures behind the dataset.
+
+def setup_load(angles, files, workdir):
+    def run():
+        for path in files:
+            load_values(path)
+    return run
+
+
+def setup_load_cached(angles, files, workdir):
+    for path in files:
+        load_session(path)  # fill the cache
+
+    def run():
+        for path in files:
+            np.asarray(load_session(path).angles).sum()  # touch the mapped data
+    return run
+
+
+def setup_kinematics(angles, files, workdir):
+    return lambda: forward_kinematics(angles)
+
+
+def setup_interpolation(angles, files, workdir):
+    positions = forward_kinematics(angles)
+
+    def run():
+        for _ in Interpolator(positions, substeps=SUBSTEPS, loop=False):
+            pass
+    return run
+
+
+def setup_racket(angles, files, workdir):
+    grid = make_grid(DEFAULT_TEXTURE_SIZE, DEFAULT_TEXTURE_SIZE)
+
+    def run():
+        rotations = quat_to_matrix(euler_to_quat(angles[:, -1]))
+        cache = FacetCache(rotations, grid)
+        for start in range(0, len(cache), cache.chunk_frames):
+            cache.compute(start, min(start + cache.chunk_frames, len(cache)))
+    return run
+
+
+def setup_decode(angles, files, workdir):
+    values = angles[:, 0].astype(np.float32)
+    packets = encode_session(values, SAMPLES_PER_PACKET)
+    ring = RingBuffer(len(values), 3)
+
+    def run():
+        decoder = PacketDecoder(3)
+        for i, packet in enumerate(packets):
+            decoder.feed(packet, float(i))
+        seq, host_time, decoded = decoder.drain()
+        ring.head = 0
+        ring.write_many(host_time, seq, decoded)
+    return run
+
+
+def setup_align(angles, files, workdir):
+    values = angles[:, 0].astype(np.float32)
+    counters = [struct.pack("<I", i) for i in range(len(values))]
+    axes = [[struct.pack("<f", v) for v in column] for column in values.T]
+    ring = RingBuffer(len(values), 3)
+
+    def run():
+        ring.head = 0
+        aligner = FrameAligner(on_frame=lambda f: ring.write(f.time, f.counter, f.values), sample_rate=100.0)
+        x, y, z = axes
+        for i, counter in enumerate(counters):
+            t = i * 0.01
+            aligner.push_counter(struct.unpack_from("<I", counter)[0], t)
+            aligner.push_value("x", struct.unpack_from("<f", x[i])[0], t)
+            aligner.push_value("y", struct.unpack_from("<f", y[i])[0], t)
+            aligner.push_value("z", struct.unpack_from("<f", z[i])[0], t)
+        aligner.flush(everything=True)
+    return run
+
+
+def _render_setup(backend):
+    def setup(angles, files, workdir):
+        import batch_render
+
+        positions = forward_kinematics(angles[:RENDER_FRAMES])
+        batch_render.init_worker(backend, (800, 600), None)
+        renderer = batch_render._renderer
+        if backend == "pyvista":
+            renderer.plotter.show(auto_close=False)  # the plotter only renders once shown
+
+        def run():
+            for points in positions:
+                renderer.draw(points)
+                if backend == "matplotlib":
+                    renderer.fig.canvas.draw()
+        return run
+    return setup
+
+
+# name -> (setup, largest session it is run on; None for no limit)
+STAGES = {
+    "load": (setup_load, None),
+    "load-cached": (setup_load_cached, None),
+    "kinematics": (setup_kinematics, None),
+    "interpolation": (setup_interpolation, None),
+    "racket": (setup_racket, 10 ** 4),
+    "decode": (setup_decode, None),
+    "align": (setup_align, 10 ** 6),
+    "render-pyvista": (_render_setup("pyvista"), None),
+    "render-matplotlib": (_render_setup("matplotlib"), None),
+}
+
+# Stages that only ever see RENDER_FRAMES frames; they run on the first dataset only
+FIXED_FRAMES = {"render-pyvista": RENDER_FRAMES, "render-matplotlib": RENDER_FRAMES}
+
+
+def time_call(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), float(np.median(times))
+
+
+def run_stage(name, dataset, angles, files, workdir, repeat):
+    """One result dict, or None when the stage does not apply to this dataset."""
+    setup, max_frames = STAGES[name]
+    frames = min(len(angles), FIXED_FRAMES.get(name, len(angles)))
+    if frames == 0 or (max_frames is not None and frames > max_frames):
+        return None
+    if name.startswith("load") and not files:
+        return None
+    try:
+        fn = setup(angles, files, workdir)
+    except ImportError as e:
+        print(f"{name}: skipped ({e})")
+        return None
+    best, median = time_call(fn, repeat)
+    return {"stage": name, "dataset": dataset, "frames": frames,
+            "best_s": best, "median_s": median,
+            "us_per_frame": 1e6 * best / frames, "frames_per_s": frames / best}
+
+
+# --- Results ---
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+            "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Adds baseline ratios to results (in place); returns the regressed ones.
+
+    The ratio is time per frame now over time per frame in the baseline, so
+    1.3 means 30% slower.
+    """
+    previous = {(r["stage"], r["dataset"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        old = previous.get((r["stage"], r["dataset"]))
+        if old is None:
+            continue
+        r["baseline_us_per_frame"] = old["us_per_frame"]
+        r["ratio"] = r["us_per_frame"] / old["us_per_frame"]
+        r["regression"] = r["ratio"] > 1.0 + threshold
+        if r["regression"]:
+            regressions.append(r)
+    return regressions
+
+
+def print_table(results):
+    print(f"{'stage':<18} {'dataset':<10} {'frames':>9} {'best ms':>10} {'us/frame':>10} {'vs base':>8}")
+    for r in results:
+        ratio = f"{r['ratio']:.2f}x" if "ratio" in r else ""
+        flag = "  SLOWER" if r.get("regression") else ""
+        print(f"{r['stage']:<18} {r['dataset']:<10} {r['frames']:>9} {1000 * r['best_s']:>10.2f} "
+              f"{r['us_per_frame']:>10.3f} {ratio:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time parsing, kinematics, interpolation, ingest and rendering.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--scales", nargs="+", type=float, default=DEFAULT_SCALES,
+                        help="synthetic session lengths in frames (default %(default)s)")
+    parser.add_argument("--no-real", action="store_true", help="skip the captures in Data/")
+    parser.add_argument("--data", default=DATA_DIR, help="directory of real captures")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("-o", "--output", default="benchmarks.json", help="results file (JSON)")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (default %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        data_loader.CACHE_DIR = os.path.join(workdir, "cache")  # leave the user's parse cache alone
+        datasets = []
+        if not args.no_real:
+            files = sorted(glob.glob(os.path.join(args.data, "*.csv")) + glob.glob(os.path.join(args.data, "*.txt")))
+            datasets.append(("Data", real_angles(files), files))
+        for scale in args.scales:
+            n = int(scale)
+            angles = synthetic_angles(n)
+            files = []
+            if {"load", "load-cached"} & set(args.stages):
+                path = os.path.join(workdir, f"synthetic_{n}.txt")
+                write_capture(path, angles)
+                files = [path]
+            datasets.append((f"{scale:.0e}", angles, files))
+
+        results = []
+        for dataset, angles, files in datasets:
+            for name in args.stages:
+                if name in FIXED_FRAMES and any(r["stage"] == name for r in results):
+                    continue
+                result = run_stage(name, dataset, angles, files, workdir, args.repeat)
+                if result is not None:
+                    results.append(result)
+                    print(f"{name} {dataset}: {1000 * result['best_s']:.2f} ms", flush=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "repeat": args.repeat, "results": results}, f, indent=1)
+
+    print()
+    print_table(results)
+    print(f"\nWrote {args.output}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {100 * args.threshold:.0f}% against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
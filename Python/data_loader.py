@@ -0,0 +1,327 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+
+import numpy as np
+
+from session_format import Session, open_session, write_session, is_session_file, SESSION_SUFFIX
+from recorder import LOG_SUFFIX, read_log
+
+# Shared loader for every capture variant in Data/:
+#   "\t0.69 \t75.06 \t31.12"                       tab-plus-space, leading tab (Dominic_Wrist_Armside_1.csv)
+#   "61.63 82.94 -136.25"                          single space (Bella elbow 1.csv)
+#   "0.629 ... 0.873 2025-03-25T13:16:20.594916"   nine columns plus ISO timestamp
+#   "-80.12, -72.69, -66.94" after a boot banner   serial console logs (E_*/S_*_Calibration*.txt)
+#
+# The dialect is sniffed from the head of the file. The body is then classified
+# line by line with whole-array byte operations (no Python loop over lines or
+# cells): a line is kept when it only contains number characters and has the
+# dialect's token count. Banner lines, calibration prompts ("X: 125.00") and
+# half-written rows are dropped, and NumPy converts the kept bytes in one call.
+# Only if that conversion fails (junk such as "1 2 -" is made of number
+# characters too) are the block's candidate lines checked one by one.
+
+SNIFF_BYTES = 64 * 1024
+CHUNK_BYTES = 8 * 1024 * 1024
+ALIGN_SUFFIX = ".align.json"  # sidecar with the capture's time offset
+CACHE_VERSION = 2  # 2: the cache holds the raw columns; grouping and rate are applied on load
+CACHE_DIR = os.environ.get("APM_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "athletic-performance", "parsed"))
+
+NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+ISO_TIMESTAMP = r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?"
+
+_TOKEN_SPLIT = re.compile(r"[\s,]+")
+_NUMBER_RE = re.compile(NUMBER + r"$")
+_ISO_RE = re.compile(ISO_TIMESTAMP + r"$")
+
+
+def _byte_table(chars):
+    table = np.zeros(256, dtype=bool)
+    table[np.frombuffer(chars, dtype=np.uint8)] = True
+    return table
+
+
+_NUMERIC_BYTES = _byte_table(b"0123456789.+-eE \t,\r")
+_TIMESTAMP_BYTES = _byte_table(b"0123456789.+-eE \t,\r:T")
+_SEPARATOR_BYTES = _byte_table(b" \t,\r\n")
+
+
+class Dialect:
+    """Column layout of a text capture, as found by sniff_dialect."""
+
+    def __init__(self, separator, n_columns, has_timestamp):
+        self.separator = separator
+        self.n_columns = n_columns
+        self.has_timestamp = has_timestamp
+
+    def __repr__(self):
+        return (f"Dialect(separator={self.separator!r}, n_columns={self.n_columns}, "
+                f"has_timestamp={self.has_timestamp})")
+
+
+def _classify_line(line):
+    """Return (n_numeric, has_timestamp, uses_comma) for a data-looking line, else None."""
+    stripped = line.strip()
+    if not stripped:
+        return None
+    tokens = [t for t in _TOKEN_SPLIT.split(stripped) if t]
+    has_timestamp = False
+    if len(tokens) > 1 and _ISO_RE.match(tokens[-1]):
+        has_timestamp = True
+        tokens = tokens[:-1]
+    if not all(_NUMBER_RE.match(t) for t in tokens):
+        return None
+    return len(tokens), has_timestamp, "," in stripped
+
+
+def sniff_dialect(text):
+    """Pick the dominant row shape among the numeric-looking lines of a text sample."""
+    shapes = Counter()
+    for line in text.splitlines():
+        shape = _classify_line(line)
+        if shape is not None:
+            shapes[shape] += 1
+    if not shapes:
+        return None
+    # Prefer the most frequent shape; break ties towards wider rows so a stray
+    # "X: 125.00"-style line never wins over real data.
+    (n_columns, has_timestamp, uses_comma), _ = max(shapes.items(), key=lambda kv: (kv[1], kv[0][0]))
+    return Dialect("comma" if uses_comma else "whitespace", n_columns, has_timestamp)
+
+
+def _empty(dialect):
+    n_columns = dialect.n_columns if dialect else 0
+    return np.empty((0, n_columns)), (np.empty(0) if dialect and dialect.has_timestamp else None)
+
+
+def parse_block(raw, dialect):
+    """Parse a block of whole lines (bytes) in bulk.
+
+    Returns (values (N, C) float64, timestamps (N,) seconds or None).
+    """
+    values, timestamps, _ = parse_lines(raw, dialect)
+    return values, timestamps
+
+
+def parse_lines(raw, dialect):
+    """parse_block, plus the byte offset in raw of every line that was kept."""
+    if not raw:
+        return _empty(dialect) + (np.empty(0, dtype=np.int64),)
+    buf = np.frombuffer(raw, dtype=np.uint8)
+
+    # Line boundaries: [starts[i], ends[i]) excludes the newline itself
+    ends = np.flatnonzero(buf == 10)
+    if len(ends) == 0 or ends[-1] != len(buf) - 1:
+        ends = np.append(ends, len(buf))
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    def per_line(mask):
+        # count of set bytes in each line, via the sorted positions of set bytes
+        idx = np.flatnonzero(mask)
+        return np.searchsorted(idx, ends) - np.searchsorted(idx, starts)
+
+    allowed = _TIMESTAMP_BYTES if dialect.has_timestamp else _NUMERIC_BYTES
+    bad = per_line(~allowed[buf])
+    is_sep = _SEPARATOR_BYTES[buf]
+    token_start = ~is_sep
+    token_start[1:] &= is_sep[:-1]
+    n_tokens = per_line(token_start)
+
+    expected = dialect.n_columns + (1 if dialect.has_timestamp else 0)
+    keep = (bad == 0) & (n_tokens == expected)
+    try:
+        return _convert(buf, starts, ends, keep, dialect)
+    except ValueError:
+        # Number characters in the right count can still be junk ("1 2 -",
+        # "1-2 3 4", "... . .", a "T:T" stamp): check the candidates one by one
+        candidates = np.flatnonzero(keep)
+        keep[candidates] = [_is_row(buf[starts[i]:ends[i]].tobytes(), dialect) for i in candidates]
+        return _convert(buf, starts, ends, keep, dialect)
+
+
+def _is_row(line, dialect):
+    shape = _classify_line(line.decode("ascii"))
+    if shape is None or shape[:2] != (dialect.n_columns, dialect.has_timestamp):
+        return False
+    if dialect.has_timestamp:
+        try:
+            np.datetime64(line.split()[-1].decode("ascii"), "us")
+        except ValueError:
+            return False
+    return True
+
+
+def _convert(buf, starts, ends, keep, dialect):
+    """(values, timestamps, starts) of the kept lines; ValueError if one of them is not a row."""
+    if not keep.any():
+        return _empty(dialect) + (np.empty(0, dtype=np.int64),)
+
+    # Keep each accepted line together with its trailing newline
+    lengths = np.minimum(ends + 1, len(buf)) - starts
+    body = buf[np.repeat(keep, lengths)]
+    if dialect.separator == "comma":
+        body = np.where(body == ord(","), np.uint8(ord(" ")), body)
+    body = body.tobytes()
+
+    if not dialect.has_timestamp:
+        values = np.fromstring(body, dtype=np.float64, sep=" ")
+        if len(values) != np.count_nonzero(keep) * dialect.n_columns:
+            raise ValueError("unparsed tokens")  # older NumPy stops at junk instead of raising
+        return values.reshape(-1, dialect.n_columns), None, starts[keep]
+
+    tokens = np.array(body.split()).reshape(-1, dialect.n_columns + 1)
+    values = tokens[:, :dialect.n_columns].astype(np.float64)
+    stamps = tokens[:, -1].astype("U32").astype("datetime64[us]")
+    return values, stamps.astype(np.int64) / 1e6, starts[keep]
+
+
+def parse_text(text, dialect=None):
+    """Parse a capture's text in bulk, returning (values (N, C) float64, timestamps or None)."""
+    if dialect is None:
+        dialect = sniff_dialect(text[:SNIFF_BYTES])
+    if dialect is None:
+        return _empty(None)
+    return parse_block(text.encode("utf-8", errors="replace"), dialect)
+
+
+def _iter_line_blocks(f, chunk_bytes=CHUNK_BYTES):
+    """Yield chunks of a binary file that end on a line boundary."""
+    tail = b""
+    while True:
+        block = f.read(chunk_bytes)
+        if not block:
+            break
+        block = tail + block
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            tail = block
+            continue
+        tail = block[cut:]
+        yield block[:cut]
+    if tail:
+        yield tail
+
+
+def load_values(path, dialect=None):
+    """Read and parse a text capture without touching the cache."""
+    with open(path, "rb") as f:
+        if dialect is None:
+            dialect = sniff_dialect(f.read(SNIFF_BYTES).decode("utf-8", errors="replace"))
+            f.seek(0)
+        if dialect is None:
+            return _empty(None)
+        parts = [parse_block(block, dialect) for block in _iter_line_blocks(f)]
+
+    if not parts:
+        return _empty(dialect)
+    values = np.concatenate([p[0] for p in parts])
+    timestamps = np.concatenate([p[1] for p in parts]) if dialect.has_timestamp else None
+    return values, timestamps
+
+
+# --- Parse cache ---
+
+def _cache_prefix(path):
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_path(path):
+    """Cache file for path, keyed by absolute path, mtime and size."""
+    st = os.stat(path)
+    return os.path.join(CACHE_DIR, f"{_cache_prefix(path)}-{st.st_mtime_ns:x}-{st.st_size:x}"
+                                   f"-v{CACHE_VERSION}{SESSION_SUFFIX}")
+
+
+def _drop_stale(path, keep):
+    prefix = _cache_prefix(path) + "-"
+    for name in os.listdir(CACHE_DIR):
+        full = os.path.join(CACHE_DIR, name)
+        if name.startswith(prefix) and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def values_to_angles(values, channels=3):
+    """Group (N, C) columns into (N, joints, channels) when C divides evenly."""
+    n_columns = values.shape[1] if values.ndim == 2 else 0
+    if n_columns and n_columns % channels == 0:
+        return values.reshape(len(values), n_columns // channels, channels)
+    return values.reshape(len(values), 1, n_columns)
+
+
+# --- Time offsets from align_joints.py ---
+
+def offset_path(path):
+    return str(path) + ALIGN_SUFFIX
+
+
+def load_offset(path, default=0.0):
+    """Seconds to add to the capture's times to line it up with the others of its take (default if unaligned)."""
+    try:
+        with open(offset_path(path)) as f:
+            return float(json.load(f)["offset"])
+    except (OSError, ValueError, KeyError):
+        return default
+
+
+def load_session(path, channels=3, use_cache=True, sample_rate=0.0, aligned=True):
+    """Load any capture in Data/ (text or .apms) or a recorder log as a Session.
+
+    Text captures are parsed once and their columns stored in the cache as a
+    session file, so reopening an unchanged file is a header read plus a
+    memory map; channels and sample_rate are applied on every load. With
+    aligned set, an offset written by align_joints.py is applied to the times
+    (even a zero one, so the take's reference keeps its times too) and kept
+    in session.offset.
+    """
+    session = _load(path, channels, use_cache, sample_rate)
+    offset = load_offset(path, None) if aligned else None
+    if offset is not None:
+        session = Session(session.angles, session.times() + offset, session.joint_names,
+                          session.sample_rate, session.path, offset)
+    return session
+
+
+def _load(path, channels, use_cache, sample_rate):
+    if is_session_file(path):
+        return open_session(path)
+    if str(path).lower().endswith(LOG_SUFFIX):
+        header, times, _, values = read_log(path)
+        return Session(values_to_angles(values, channels), times, sample_rate=header["sample_rate"], path=path)
+
+    if use_cache:
+        cached = cache_path(path)
+        if os.path.exists(cached):
+            return _from_cache(cached, path, channels, sample_rate)
+
+    values, timestamps = load_values(path)
+
+    if not use_cache:
+        return Session(values_to_angles(values, channels), timestamps, sample_rate=sample_rate, path=path)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # One "joint" holding every column: any grouping is a view of it
+    write_session(cached, values[:, None, :], timestamps, dtype=np.float64)
+    _drop_stale(path, cached)
+    return _from_cache(cached, path, channels, sample_rate)
+
+
+def _from_cache(cached, path, channels, sample_rate):
+    stored = open_session(cached)
+    angles = values_to_angles(stored.angles[:, 0], channels)  # still memory-mapped
+    return Session(angles, stored.timestamps, sample_rate=sample_rate, path=path)
+
+
+def clear_cache():
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(SESSION_SUFFIX):
+            os.remove(os.path.join(CACHE_DIR, name))
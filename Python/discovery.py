@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import time
+
+from bleak import BleakClient, BleakScanner
+from bleak.exc import BleakDBusError, BleakError
+
+# Fast discovery of the sensor units.
+#
+# Connecting goes: (1) a direct connect to the address remembered for the
+# device, (2) a scan filtered on the firmware's service UUID that stops at the
+# first matching advertisement, (3) retries with capped exponential backoff.
+# Successful addresses are written to a small JSON cache, so a known sensor
+# is usually connected without scanning at all. Every unit advertises the
+# same name, so entries are keyed by name, service UUID and an optional unit
+# label (e.g. "shoulder"); an address that stops answering is forgotten. A
+# scan for a labelled unit skips the addresses cached for the other units,
+# and an address is never stored under two units' keys.
+
+SERVICE_UUID = "4fafc201-1fb5-459e-8fcc-c5c9c331914b"  # advertised by BLE-Gyro-Readoff
+DEVICE_NAME = "ESP32"
+AXIS_CHARACTERISTICS = {"x": "e2f5435e-634f-44d3-9c7f-54bfe8c96e64",
+                        "y": "0eb71bcb-eb31-4f19-88b9-116a4e52a2c4",
+                        "z": "801b2ee2-e7b6-4aa8-ae2d-4e82b426d157"}
+COUNTER_CHARACTERISTIC_UUID = "beb5483e-36e1-4688-b7f5-ea07361b26a8"  # firmware `value`, notified before x/y/z
+
+DEVICE_CACHE = os.environ.get("APM_DEVICE_CACHE",
+                              os.path.join(os.path.expanduser("~"), ".cache", "athletic-performance", "devices.json"))
+
+DIRECT_CONNECT_TIMEOUT = 3.0
+SCAN_TIMEOUT = 5.0
+CONNECT_TIMEOUT = 10.0
+BACKOFF_START = 0.5
+BACKOFF_CAP = 8.0
+MAX_ATTEMPTS = 6
+
+RETRY_ERRORS = (BleakError, BleakDBusError, asyncio.TimeoutError, OSError)
+
+
+class DeviceNotFoundError(Exception):
+    pass
+
+
+# --- Address cache ---
+
+def cache_key(name=DEVICE_NAME, service_uuid=SERVICE_UUID, unit=None):
+    """'name/service[/unit]': one cache entry per unit, not per advertised name."""
+    key = f"{name}/{(service_uuid or '').lower()}"
+    return f"{key}/{unit}" if unit else key
+
+
+def load_cache(path=None):
+    """{cache_key: {"address": ..., "last_seen": epoch}}"""
+    path = path or DEVICE_CACHE
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=1)
+    os.replace(tmp, path)  # readers see the old cache or the new one, never half of one
+
+
+def owner(address, path=None):
+    """Key the address is cached under, or None."""
+    for key, entry in load_cache(path).items():
+        if entry["address"].upper() == address.upper():
+            return key
+    return None
+
+
+def remember(key, address, path=None):
+    """Cache address under key. Returns False (and changes nothing) if another key already has it."""
+    path = path or DEVICE_CACHE
+    holder = owner(address, path)
+    if holder not in (None, key):
+        return False
+    cache = load_cache(path)
+    cache[key] = {"address": address, "last_seen": time.time()}
+    _save_cache(cache, path)
+    return True
+
+
+def forget(key, path=None):
+    path = path or DEVICE_CACHE
+    cache = load_cache(path)
+    if cache.pop(key, None) is not None:
+        _save_cache(cache, path)
+
+
+def cached_address(key, path=None):
+    entry = load_cache(path).get(key)
+    return entry["address"] if entry else None
+
+
+def other_units(name=DEVICE_NAME, service_uuid=SERVICE_UUID, unit=None, path=None):
+    """Addresses cached for the units with this name and service other than `unit`."""
+    prefix = cache_key(name, service_uuid) + "/"
+    key = cache_key(name, service_uuid, unit)
+    return {entry["address"] for k, entry in load_cache(path).items() if k.startswith(prefix) and k != key}
+
+
+# --- Scanning ---
+
+async def scan(name=DEVICE_NAME, service_uuid=SERVICE_UUID, timeout=SCAN_TIMEOUT, exclude=(), address=None):
+    """First advertising device with our service UUID (and name, if given).
+
+    Returns as soon as it is seen instead of waiting out a full discover().
+    Addresses in `exclude` are skipped (e.g. units already connected); with
+    address given, only that device is accepted.
+    """
+    found = asyncio.get_running_loop().create_future()
+    exclude = {a.upper() for a in exclude}
+
+    def on_detect(device, adv):
+        if found.done() or device.address.upper() in exclude:
+            return
+        if address and device.address.upper() != address.upper():
+            return
+        if service_uuid and service_uuid.lower() not in [u.lower() for u in adv.service_uuids]:
+            return
+        if name and (adv.local_name or device.name) != name:
+            return
+        found.set_result(device)
+
+    service_uuids = [service_uuid] if service_uuid else None
+    async with BleakScanner(on_detect, service_uuids=service_uuids):
+        try:
+            return await asyncio.wait_for(found, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+async def backoff(attempts=MAX_ATTEMPTS, start=BACKOFF_START, cap=BACKOFF_CAP):
+    """Yields attempt numbers, sleeping start, 2*start, ... (at most cap) in between.
+
+    attempts=None keeps going until the caller stops iterating.
+    """
+    delay = start
+    for attempt in (itertools.count() if attempts is None else range(attempts)):
+        if attempt:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, cap)
+        yield attempt
+
+
+# --- Connecting ---
+
+async def _try_connect(target, timeout, disconnected_callback=None):
+    client = BleakClient(target, timeout=timeout, disconnected_callback=disconnected_callback)
+    await client.connect()
+    return client
+
+
+async def connect(name=DEVICE_NAME, address=None, service_uuid=SERVICE_UUID, unit=None,
+                  attempts=MAX_ATTEMPTS, use_cache=True, verbose=True, exclude=(),
+                  disconnected_callback=None):
+    """Connected BleakClient for the sensor, trying the known address first.
+
+    address overrides the cached one, and a scan then only accepts that
+    device. unit labels the cache entry when several units share the name;
+    scans for it skip `exclude` (e.g. units already connected) and the
+    addresses cached for the other units. Raises DeviceNotFoundError when
+    every attempt failed.
+    """
+    log = print if verbose else (lambda *a: None)
+    key = cache_key(name, service_uuid, unit)
+    known = address or (cached_address(key) if use_cache else None)
+    last_error = None
+
+    def save(found):
+        if use_cache and not remember(key, found):
+            log(f"Not caching {found} for {key}: it is cached as {owner(found)}")
+
+    async for attempt in backoff(attempts):
+        if known:
+            try:
+                client = await _try_connect(known, DIRECT_CONNECT_TIMEOUT, disconnected_callback)
+                log(f"Connected to {name} at {known} (direct)")
+                save(known)
+                return client
+            except RETRY_ERRORS as e:
+                last_error = e
+                log(f"Direct connect to {known} failed: {e}")
+                if not address:
+                    # A cached address that does not answer is stale: scan from now on
+                    forget(key)
+                    known = None
+
+        try:
+            skip = set(exclude) | (other_units(name, service_uuid, unit) if unit and use_cache else set())
+            device = await scan(None if address else name, service_uuid, SCAN_TIMEOUT, skip, address)
+            if device is None:
+                log(f"No {address or name} advertising {service_uuid} (attempt {attempt + 1}/{attempts})")
+                continue
+            client = await _try_connect(device, CONNECT_TIMEOUT, disconnected_callback)
+            log(f"Connected to {name} at {device.address}")
+            save(device.address)
+            return client
+        except RETRY_ERRORS as e:
+            last_error = e
+            log(f"Scan/connect failed (attempt {attempt + 1}/{attempts}): {e}")
+
+    raise DeviceNotFoundError(f"could not connect to {name}: {last_error}")
+
+
+@contextlib.asynccontextmanager
+async def connected(name=DEVICE_NAME, address=None, **kwargs):
+    """async with connected(...) as client: like BleakClient, but found with connect()."""
+    client = await connect(name, address, **kwargs)
+    try:
+        yield client
+    finally:
+        await client.disconnect()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Find and connect to a sensor unit, reporting time to connected.")
+    parser.add_argument("--name", default=DEVICE_NAME, help="advertised device name (default %(default)s)")
+    parser.add_argument("--unit", help="label of this unit in the address cache (e.g. shoulder)")
+    parser.add_argument("--address", help="connect to this address instead of the cached one")
+    parser.add_argument("--forget", action="store_true", help="drop the cached address first")
+    args = parser.parse_args()
+
+    if args.forget:
+        forget(cache_key(args.name, unit=args.unit))
+    start = time.perf_counter()
+    async with connected(args.name, args.address, unit=args.unit) as client:
+        print(f"Time to connected: {time.perf_counter() - start:.2f} s ({client.address})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
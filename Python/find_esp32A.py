@@ -1,6 +1,7 @@
 import asyncio
-from bleak import BleakScanner, BleakClient
-from bleak.exc import BleakDBusError, BleakError
+from bleak.exc import BleakError
+
+from discovery import DeviceNotFoundError, connected
 
 # Global scanner lock
 scanner_lock = asyncio.Lock()
@@ -13,31 +14,10 @@ def notification_handler(uuid):
 
 async def find_esp32_and_read_all(target_name="ESP32"):
     async with scanner_lock:
-        print("Ensuring no active BLE scans before starting...")
-        
-        try:
-            scanner = BleakScanner()
-            await scanner.stop()
-        except Exception as e:
-            print(f"⚠️ Warning: Could not stop previous scanner: {e}")
-
-        print("Scanning for BLE devices...")
+        # Cached address first, then a service-UUID filtered scan, with capped backoff
+        print("Connecting to BLE device...")
         try:
-            devices = await BleakScanner.discover()
-            target_device = None
-
-            for device in devices:
-                print(f"Found device: {device.name} - {device.address}")
-                if device.name and target_name in device.name:
-                    target_device = device
-                    print(f"✅ Target device '{device.name}' found at address: {device.address}")
-                    break
-
-            if not target_device:
-                print(f"❌ Could not find target device '{target_name}'. Ensure it is advertising.")
-                return
-
-            async with BleakClient(target_device) as client:
+            async with connected(target_name) as client:
                 if not client.is_connected:
                     print("❌ Failed to connect to the ESP32.")
                     return
@@ -69,11 +49,8 @@ async def find_esp32_and_read_all(target_name="ESP32"):
                 while True:
                     await asyncio.sleep(1)
 
-        except BleakDBusError as e:
-            print(f"❌ BLE scan failed due to BlueZ error: {e}")
-            print("Retrying in 5 seconds...")
-            await asyncio.sleep(5)
-            await find_esp32_and_read_all(target_name)
+        except DeviceNotFoundError as e:
+            print(f"❌ Could not find target device '{target_name}'. Ensure it is advertising. ({e})")
 
         except BleakError as e:
             print(f"❌ Failed to connect or read: {e}")
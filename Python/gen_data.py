@@ -1,32 +1,262 @@
+import argparse
+import os
+import sys
 import time
-import random
 from datetime import datetime
 
-# Parameters
-num_steps = 500             # How many coordinate sets to generate
-step_delay = 0.1           # Time between steps in seconds
-max_step = 0.2             # Maximum movement per step
-
-# Initialize three 3D points
-points = [
-    [random.uniform(-1, 1) for _ in range(3)],
-    [random.uniform(-1, 1) for _ in range(3)],
-    [random.uniform(-1, 1) for _ in range(3)],
-]
-
-for _ in range(num_steps):
-    # Smoothly update each point
-    for point in points:
-        for i in range(3):
-            delta = random.uniform(-max_step, max_step)
-            point[i] += delta
-
-    # Get the current timestamp
-    timestamp = datetime.now().isoformat()
-
-    # Print in the required format
-    line = ' '.join(f"{coord:.3f}" for point in points for coord in point)
-    print(f"{line} {timestamp}")
-
-    # Optional delay to simulate real-time generation
-    time.sleep(step_delay)
+import numpy as np
+
+from session_format import DEFAULT_SAMPLE_RATE, SESSION_SUFFIX, SessionWriter, default_joint_names
+
+# Synthetic sessions for stress-testing the loaders and renderers.
+#
+# Joint-angle trajectories (random walk or tennis-swing shaped) are generated
+# in vectorized chunks from a seed and streamed to one of the text layouts in
+# Data/ or to a binary .apms session, so output size is limited by disk, not
+# memory. Angles stay in the BNO055's ranges: heading wraps around 0..360,
+# roll is folded back into -90..90 and pitch wraps around -180..180. Random
+# draws do not depend on the chunk size, so a seed always gives the same file.
+#
+#   python gen_data.py -o big.apms --frames 50000000 --joints 3 --mode swing --seed 7
+#   python gen_data.py --rate 100 --realtime | python pyVis3DData.py ...
+
+DEFAULT_FRAMES = 500
+CHUNK_FRAMES = 65536
+PACE_INTERVAL = 0.1  # seconds of data written per wake-up in --realtime mode
+
+# Per-channel (low, high, wraps): wrapping channels come round to low after high,
+# the others are reflected at their limits. Channels past the third use the last.
+CHANNEL_RANGES = ((0.0, 360.0, True), (-90.0, 90.0, False), (-180.0, 180.0, True))
+
+WALK_STEP = 2.0                # degrees per frame at 10 Hz (standard deviation)
+SWING_INTERVAL = (1.5, 4.0)    # seconds between swing starts
+SWING_DURATION = 0.6           # seconds from backswing to follow-through
+SWING_AMPLITUDE = (20.0, 90.0)  # degrees, per joint and channel
+SWING_NOISE = 0.3              # degrees per frame of random walk on top of the swing
+
+TEXT_LAYOUTS = {
+    # name: (line prefix, separator), as in the captures in Data/
+    "space": ("", " "),    # 61.63 82.94 -136.25
+    "tab": ("\t", " \t"),  # \t0.69 \t75.06 \t31.12
+    "comma": ("", ", "),   # -80.12, -72.69, -66.94
+}
+FORMATS = tuple(TEXT_LAYOUTS) + ("apms",)
+
+
+def channel_ranges(n_channels):
+    return [CHANNEL_RANGES[min(c, len(CHANNEL_RANGES) - 1)] for c in range(n_channels)]
+
+
+def wrap_angles(values, ranges):
+    """Map unbounded (frames, ..., channels) angles into each channel's range."""
+    out = np.empty_like(values)
+    for c, (low, high, wraps) in enumerate(ranges):
+        span = high - low
+        if wraps:
+            out[..., c] = (values[..., c] - low) % span + low
+        else:
+            # triangle fold: low..high, then back down, and so on
+            phase = (values[..., c] - low) % (2 * span)
+            out[..., c] = low + np.where(phase > span, 2 * span - phase, phase)
+    return out
+
+
+# --- Trajectories ---
+
+class RandomWalk:
+    """Gaussian random walk of every joint angle, carried across chunks."""
+
+    def __init__(self, shape, rate, rng, step=WALK_STEP):
+        self.rng = rng
+        self.step = step * np.sqrt(DEFAULT_SAMPLE_RATE / rate)  # same spread per second at any rate
+        self.ranges = channel_ranges(shape[-1])
+        lows = np.array([r[0] for r in self.ranges])
+        highs = np.array([r[1] for r in self.ranges])
+        self.state = rng.uniform(lows, highs, size=shape)
+
+    def chunk(self, n):
+        steps = self.rng.normal(0.0, self.step, size=(n,) + self.state.shape)
+        path = self.state + np.cumsum(steps, axis=0)
+        self.state = path[-1].copy()
+        return path
+
+
+class Swings:
+    """A resting posture with a swing every few seconds, plus a little drift.
+
+    Swing start times and the drift come from separate random streams, so the
+    result does not depend on how the session is chunked.
+    """
+
+    def __init__(self, shape, rate, rng, interval=SWING_INTERVAL, duration=SWING_DURATION):
+        self.rate = rate
+        self.interval = interval
+        self.duration = duration
+        self.event_rng = np.random.default_rng(rng.integers(2 ** 63))
+        self.amplitude = rng.uniform(*SWING_AMPLITUDE, size=shape) * rng.choice([-1, 1], size=shape)
+        self.drift = RandomWalk(shape, rate, rng, step=SWING_NOISE)
+        self.ranges = self.drift.ranges
+        self.starts = np.array([self.event_rng.uniform(0, interval[1])])  # seconds
+        self.frame = 0
+
+    def _schedule(self, until):
+        while self.starts[-1] <= until:
+            gaps = self.event_rng.uniform(*self.interval, size=16)
+            self.starts = np.concatenate([self.starts, self.starts[-1] + np.cumsum(gaps)])
+
+    def chunk(self, n):
+        t = (self.frame + np.arange(n)) / self.rate
+        self.frame += n
+        self._schedule(t[-1])
+        last = np.searchsorted(self.starts, t, side="right") - 1
+        u = np.where(last >= 0, (t - self.starts[np.maximum(last, 0)]) / self.duration, 1.0)
+        # backswing, then the stroke through to the follow-through, zero outside the swing
+        shape = np.where(u < 1.0, -np.sin(2 * np.pi * u) * np.sin(np.pi * u), 0.0)
+        self.starts = self.starts[max(last[-1], 0):]  # keep the swing in progress
+        out = self.drift.chunk(n)
+        out += shape.reshape((n,) + (1,) * (out.ndim - 1)) * self.amplitude
+        return out
+
+
+TRAJECTORIES = {"walk": RandomWalk, "swing": Swings}
+
+
+# --- Writers ---
+
+class TextWriter:
+    """One of the Data/ text layouts, optionally with an ISO timestamp column."""
+
+    def __init__(self, stream, n_columns, layout="space", timestamps=True, decimals=2):
+        prefix, separator = TEXT_LAYOUTS[layout]
+        row = prefix + separator.join([f"%.{decimals}f"] * n_columns)
+        if timestamps:
+            row += " %s"
+        self.row = row + "\n"
+        self.timestamps = timestamps
+        self.stream = stream
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, angles, times):
+        n = len(angles)
+        cells = angles.reshape(n, -1)
+        if self.timestamps:
+            stamps = np.datetime_as_string((times * 1e6).astype("datetime64[us]"), unit="us")
+            cells = np.concatenate([cells.astype(object), stamps[:, None].astype(object)], axis=1)
+        text = (self.row * n) % tuple(cells.ravel().tolist())
+        self.stream.write(text)
+        self.frames += n
+        self.bytes += len(text)
+
+    def close(self):
+        self.stream.flush()
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+
+class BinaryWriter:
+    """An .apms session, filled chunk by chunk."""
+
+    def __init__(self, path, n_frames, n_joints, n_channels, rate, timestamps=True):
+        self.writer = SessionWriter(path, n_frames, n_joints, n_channels, timestamps,
+                                    default_joint_names(n_joints), rate)
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, angles, times):
+        self.writer.write(angles, times)
+        self.frames = self.writer.written
+        self.bytes += angles.size * self.writer.dtype.itemsize + (times.nbytes if self.writer.has_timestamps else 0)
+
+    def close(self):
+        if self.writer.written == self.writer.n_frames:
+            self.writer.close()
+        else:
+            self.writer.abort()  # interrupted: leave no half-filled session behind
+
+
+def athlete_paths(output, n_athletes):
+    """One output per athlete: name.ext, or name_athlete1.ext, name_athlete2.ext, ..."""
+    if n_athletes == 1:
+        return [output]
+    stem, ext = os.path.splitext(output)
+    return [f"{stem}_athlete{i + 1}{ext}" for i in range(n_athletes)]
+
+
+def generate(writers, trajectories, n_frames, rate, start, chunk=CHUNK_FRAMES, realtime=False):
+    """Streams n_frames (0 = until interrupted) from each trajectory to its writer."""
+    if realtime:
+        chunk = max(1, int(round(rate * PACE_INTERVAL)))
+    wall_start = time.perf_counter()
+    written = 0
+    while not n_frames or written < n_frames:
+        n = chunk if not n_frames else min(chunk, n_frames - written)
+        times = start + (written + np.arange(n)) / rate
+        for writer, trajectory in zip(writers, trajectories):
+            writer.write(wrap_angles(trajectory.chunk(n), trajectory.ranges), times)
+        written += n
+        if realtime:
+            for writer in writers:
+                getattr(writer, "stream", sys.stdout).flush()
+            delay = wall_start + written / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic joint-angle sessions.")
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="text layout or apms (default: apms for .apms outputs, else space)")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="frames per athlete (0 = endless, text only)")
+    parser.add_argument("--rate", type=float, default=DEFAULT_SAMPLE_RATE, help="sample rate (Hz)")
+    parser.add_argument("--athletes", type=int, default=1, help="one output per athlete")
+    parser.add_argument("--joints", type=int, default=3)
+    parser.add_argument("--channels", type=int, default=3, help="angles per joint")
+    parser.add_argument("--mode", choices=list(TRAJECTORIES), default="walk")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-timestamps", action="store_true", help="leave out the timestamp column")
+    parser.add_argument("--start", help="ISO time of the first frame (default: now)")
+    parser.add_argument("--chunk", type=int, default=CHUNK_FRAMES, help="frames generated per step")
+    parser.add_argument("--realtime", action="store_true", help="pace output at --rate on the wall clock")
+    args = parser.parse_args()
+
+    fmt = args.format or ("apms" if args.output.lower().endswith(SESSION_SUFFIX) else "space")
+    if fmt == "apms" and (args.output == "-" or not args.frames):
+        parser.error("apms output needs a file and a fixed --frames")
+    if args.output == "-" and args.athletes > 1:
+        parser.error("several athletes need an output file")
+
+    start = np.datetime64(args.start or datetime.now(), "us").astype(np.int64) / 1e6
+    shape = (args.joints, args.channels)
+    seeds = np.random.SeedSequence(args.seed).spawn(args.athletes)
+    trajectories = [TRAJECTORIES[args.mode](shape, args.rate, np.random.default_rng(seed)) for seed in seeds]
+
+    writers = []
+    for path in athlete_paths(args.output, args.athletes):
+        if fmt == "apms":
+            writers.append(BinaryWriter(path, args.frames, args.joints, args.channels, args.rate,
+                                        not args.no_timestamps))
+        else:
+            stream = sys.stdout if path == "-" else open(path, "w", buffering=1 << 20)
+            writers.append(TextWriter(stream, args.joints * args.channels, fmt, not args.no_timestamps))
+
+    wall = time.perf_counter()
+    try:
+        generate(writers, trajectories, args.frames, args.rate, start, args.chunk, args.realtime)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for writer in writers:
+            writer.close()
+    wall = time.perf_counter() - wall
+
+    if args.output != "-":
+        total = sum(w.bytes for w in writers)
+        print(f"{writers[0].frames} frames x {len(writers)} athlete(s), {total / 1e6:.1f} MB in {wall:.1f} s "
+              f"({total / 1e6 / max(wall, 1e-9):.0f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
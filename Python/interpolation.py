@@ -0,0 +1,139 @@
+import numpy as np
+
+from session_format import DEFAULT_SAMPLE_RATE
+
+# Interpolation between recorded frames for smooth playback.
+#
+# Positions are blended linearly and orientations with slerp, both vectorized
+# over (frames, substeps, joints). Output is produced lazily in bounded chunks,
+# so a long session never materializes frames x substeps in memory.
+
+
+def substep_fractions(substeps):
+    """Blend factors for one frame: 0, 1/substeps, ..., (substeps - 1)/substeps.
+
+    The end point is left out because it is the first substep of the next frame.
+    """
+    return np.arange(substeps, dtype=np.float64) / substeps
+
+
+def lerp(start, end, fractions):
+    """Linear interpolation; start/end are (..., 3), fractions broadcast against a new axis."""
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    f = np.asarray(fractions, dtype=np.float64).reshape((-1,) + (1,) * start.ndim)
+    return start + f * (end - start)
+
+
+def slerp(q0, q1, fractions):
+    """Spherical interpolation of (..., 4) unit quaternions along a trailing fraction axis.
+
+    q0, q1: (..., 4); fractions: (S,). Returns (..., S, 4).
+    """
+    q0 = np.asarray(q0, dtype=np.float64)
+    q1 = np.asarray(q1, dtype=np.float64)
+    t = np.asarray(fractions, dtype=np.float64)[:, None]
+
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    # take the short way round
+    q1 = np.where(dot < 0.0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))[..., None, :]
+    sin_theta = np.sin(theta)
+    near = sin_theta < 1e-6
+    safe = np.where(near, 1.0, sin_theta)
+    w0 = np.where(near, 1.0 - t, np.sin((1.0 - t) * theta) / safe)
+    w1 = np.where(near, t, np.sin(t * theta) / safe)
+
+    out = w0 * q0[..., None, :] + w1 * q1[..., None, :]
+    return out / np.linalg.norm(out, axis=-1, keepdims=True)
+
+
+class Interpolator:
+    """Lazily interpolated view of a session.
+
+    positions: (frames, joints, 3); orientations: optional (frames, joints, 4);
+    timestamps: optional (frames,) seconds, may be non-uniform. Frame i blends
+    towards frame i + 1 (frame 0 after the last one when loop is set).
+    """
+
+    def __init__(self, positions, substeps=10, orientations=None, timestamps=None,
+                 sample_rate=DEFAULT_SAMPLE_RATE, chunk_frames=1024, loop=True):
+        self.positions = positions
+        self.orientations = orientations
+        self.substeps = int(substeps)
+        self.chunk_frames = int(chunk_frames)
+        self.loop = loop
+        self.fractions = substep_fractions(self.substeps)
+
+        n = len(positions)
+        if timestamps is None:
+            timestamps = np.arange(n, dtype=np.float64) / sample_rate
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        # Duration of each frame; the wrap-around frame uses the median step
+        steps = np.diff(self.timestamps)
+        last = np.median(steps) if len(steps) else 1.0 / sample_rate
+        self.durations = np.append(steps, last)
+
+        self._cached_start = None
+        self._cached = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def n_chunks(self):
+        return (len(self) + self.chunk_frames - 1) // self.chunk_frames
+
+    def _next_indices(self, start, stop):
+        nxt = np.arange(start + 1, stop + 1)
+        if self.loop:
+            nxt %= len(self)
+        else:
+            nxt = np.minimum(nxt, len(self) - 1)
+        return nxt
+
+    def compute(self, start, stop):
+        """Interpolate frames [start, stop).
+
+        Returns (positions (n, substeps, joints, 3), orientations (n, substeps, joints, 4)
+        or None, times (n, substeps)).
+        """
+        nxt = self._next_indices(start, stop)
+        p0 = np.asarray(self.positions[start:stop], dtype=np.float64)
+        p1 = np.asarray(self.positions[nxt], dtype=np.float64)
+        f = self.fractions[None, :, None, None]
+        positions = p0[:, None] + f * (p1 - p0)[:, None]
+
+        orientations = None
+        if self.orientations is not None:
+            q0 = np.asarray(self.orientations[start:stop], dtype=np.float64)
+            q1 = np.asarray(self.orientations[nxt], dtype=np.float64)
+            # slerp gives (n, joints, substeps, 4); reorder to (n, substeps, joints, 4)
+            orientations = slerp(q0, q1, self.fractions).swapaxes(1, 2)
+
+        times = self.timestamps[start:stop, None] + self.durations[start:stop, None] * self.fractions
+        return positions, orientations, times
+
+    def chunk(self, index):
+        """Interpolated chunk number index (cached until another chunk is requested)."""
+        start = index * self.chunk_frames
+        if self._cached_start != start:
+            self._cached = self.compute(start, min(start + self.chunk_frames, len(self)))
+            self._cached_start = start
+        return self._cached
+
+    def frame(self, index):
+        """(substeps, joints, 3) positions for frame index."""
+        positions, _, _ = self.chunk(index // self.chunk_frames)
+        return positions[index % self.chunk_frames]
+
+    def frame_orientations(self, index):
+        _, orientations, _ = self.chunk(index // self.chunk_frames)
+        return None if orientations is None else orientations[index % self.chunk_frames]
+
+    def __iter__(self):
+        for i in range(self.n_chunks):
+            start = i * self.chunk_frames
+            yield self.compute(start, min(start + self.chunk_frames, len(self)))
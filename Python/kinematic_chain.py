@@ -0,0 +1,150 @@
+import numpy as np
+
+from kinematics import SEGMENT_LENGTHS, SHOULDER_POS
+
+# Quaternion kinematic chain (shoulder -> elbow -> wrist -> racket).
+#
+# Rotations are stored as (..., 4) unit quaternions in (w, x, y, z) order and
+# every operation works on whole sessions at once: composing the chain for N
+# frames is a few vectorized quaternion products, not N sets of 3x3 matrices.
+
+
+# --- Batched quaternion helpers ---
+
+def quat_multiply(q, r):
+    """Hamilton product q * r for broadcastable (..., 4) arrays."""
+    q = np.asarray(q, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    w1, x1, y1, z1 = np.moveaxis(q, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(r, -1, 0)
+    return np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=-1)
+
+
+def quat_conjugate(q):
+    q = np.array(q, dtype=np.float64)
+    q[..., 1:] *= -1.0
+    return q
+
+
+def quat_normalize(q):
+    q = np.asarray(q, dtype=np.float64)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def quat_rotate(q, v):
+    """Rotate (..., 3) vectors by (..., 4) unit quaternions."""
+    q = np.asarray(q, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    u = q[..., 1:]
+    w = q[..., :1]
+    # v' = v + 2w (u x v) + 2 u x (u x v)
+    t = 2.0 * np.cross(u, v)
+    return v + w * t + np.cross(u, t)
+
+
+def quat_to_matrix(q):
+    """(..., 4) unit quaternions -> (..., 3, 3) rotation matrices."""
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    out = np.empty(w.shape + (3, 3))
+    out[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    out[..., 0, 1] = 2 * (x * y - w * z)
+    out[..., 0, 2] = 2 * (x * z + w * y)
+    out[..., 1, 0] = 2 * (x * y + w * z)
+    out[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    out[..., 1, 2] = 2 * (y * z - w * x)
+    out[..., 2, 0] = 2 * (x * z - w * y)
+    out[..., 2, 1] = 2 * (y * z + w * x)
+    out[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return out
+
+
+def euler_to_quat(angles):
+    """(..., 3) pitch, roll, yaw in degrees -> (..., 4) quaternions.
+
+    Rotation about x by pitch, then y by roll, then z by yaw, i.e. the same
+    Rz @ Ry @ Rx composition as racketVis.rotation_matrix.
+    """
+    half = np.radians(np.asarray(angles, dtype=np.float64)) / 2.0
+    cx, sx = np.cos(half[..., 0]), np.sin(half[..., 0])
+    cy, sy = np.cos(half[..., 1]), np.sin(half[..., 1])
+    cz, sz = np.cos(half[..., 2]), np.sin(half[..., 2])
+    return np.stack([
+        cz * cy * cx + sz * sy * sx,
+        cz * cy * sx - sz * sy * cx,
+        cz * sy * cx + sz * cy * sx,
+        sz * cy * cx - cz * sy * sx,
+    ], axis=-1)
+
+
+def bno055_to_quat(euler):
+    """(..., 3) BNO055 Euler output (heading, roll, pitch) -> (..., 4) quaternions."""
+    euler = np.asarray(euler, dtype=np.float64)
+    return euler_to_quat(np.stack([euler[..., 2], euler[..., 1], euler[..., 0]], axis=-1))
+
+
+# --- Kinematic chain ---
+
+class KinematicChain:
+    """Serial chain of segments with parent-relative rotations.
+
+    Each segment points along `axis` in its own frame and hangs off the end of
+    its parent. Given per-frame local rotations for every joint, solve()
+    composes them down the chain and returns world positions and orientations.
+    """
+
+    def __init__(self, names=("shoulder", "elbow", "wrist"), lengths=SEGMENT_LENGTHS,
+                 axis=(1.0, 0.0, 0.0), origin=SHOULDER_POS):
+        if len(lengths) < len(names):
+            raise ValueError(f"need {len(names)} segment lengths, got {len(lengths)}")
+        self.names = list(names)
+        self.lengths = np.asarray(lengths[:len(names)], dtype=np.float64)
+        self.axis = np.asarray(axis, dtype=np.float64)
+        self.origin = np.asarray(origin, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def solve(self, local_rotations):
+        """Compose (frames, joints, 4) local quaternions down the chain.
+
+        Returns (positions, orientations): positions is (frames, joints + 1, 3)
+        with the chain origin first, orientations is (frames, joints, 4) world
+        rotation of every segment.
+        """
+        local_rotations = quat_normalize(local_rotations)
+        n_frames, n_joints = local_rotations.shape[:2]
+        if n_joints != len(self):
+            raise ValueError(f"chain has {len(self)} joints, got rotations for {n_joints}")
+
+        orientations = np.empty_like(local_rotations)
+        orientations[:, 0] = local_rotations[:, 0]
+        for j in range(1, n_joints):  # loop over joints, vectorized over frames
+            orientations[:, j] = quat_multiply(orientations[:, j - 1], local_rotations[:, j])
+
+        steps = quat_rotate(orientations, self.axis) * self.lengths[:, None]
+        positions = np.empty((n_frames, n_joints + 1, 3))
+        positions[:, 0] = self.origin
+        np.cumsum(steps, axis=1, out=positions[:, 1:])
+        positions[:, 1:] += self.origin
+        return positions, orientations
+
+    def solve_euler(self, angles):
+        """solve() for (frames, joints, 3) pitch/roll/yaw angles in degrees."""
+        return self.solve(euler_to_quat(angles))
+
+    def local_from_world(self, world_rotations):
+        """Convert absolute per-sensor orientations to parent-relative ones.
+
+        Each BNO055 reports its own absolute orientation; the chain wants the
+        rotation of each segment relative to its parent: q_local = q_parent^-1 * q_world.
+        """
+        world_rotations = quat_normalize(world_rotations)
+        local = np.empty_like(world_rotations)
+        local[:, 0] = world_rotations[:, 0]
+        local[:, 1:] = quat_multiply(quat_conjugate(world_rotations[:, :-1]), world_rotations[:, 1:])
+        return local
@@ -0,0 +1,82 @@
+import numpy as np
+
+# Batched forward kinematics for the arm viewers.
+#
+# All functions take whole sessions: angles are (frames, joints, 3) arrays in
+# degrees and positions come back as (frames, joints, 3) arrays, computed with
+# a handful of array operations instead of one compute_positions call per frame.
+
+# Default segment lengths (shoulder->elbow, elbow->wrist, wrist->racket end)
+UPPER_ARM_LENGTH = 0.5
+FOREARM_LENGTH = 0.5
+RACKET_LENGTH = 0.0
+SEGMENT_LENGTHS = (UPPER_ARM_LENGTH, FOREARM_LENGTH, RACKET_LENGTH)
+
+# Fixed shoulder position (origin)
+SHOULDER_POS = np.array([0.0, 0.0, 0.0])
+
+
+def segment_directions(angles):
+    """Unit direction of each segment from its joint's x/y angles (degrees).
+
+    Same convention as the viewers' compute_positions:
+    (cos x * cos y, sin x * cos y, sin y).
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    rad = np.radians(angles[..., :2])
+    cos_x, sin_x = np.cos(rad[..., 0]), np.sin(rad[..., 0])
+    cos_y, sin_y = np.cos(rad[..., 1]), np.sin(rad[..., 1])
+    out = np.empty(angles.shape[:-1] + (3,))
+    out[..., 0] = cos_x * cos_y
+    out[..., 1] = sin_x * cos_y
+    out[..., 2] = sin_y
+    return out
+
+
+def forward_kinematics(angles, lengths=SEGMENT_LENGTHS, origin=SHOULDER_POS):
+    """Positions of every segment end for a whole session.
+
+    angles: (frames, joints, 3) joint angles in degrees, one row per joint
+    (shoulder, elbow, wrist, ...). Each joint's angles orient the segment that
+    starts at it, so the result is (frames, joints, 3) positions of the elbow,
+    wrist, racket end, ... in that order.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    n_joints = angles.shape[-2]
+    lengths = np.asarray(lengths, dtype=np.float64)
+    if len(lengths) < n_joints:
+        raise ValueError(f"need {n_joints} segment lengths, got {len(lengths)}")
+
+    steps = segment_directions(angles) * lengths[:n_joints, None]
+    positions = np.cumsum(steps, axis=-2)
+    positions += origin
+    return positions
+
+
+def forward_kinematics_hinged(shoulder_angles, elbow_deg, wrist_deg, lengths=SEGMENT_LENGTHS, origin=SHOULDER_POS):
+    """Elbow, wrist and racket end positions for a shoulder-only session.
+
+    Batched form of pyVis3DData's model: the shoulder orients the upper arm
+    from its x/y angles, the elbow and wrist are planar hinges whose angles are
+    scalars or per-frame arrays. Returns (frames, 3, 3).
+    """
+    shoulder_angles = np.asarray(shoulder_angles, dtype=np.float64)
+    n_frames = shoulder_angles.shape[0]
+    upper, forearm, racket = lengths[:3]
+    shoulder_z = np.radians(shoulder_angles[:, 2])
+
+    forearm_angle = np.broadcast_to(np.radians(180.0 - np.asarray(elbow_deg, dtype=np.float64)), (n_frames,))
+    racket_angle = forearm_angle + np.radians(180.0 - np.asarray(wrist_deg, dtype=np.float64))
+
+    steps = np.empty((n_frames, 3, 3))
+    steps[:, 0] = upper * segment_directions(shoulder_angles)
+    steps[:, 1, 0] = forearm * np.cos(forearm_angle) * np.cos(shoulder_z)
+    steps[:, 1, 1] = forearm * np.sin(forearm_angle) * np.cos(shoulder_z)
+    steps[:, 1, 2] = forearm * np.sin(shoulder_z)
+    steps[:, 2, 0] = racket * np.cos(racket_angle)
+    steps[:, 2, 1] = racket * np.sin(racket_angle)
+    steps[:, 2, 2] = 0.0
+
+    positions = np.cumsum(steps, axis=1)
+    positions += origin
+    return positions
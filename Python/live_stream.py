@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from session_manager import SessionManager, SensorSpec, check_targets, host_clock, joint_layout
+from discovery import DEVICE_NAME
+from session_format import DEFAULT_SAMPLE_RATE
+
+# Live sensor frames for the viewers.
+#
+# The BLE session (SessionManager) runs on its own asyncio loop in a daemon
+# thread and writes merged frames into its ring buffer; the viewer's Qt timer
+# only takes the newest frame from a reader cursor, so neither loop ever
+# waits on the other. Latency is measured from the host arrival time of the
+# newest sensor notification in a merged frame (not the frame's grid time) to
+# the moment the frame has been handed to the renderer. An error while the
+# session starts is raised again from start().
+
+LATENCY_SMOOTHING = 0.1  # weight of the newest measurement in the running average
+
+
+def default_specs(joints, athlete="athlete", target=DEVICE_NAME):
+    """One unit per joint, found by the firmware's advertised name (only unique with one joint)."""
+    return [SensorSpec(athlete, joint, target) for joint in joints]
+
+
+def add_live_arguments(parser, joints):
+    """--live [athlete/joint=address ...] and --rate for a viewer's argument parser."""
+    if len(joints) == 1:
+        default = f"defaults to the {joints[0]} on the device named {DEVICE_NAME!r}"
+    else:
+        default = f"give the address of the {', '.join(joints)} units (they all advertise {DEVICE_NAME!r})"
+    parser.add_argument("--live", nargs="*", metavar="ATHLETE/JOINT=ADDRESS",
+                        help=f"stream from sensors instead of a file; {default}")
+    parser.add_argument("--rate", type=float, default=DEFAULT_SAMPLE_RATE, help="live frame rate (Hz)")
+
+
+def live_specs(args, joints):
+    """Sensor specs from parsed --live arguments (None when not in live mode)."""
+    if args.live is None:
+        return None
+    if not args.live:
+        if len(joints) > 1:
+            raise SystemExit(f"--live: every unit advertises {DEVICE_NAME!r}, so give each one's address: "
+                             + " ".join(f"athlete/{j}=ADDRESS" for j in joints))
+        return default_specs(joints)
+    return [SensorSpec.parse(s) for s in args.live]
+
+
+class LatencyMeter:
+    """Running average and worst case of sensor-to-pixel latency (seconds)."""
+
+    def __init__(self):
+        self.average = 0.0
+        self.worst = 0.0
+        self.count = 0
+
+    def add(self, latency):
+        self.count += 1
+        if self.count == 1:
+            self.average = latency
+        else:
+            self.average += LATENCY_SMOOTHING * (latency - self.average)
+        self.worst = max(self.worst, latency)
+
+    def status(self):
+        return f"latency {1000 * self.average:5.1f} ms (max {1000 * self.worst:.0f})"
+
+
+class LiveStream:
+    """A SessionManager running in a background thread, read from the GUI thread."""
+
+    def __init__(self, specs, joints, sample_rate=DEFAULT_SAMPLE_RATE):
+        """joints: the joints the viewer draws, in its order (e.g. shoulder, elbow, wrist)."""
+        self.specs = list(specs)
+        check_targets(self.specs)
+        self.sample_rate = sample_rate
+        self.athletes, self.joints = joint_layout(self.specs)
+        missing = [j for j in joints if j not in self.joints]
+        if missing:
+            raise ValueError(f"no sensor given for {', '.join(missing)}")
+        self._joint_index = [self.joints.index(j) for j in joints]
+        self.latency = LatencyMeter()
+        self.manager = None
+        self._loop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ble-session", daemon=True)
+        self._reader = None
+        self._shown = None  # (time, arrival time) of the frame latest() returned last
+        self.error = None
+        self.frames = 0
+
+    def _run(self):
+        async def session():
+            self.manager = SessionManager(self.specs, self.sample_rate)
+            self._loop = asyncio.get_running_loop()
+            self._reader = self.manager.ring.reader("viewer")
+            self._ready.set()
+            await self.manager.run(report=False)
+
+        try:
+            asyncio.run(session())
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()  # never leave start() waiting
+
+    def start(self):
+        """Start the session thread; raises what went wrong if it failed to start."""
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self):
+        if self._loop is not None and self.manager is not None:
+            self._loop.call_soon_threadsafe(self.manager.stop.set)
+
+    def latest(self, athlete=0):
+        """(time, (joints, 3) angles) of the newest merged frame, or None.
+
+        Returns None as well when any of the viewer's joints has no data yet.
+        """
+        if self._reader is None:
+            return None
+        sample = self._reader.latest()
+        if sample is None:
+            return None
+        t, seq, values = sample
+        frame = values.reshape(len(self.athletes), len(self.joints), 3)[athlete]
+        angles = frame[self._joint_index]
+        if np.isnan(angles).any():
+            return None
+        self.frames += 1
+        self._shown = (t, self.manager.merger.arrival(int(seq)))
+        return t, np.array(angles, dtype=np.float64)
+
+    def rendered(self, t):
+        """Call once the frame with host time t (from latest()) has been handed to the renderer."""
+        if self._shown is None or self._shown[0] != t or np.isnan(self._shown[1]):
+            return
+        self.latency.add(host_clock() - self._shown[1])
+
+    def status(self):
+        if self.error is not None:
+            return f"live stopped: {self.error}"
+        connected = sum(link.connected for link in self.manager.links) if self.manager else 0
+        return (f"live {connected}/{len(self.specs)} sensors  {self.frames} frames  "
+                f"{self.latency.status()}")
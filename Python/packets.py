@@ -0,0 +1,156 @@
+import struct
+
+import numpy as np
+
+# Packed sample notifications.
+#
+# Instead of one 4-byte notification per axis plus a separate counter, a
+# packed notification carries K consecutive samples of N channels:
+#
+#   offset  size     field
+#   0       4        seq        uint32, packet sequence number (+1 per packet, wraps)
+#   4       1        samples    uint8, K samples in this packet (1..255)
+#   5       1        channels   uint8, N channels per sample (1..255)
+#   6       2        flags      uint16, reserved, 0
+#   8       4*K*N    values     float32, sample-major: s0c0 s0c1 ... s1c0 ...
+#
+# All fields are little-endian (native on the ESP32). With the default ATT MTU
+# of 23 bytes a packet fits 3 floats (one x/y/z sample); with a negotiated MTU
+# of 247 it fits 59, e.g. K=19 samples of N=3 channels. Sample i of packet seq
+# has the sample number seq * K + i when K is fixed for the session.
+
+PACKED_CHARACTERISTIC_UUID = "6a3e1c52-2f4b-4c1e-9d0a-8f5b7e3c2d14"
+
+HEADER_STRUCT = "<IBBH"
+HEADER_SIZE = struct.calcsize(HEADER_STRUCT)
+VALUE_DTYPE = np.dtype("<f4")
+SEQ_MODULUS = 1 << 32
+
+
+class PacketError(Exception):
+    pass
+
+
+def packet_size(samples, channels):
+    return HEADER_SIZE + VALUE_DTYPE.itemsize * samples * channels
+
+
+def encode_packet(seq, samples):
+    """Reference encoder: (K, N) array of samples -> packet bytes."""
+    samples = np.asarray(samples, dtype=VALUE_DTYPE)
+    if samples.ndim == 1:
+        samples = samples[None, :]
+    k, n = samples.shape
+    if not (0 < k < 256 and 0 < n < 256):
+        raise PacketError(f"packet shape {samples.shape} out of range")
+    return struct.pack(HEADER_STRUCT, seq % SEQ_MODULUS, k, n, 0) + samples.tobytes()
+
+
+def encode_session(values, samples_per_packet, first_seq=0):
+    """Split a (frames, N) array into packets of samples_per_packet samples each."""
+    values = np.asarray(values, dtype=VALUE_DTYPE)
+    return [encode_packet(first_seq + i, values[start:start + samples_per_packet])
+            for i, start in enumerate(range(0, len(values), samples_per_packet))]
+
+
+def decode_header(data):
+    """(seq, samples, channels, flags) of a packet."""
+    if len(data) < HEADER_SIZE:
+        raise PacketError(f"packet too short: {len(data)} bytes")
+    return struct.unpack_from(HEADER_STRUCT, data)
+
+
+def decode_packet(data):
+    """(seq, (K, N) float32 view) of one packet, without copying the values."""
+    seq, k, n, _ = decode_header(data)
+    if len(data) != packet_size(k, n):
+        raise PacketError(f"packet of {len(data)} bytes does not hold {k}x{n} values")
+    return seq, np.frombuffer(data, dtype=VALUE_DTYPE, count=k * n, offset=HEADER_SIZE).reshape(k, n)
+
+
+def packet_dtype(samples, channels):
+    """Structured dtype of a whole packet, for decoding many same-size packets at once."""
+    return np.dtype([("seq", "<u4"), ("samples", "u1"), ("channels", "u1"), ("flags", "<u2"),
+                     ("values", VALUE_DTYPE, (samples, channels))])
+
+
+def decode_packets(packets, samples, channels):
+    """Decode a sequence of same-size packets in one pass.
+
+    Returns (seq (P,), values (P, K, N)). Used for recorded packet dumps, where
+    the packets are already in memory.
+    """
+    dtype = packet_dtype(samples, channels)
+    records = np.frombuffer(b"".join(packets), dtype=dtype)
+    if np.any(records["samples"] != samples) or np.any(records["channels"] != channels):
+        raise PacketError(f"packets are not all {samples}x{channels}")
+    return records["seq"], records["values"]
+
+
+class PacketDecoder:
+    """Decodes live packets straight into preallocated sample arrays.
+
+    values is (capacity, channels) float32, seq is the sample number of every
+    row and host_time the arrival time of the packet it came in. Storage grows
+    by doubling when full; drain() hands the rows over and starts again.
+    """
+
+    def __init__(self, channels, capacity=4096):
+        self.channels = channels
+        self.values = np.empty((capacity, channels), dtype=VALUE_DTYPE)
+        self.seq = np.empty(capacity, dtype=np.int64)
+        self.host_time = np.empty(capacity, dtype=np.float64)
+        self.count = 0
+
+        self.packets = 0
+        self.lost_packets = 0
+        self._last_seq = None
+        self._wraps = 0
+
+    def __len__(self):
+        return self.count
+
+    def _reserve(self, n):
+        if self.count + n <= len(self.values):
+            return
+        capacity = max(2 * len(self.values), self.count + n)
+        for name in ("values", "seq", "host_time"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def feed(self, data, host_time):
+        """Decode one notification. Returns the number of samples added."""
+        seq, k, n, _ = decode_header(data)
+        if n != self.channels:
+            raise PacketError(f"expected {self.channels} channels, got {n}")
+        if len(data) != packet_size(k, n):
+            raise PacketError(f"packet of {len(data)} bytes does not hold {k}x{n} values")
+
+        # Unwrap the 32-bit sequence number and count gaps
+        if self._last_seq is not None:
+            if seq < self._last_seq and self._last_seq - seq > SEQ_MODULUS // 2:
+                self._wraps += 1
+            gap = (seq - self._last_seq) % SEQ_MODULUS - 1
+            if 0 < gap < SEQ_MODULUS // 2:
+                self.lost_packets += gap
+        self._last_seq = seq
+        full_seq = self._wraps * SEQ_MODULUS + seq
+
+        self._reserve(k)
+        end = self.count + k
+        self.values[self.count:end] = np.frombuffer(data, dtype=VALUE_DTYPE, count=k * n,
+                                                    offset=HEADER_SIZE).reshape(k, n)
+        self.seq[self.count:end] = full_seq * k + np.arange(k)
+        self.host_time[self.count:end] = host_time
+        self.count = end
+        self.packets += 1
+        return k
+
+    def drain(self):
+        """(seq, host_time, values) copies of the decoded rows; the decoder is emptied."""
+        out = (self.seq[:self.count].copy(), self.host_time[:self.count].copy(),
+               self.values[:self.count].copy())
+        self.count = 0
+        return out
@@ -0,0 +1,135 @@
+import time
+
+import numpy as np
+
+from session_format import DEFAULT_SAMPLE_RATE
+
+# Wall-clock playback scheduling for the viewers.
+#
+# The viewers' timer callbacks ask the clock which (frame, substep) is due
+# right now and render only that one. If rendering falls behind, stale
+# substeps are skipped (and counted) instead of being drawn late, so playback
+# stays tied to the recorded sample times rather than to the machine.
+
+MIN_SPEED = 0.1
+MAX_SPEED = 10.0
+STATS_INTERVAL = 1.0  # seconds between frame-rate updates
+
+
+class PlaybackClock:
+    """Maps wall-clock time to session time for a recorded session.
+
+    times: (frames,) sample times in seconds (non-uniform is fine), or None to
+    use sample_rate. Each frame is split into `substeps` equal slices to match
+    the interpolator.
+    """
+
+    def __init__(self, times=None, n_frames=None, substeps=1, speed=1.0, loop=True,
+                 sample_rate=DEFAULT_SAMPLE_RATE, clock=time.perf_counter):
+        if times is None:
+            times = np.arange(n_frames, dtype=np.float64) / sample_rate
+        self.times = np.asarray(times, dtype=np.float64)
+        steps = np.diff(self.times)
+        last = np.median(steps) if len(steps) else 1.0 / sample_rate
+        self.durations = np.append(steps, last)
+        self.start_time = self.times[0]
+        self.end_time = self.times[-1] + last
+
+        self.substeps = int(substeps)
+        self.loop = loop
+        self.clock = clock
+        self.speed = float(np.clip(speed, MIN_SPEED, MAX_SPEED))
+
+        self._wall_anchor = None
+        self._session_anchor = self.start_time
+        self._last_step = None
+
+        self.rendered = 0
+        self.dropped = 0
+        self.fps = 0.0
+        self._fps_count = 0
+        self._fps_start = None
+
+    @property
+    def total_steps(self):
+        return len(self.times) * self.substeps
+
+    def start(self, session_time=None):
+        """(Re)anchor playback so session_time is shown now."""
+        self._wall_anchor = self.clock()
+        self._session_anchor = self.start_time if session_time is None else session_time
+        self._last_step = None
+
+    def session_time(self):
+        if self._wall_anchor is None:
+            self.start()
+        t = self._session_anchor + (self.clock() - self._wall_anchor) * self.speed
+        span = self.end_time - self.start_time
+        if self.loop:
+            return self.start_time + (t - self.start_time) % span
+        return min(t, self.end_time - 1e-9)
+
+    def set_speed(self, speed):
+        """Change speed without jumping: the current session time is kept."""
+        now = self.session_time()
+        self.speed = float(np.clip(speed, MIN_SPEED, MAX_SPEED))
+        self._session_anchor = now
+        self._wall_anchor = self.clock()
+
+    def faster(self, factor=1.25):
+        self.set_speed(self.speed * factor)
+
+    def slower(self, factor=1.25):
+        self.set_speed(self.speed / factor)
+
+    def seek(self, frame):
+        """Jump to the start of a frame."""
+        self.start(self.times[int(np.clip(frame, 0, len(self.times) - 1))])
+
+    def invalidate(self):
+        """Make the next tick() return the due step even if it was already shown."""
+        self._last_step = None
+
+    def locate(self, t):
+        """(frame, substep) that is due at session time t."""
+        frame = int(np.searchsorted(self.times, t, side="right")) - 1
+        frame = min(max(frame, 0), len(self.times) - 1)
+        fraction = (t - self.times[frame]) / self.durations[frame]
+        substep = min(max(int(fraction * self.substeps), 0), self.substeps - 1)
+        return frame, substep
+
+    def tick(self):
+        """Return the latest due (frame, substep), or None if it was already shown."""
+        frame, substep = self.locate(self.session_time())
+        step = frame * self.substeps + substep
+        if step == self._last_step:
+            return None
+        if self._last_step is not None:
+            skipped = step - self._last_step - 1
+            if skipped < 0 and self.loop:
+                skipped %= self.total_steps
+            self.dropped += max(skipped, 0)
+        self._last_step = step
+        self._count_render()
+        return frame, substep
+
+    def _count_render(self):
+        now = self.clock()
+        if self._fps_start is None:
+            self._fps_start = now
+        self.rendered += 1
+        self._fps_count += 1
+        elapsed = now - self._fps_start
+        if elapsed >= STATS_INTERVAL:
+            self.fps = self._fps_count / elapsed
+            self._fps_count = 0
+            self._fps_start = now
+
+    def status(self):
+        return f"{self.speed:.2g}x  {self.fps:5.1f} fps  dropped {self.dropped}"
+
+
+def add_speed_keys(plotter, clock):
+    """Bind Up/Down to faster/slower playback on a PyVista plotter."""
+    plotter.add_key_event("Up", clock.faster)
+    plotter.add_key_event("Down", clock.slower)
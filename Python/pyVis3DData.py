@@ -1,13 +1,32 @@
 import os
+import argparse
 import pyvista as pv
 import pyvistaqt as pvqt
 import numpy as np
-import csv
 from PIL import Image
 
+from data_loader import load_session
+from time_index import read_window
+from interpolation import Interpolator
+from arm_renderer import ArmRenderer
+from playback import PlaybackClock, add_speed_keys
+from strokes import StrokeNavigator, add_stroke_keys, load_strokes
+from kinematics import forward_kinematics_hinged
+from live_stream import LiveStream, add_live_arguments, live_specs
+
 import tkinter as tk
 from tkinter import filedialog
 
+# Command line: replay a file (default) or --live to stream from the sensors
+LIVE_JOINTS = ("shoulder",)
+parser = argparse.ArgumentParser(description="3D arm viewer for shoulder angles.")
+add_live_arguments(parser, LIVE_JOINTS)
+parser.add_argument("--start", type=float, help="seconds into the file to start at (reads only that window)")
+parser.add_argument("--duration", type=float, help="seconds to show from --start (default: to the end)")
+args = parser.parse_args()
+live_sensors = live_specs(args, LIVE_JOINTS)
+live = None
+
 # open racket image file
 # --- Utility to select file ---
 def select_file():
@@ -24,13 +43,13 @@ def select_file():
     initial_dir = os.path.abspath("../Data/")
     file_path = filedialog.askopenfilename(
             title="Select a file",
-            filetypes=(("CSV files", "*.csv"), ("All files", "*.*")),
+            filetypes=(("CSV files", "*.csv"), ("Session files", "*.apms"), ("All files", "*.*")),
             initialdir = initial_dir
     )
     if file_path:
         return file_path
 
-filename = select_file()
+filename = select_file() if live_sensors is None else None
 
 
 
@@ -38,147 +57,140 @@ filename = select_file()
 UPPER_ARM_LENGTH = 0.5
 FOREARM_LENGTH = 0.5
 RACKET_LENGTH = 0
+SEGMENT_LENGTHS = (UPPER_ARM_LENGTH, FOREARM_LENGTH, RACKET_LENGTH)
 
 # Fixed shoulder position (origin)
 SHOULDER_POS = np.array([0.0, 0.0, 0.0])
 
 # Load CSV data (Expecting: shoulder_angle_x, shoulder_angle_y, shoulder_angle_z)
-frames = []
-with open(filename, 'r') as f:
-    reader = csv.reader(f)
-    for row in reader:
-        try:
-            shoulder_angle_x = float(row[0])
-            shoulder_angle_y = float(row[1])
-            shoulder_angle_z = float(row[2])
-        except:
-            continue  # Skip malformed rows
-        frames.append((shoulder_angle_x, shoulder_angle_y, shoulder_angle_z))
+# Any Data/ variant (or .apms session) loads as a (frames, joints, 3) array
+if live_sensors is None:
+    # --start/--duration read just that window through the file's time index
+    if args.start is None and args.duration is None:
+        session = load_session(filename)
+    else:
+        session = read_window(filename, args.start or 0.0, args.duration)
+    frames = session.angles[:, 0]
+else:
+    session, frames = None, []  # live: the dummy movement shows until sensor frames arrive
 
 # If no data, create dummy oscillating movement
-if not frames:
+if len(frames) == 0:
     t = np.linspace(0, 2*np.pi, 100)
     frames = [(30*np.sin(x), 30*np.cos(x), 15*np.sin(2*x)) for x in t]
 
+# Recorded sample times drive playback speed (declared rate when the file has none)
+frame_times = session.times() if session is not None and len(frames) == len(session) else None
+
 # Initialize angles
 frame_index = 0
-shoulder_angles = np.array(frames[frame_index])
 elbow_angle = 90.0
 wrist_angle = 180.0
 
-# Function to compute joint positions
-def compute_positions(shoulder_angles, elbow_deg, wrist_deg):
-    """Compute positions of elbow, wrist, and racket based on joint angles."""
-
-    # Convert angles to radians
-    shoulder_rad = np.radians(shoulder_angles)
-    elbow_rad = np.radians(elbow_deg)
-    wrist_rad = np.radians(wrist_deg)
-
-    # Compute elbow position (shoulder -> elbow direction)
-    elbow_pos = SHOULDER_POS + np.array([
-        UPPER_ARM_LENGTH * np.cos(shoulder_rad[0]) * np.cos(shoulder_rad[1]),
-        UPPER_ARM_LENGTH * np.sin(shoulder_rad[0]) * np.cos(shoulder_rad[1]),
-        UPPER_ARM_LENGTH * np.sin(shoulder_rad[1])
-    ])
-
-    # Compute wrist position (elbow -> wrist direction)
-    forearm_angle = np.radians(180.0 - elbow_deg)
-    wrist_pos = elbow_pos + np.array([
-        FOREARM_LENGTH * np.cos(forearm_angle) * np.cos(shoulder_rad[2]),
-        FOREARM_LENGTH * np.sin(forearm_angle) * np.cos(shoulder_rad[2]),
-        FOREARM_LENGTH * np.sin(shoulder_rad[2])
-    ])
-
-    # Compute racket position (wrist -> racket direction)
-    racket_angle = forearm_angle + np.radians(180.0 - wrist_deg)
-    racket_end_pos = wrist_pos + np.array([
-        RACKET_LENGTH * np.cos(racket_angle),
-        RACKET_LENGTH * np.sin(racket_angle),
-        0.0
-    ])
-
-    return elbow_pos, wrist_pos, racket_end_pos
+# Function to compute joint positions for the whole session in one pass
+def compute_positions():
+    """Return (frames, 3, 3) positions of elbow, wrist, and racket for the current hinge angles."""
+    return forward_kinematics_hinged(frames, elbow_angle, wrist_angle, SEGMENT_LENGTHS, SHOULDER_POS)
+
+positions = compute_positions()
 
 # Compute initial joint positions
-elbow_pos, wrist_pos, racket_end_pos = compute_positions(shoulder_angles, elbow_angle, wrist_angle)
+elbow_pos, wrist_pos, racket_end_pos = positions[frame_index]
 
 # Create PyVista plotter
 plotter = pvqt.BackgroundPlotter()
 plotter.set_background("white")
 
-# Create arm and racket meshes
-upper_line = pv.Line(SHOULDER_POS, elbow_pos)
-forearm_line = pv.Line(elbow_pos, wrist_pos)
-#racket_line = pv.Line(wrist_pos, racket_end_pos)
-
-# Add lines
-plotter.add_mesh(upper_line, color="brown", line_width=4, name="UpperArm")
-plotter.add_mesh(forearm_line, color="brown", line_width=4, name="Forearm")
-#plotter.add_mesh(racket_line, color="green", line_width=4, name="Racket")
-
-# Create joint markers
-shoulder_marker_actor = plotter.add_mesh(pv.Sphere(radius=0.01), color="red", name="Shoulder")
-elbow_marker_actor = plotter.add_mesh(pv.Sphere(radius=0.01), color="blue", name="Elbow")
-
-shoulder_marker_actor.SetPosition(*SHOULDER_POS)
-elbow_marker_actor.SetPosition(*elbow_pos)
-# wrist_marker_actor.SetPosition(*wrist_pos)
+# Create the arm: upper arm and forearm segments plus shoulder (red) and elbow (blue)
+# markers, all in one polydata that is updated with a single write per frame
+arm = ArmRenderer(plotter, n_points=3, glyph_points=(0, 1), segment_color="brown",
+                  glyph_colors=("red", "blue"), line_width=4, point_size=10)
+arm_points = np.empty((3, 3))  # shoulder, elbow, wrist
+arm_points[0] = SHOULDER_POS
+arm_points[1] = elbow_pos
+arm_points[2] = wrist_pos
+arm.update(arm_points)
 
 # Create plane for the image
 image_plane = pv.Plane(center=(0, 0.5, 0), direction=(0, 0, 1), i_size=1, j_size=1)  # Adjust center to connect handle
 image_plane.rotate_z(180)  # Rotate the plane to align the handle correctly
 image_plane_actor = plotter.add_mesh(image_plane, texture=image_texture, name="ImagePlane")
 
-# Function to interpolate positions
-def interpolate_positions(start, end, num_points=10):
-    """Interpolate positions between two points."""
-    line = pv.Line(start, end, resolution=num_points - 1)
-    return line.points
-
-# Update function with interpolation
-def update_scene():
-    global frame_index, elbow_angle, wrist_angle
-
-    # Get current and next frame data (shoulder angles)
-    current_angles = np.array(frames[frame_index])
-    next_frame_index = (frame_index + 1) % len(frames)
-    next_angles = np.array(frames[next_frame_index])
-
-    # Compute joint positions for current and next frames
-    current_elbow, current_wrist, current_racket_end = compute_positions(current_angles, elbow_angle, wrist_angle)
-    next_elbow, next_wrist, next_racket_end = compute_positions(next_angles, elbow_angle, wrist_angle)
-
-    # Interpolate positions
-    interpolated_elbow = interpolate_positions(current_elbow, next_elbow)
-    interpolated_wrist = interpolate_positions(current_wrist, next_wrist)
-    interpolated_racket = interpolate_positions(current_racket_end, next_racket_end)
+# Interpolated substeps between frames, generated lazily in bounded chunks
+NUM_SUBSTEPS = 10
+interpolator = Interpolator(positions, substeps=NUM_SUBSTEPS, timestamps=frame_times)
 
-    # Update line positions with interpolated points
-    for i in range(len(interpolated_elbow)):
-        upper_line.points[1] = interpolated_elbow[i]
-        forearm_line.points[0] = interpolated_elbow[i]
-        forearm_line.points[1] = interpolated_wrist[i]
-        # racket_line.points[0] = interpolated_wrist[i]
-        # racket_line.points[1] = interpolated_racket[i]
+# Wall-clock playback tied to the recorded sample times (Up/Down change speed 0.1x-10x)
+clock = PlaybackClock(frame_times, n_frames=len(positions), substeps=NUM_SUBSTEPS)
+add_speed_keys(plotter, clock)
 
-        elbow_marker_actor.SetPosition(*interpolated_elbow[i])
-        image_plane_actor.SetPosition(*interpolated_wrist[i])  # Connect handle to forearm
+# Stroke seeking from the capture's stroke index (Right/Left: next/previous stroke,
+# l: loop the stroke, i: skip the idle time between strokes)
+navigator = StrokeNavigator(clock, load_strokes(filename) if frame_times is not None else [])
+add_stroke_keys(plotter, navigator)
+stats_actor = plotter.add_text(clock.status(), position="upper_left", font_size=8, name="PlaybackStats")
 
-        plotter.update()  # Update the plotter for smooth animation
-
-    # Move to next frame
-    frame_index = next_frame_index
+# Update function with interpolation
+def update_scene():
+    if live is not None:
+        update_live()
+        return
+
+    # Only the latest due substep is drawn; stale ones are dropped
+    navigator.update()
+    due = clock.tick()
+    if due is None:
+        return
+    frame_index, substep = due
+
+    # Interpolated positions at this substep: elbow, wrist, racket end
+    interpolated_elbow, interpolated_wrist, interpolated_racket = interpolator.frame(frame_index)[substep]
+
+    # Update the whole arm with interpolated points
+    arm_points[1] = interpolated_elbow
+    arm_points[2] = interpolated_wrist
+    arm.update(arm_points)
+
+    image_plane_actor.SetPosition(*interpolated_wrist)  # Connect handle to forearm
+
+    stats_actor.SetText(2, f"{clock.status()}  {navigator.status()}")
+    plotter.update()
+
+# Live update: draw the newest sensor frame, skipping any older ones
+def update_live():
+    sample = live.latest()
+    if sample is None:
+        return
+    sample_time, angles = sample
+
+    # Positions for this one frame: elbow, wrist, racket end
+    elbow, wrist, racket_end = forward_kinematics_hinged(angles, elbow_angle, wrist_angle,
+                                                        SEGMENT_LENGTHS, SHOULDER_POS)[0]
+
+    arm_points[1] = elbow
+    arm_points[2] = wrist
+    arm.update(arm_points)
+    image_plane_actor.SetPosition(*wrist)  # Connect handle to forearm
+
+    stats_actor.SetText(2, live.status())
+    plotter.update()
+    live.rendered(sample_time)
 
 # Slider callbacks
 def on_elbow_slider(value):
-    global elbow_angle
+    global elbow_angle, positions, interpolator
     elbow_angle = value
+    positions = compute_positions()
+    interpolator = Interpolator(positions, substeps=NUM_SUBSTEPS, timestamps=frame_times)
+    clock.invalidate()
     update_scene()
 
 def on_wrist_slider(value):
-    global wrist_angle
+    global wrist_angle, positions, interpolator
     wrist_angle = value
+    positions = compute_positions()
+    interpolator = Interpolator(positions, substeps=NUM_SUBSTEPS, timestamps=frame_times)
+    clock.invalidate()
     update_scene()
 
 # Add sliders
@@ -188,7 +200,13 @@ plotter.add_slider_widget(on_wrist_slider, [0.0, 180.0], value=wrist_angle, titl
                           pointa=(0.025, 0.05), pointb=(0.31, 0.05))
 
 # Start animation loop
-plotter.add_callback(update_scene, interval=25)  # Runs update_scene every 50ms
+plotter.add_callback(update_scene, interval=10)  # Polls the playback clock every 10ms
+
+# Live mode: BLE runs on its own asyncio loop in a background thread
+if live_sensors is not None:
+    live = LiveStream(live_sensors, LIVE_JOINTS, args.rate).start()
 
 # Keep window open
-plotter.app.exec_()
\ No newline at end of file
+plotter.app.exec_()
+if live is not None:
+    live.stop()
\ No newline at end of file
@@ -1,13 +1,33 @@
 import os
+import argparse
 import pyvista as pv
 import pyvistaqt as pvqt
 import numpy as np
-import csv
 from PIL import Image
 
+from data_loader import load_session
+from time_index import read_window
+from interpolation import Interpolator
+from arm_renderer import ArmRenderer
+from playback import PlaybackClock, add_speed_keys
+from strokes import StrokeNavigator, add_stroke_keys, load_strokes
+from kinematics import forward_kinematics
+from live_stream import LiveStream, add_live_arguments, live_specs
+from kinematic_chain import KinematicChain
+
 import tkinter as tk
 from tkinter import filedialog
 
+# Command line: replay a file (default) or --live to stream from the sensors
+LIVE_JOINTS = ("shoulder", "elbow", "wrist")
+parser = argparse.ArgumentParser(description="3D arm viewer for shoulder, elbow and wrist angles.")
+add_live_arguments(parser, LIVE_JOINTS)
+parser.add_argument("--start", type=float, help="seconds into the file to start at (reads only that window)")
+parser.add_argument("--duration", type=float, help="seconds to show from --start (default: to the end)")
+args = parser.parse_args()
+live_sensors = live_specs(args, LIVE_JOINTS)
+live = None
+
 # open racket image file
 # --- Utility to select file ---
 def select_file():
@@ -24,13 +44,13 @@ def select_file():
     initial_dir = os.path.abspath("../Data/")
     file_path = filedialog.askopenfilename(
             title="Select a file",
-            filetypes=(("CSV files", "*.csv"), ("All files", "*.*")),
+            filetypes=(("CSV files", "*.csv"), ("Session files", "*.apms"), ("All files", "*.*")),
             initialdir = initial_dir
     )
     if file_path:
         return file_path
 
-filename = select_file()
+filename = select_file() if live_sensors is None else None
 
 
 
@@ -38,27 +58,31 @@ filename = select_file()
 UPPER_ARM_LENGTH = 0.5
 FOREARM_LENGTH = 0.5
 RACKET_LENGTH = 0
+SEGMENT_LENGTHS = (UPPER_ARM_LENGTH, FOREARM_LENGTH, RACKET_LENGTH)
 
 # Fixed shoulder position (origin)
 SHOULDER_POS = np.array([0.0, 0.0, 0.0])
 
+# Treat each joint's angles as a rotation relative to its parent segment
+# (quaternion chain) instead of an independent direction per segment
+USE_KINEMATIC_CHAIN = False
+
 # Load CSV data (Expecting: shoulder_angle_x, shoulder_angle_y, shoulder_angle_z,
 # elbow_angle_x, elbow_angle_y, elbow_angle_z,
 # wrist_angle_x, wrist_angle_y, wrist_angle_z)
-frames = []
-with open(filename, 'r') as f:
-    reader = csv.reader(f)
-    for row in reader:
-        try:
-            shoulder_angles = [float(row[0]), float(row[1]), float(row[2])]
-            elbow_angles = [float(row[3]), float(row[4]), float(row[5])]
-            wrist_angles = [float(row[6]), float(row[7]), float(row[8])]
-        except:
-            continue  # Skip malformed rows
-        frames.append((shoulder_angles, elbow_angles, wrist_angles))
+# Any Data/ variant (or .apms session) loads as a (frames, joints, 3) array
+if live_sensors is None:
+    # --start/--duration read just that window through the file's time index
+    if args.start is None and args.duration is None:
+        session = load_session(filename)
+    else:
+        session = read_window(filename, args.start or 0.0, args.duration)
+    frames = session.angles[:, :3] if session.n_joints >= 3 else []
+else:
+    session, frames = None, []  # live: the dummy movement shows until sensor frames arrive
 
 # If no data, create dummy oscillating movement
-if not frames:
+if len(frames) == 0:
     t = np.linspace(0, 2*np.pi, 100)
     frames = [
         (
@@ -69,111 +93,100 @@ if not frames:
         for x in t
     ]
 
-# Initialize angles
-frame_index = 0
-shoulder_angles, elbow_angles, wrist_angles = frames[frame_index]
-
-# Function to compute joint positions
-def compute_positions(shoulder_angles, elbow_angles, wrist_angles):
-    """Compute positions of elbow, wrist, and racket based on joint angles."""
-
-    # Convert angles to radians
-    shoulder_rad = np.radians(shoulder_angles)
-    elbow_rad = np.radians(elbow_angles)
-    wrist_rad = np.radians(wrist_angles)
-
-    # Compute elbow position (shoulder -> elbow direction)
-    elbow_pos = SHOULDER_POS + np.array([
-        UPPER_ARM_LENGTH * np.cos(shoulder_rad[0]) * np.cos(shoulder_rad[1]),
-        UPPER_ARM_LENGTH * np.sin(shoulder_rad[0]) * np.cos(shoulder_rad[1]),
-        UPPER_ARM_LENGTH * np.sin(shoulder_rad[1])
-    ])
-
-    # Compute wrist position (elbow -> wrist direction)
-    wrist_pos = elbow_pos + np.array([
-        FOREARM_LENGTH * np.cos(elbow_rad[0]) * np.cos(elbow_rad[1]),
-        FOREARM_LENGTH * np.sin(elbow_rad[0]) * np.cos(elbow_rad[1]),
-        FOREARM_LENGTH * np.sin(elbow_rad[1])
-    ])
-
-    # Compute racket position (wrist -> racket direction)
-    racket_end_pos = wrist_pos + np.array([
-        RACKET_LENGTH * np.cos(wrist_rad[0]) * np.cos(wrist_rad[1]),
-        RACKET_LENGTH * np.sin(wrist_rad[0]) * np.cos(wrist_rad[1]),
-        RACKET_LENGTH * np.sin(wrist_rad[1])
-    ])
-
-    return elbow_pos, wrist_pos, racket_end_pos
+# Recorded sample times drive playback speed (declared rate when the file has none)
+frame_times = session.times() if session is not None and len(frames) == len(session) else None
+
+# Compute joint positions for the whole session in one pass: (frames, 3, 3) = elbow, wrist, racket end
+if USE_KINEMATIC_CHAIN:
+    chain = KinematicChain(lengths=SEGMENT_LENGTHS, origin=SHOULDER_POS)
+    positions = chain.solve_euler(frames)[0][:, 1:]
+else:
+    positions = forward_kinematics(frames, SEGMENT_LENGTHS, SHOULDER_POS)
 
 # Compute initial joint positions
-elbow_pos, wrist_pos, racket_end_pos = compute_positions(shoulder_angles, elbow_angles, wrist_angles)
+frame_index = 0
+elbow_pos, wrist_pos, racket_end_pos = positions[frame_index]
 
 # Create PyVista plotter
 plotter = pvqt.BackgroundPlotter()
 plotter.set_background("white")
 
-# Create arm and racket meshes
-upper_line = pv.Line(SHOULDER_POS, elbow_pos)
-forearm_line = pv.Line(elbow_pos, wrist_pos)
-#racket_line = pv.Line(wrist_pos, racket_end_pos)
-
-# Add lines
-plotter.add_mesh(upper_line, color="brown", line_width=4, name="UpperArm")
-plotter.add_mesh(forearm_line, color="brown", line_width=4, name="Forearm")
-#plotter.add_mesh(racket_line, color="green", line_width=4, name="Racket")
-
-# Create joint markers
-shoulder_marker_actor = plotter.add_mesh(pv.Sphere(radius=0.01), color="red", name="Shoulder")
-elbow_marker_actor = plotter.add_mesh(pv.Sphere(radius=0.01), color="blue", name="Elbow")
-
-shoulder_marker_actor.SetPosition(*SHOULDER_POS)
-elbow_marker_actor.SetPosition(*elbow_pos)
-# wrist_marker_actor.SetPosition(*wrist_pos)
+# Create the arm: upper arm and forearm segments plus shoulder (red) and elbow (blue)
+# markers, all in one polydata that is updated with a single write per frame
+arm = ArmRenderer(plotter, n_points=3, glyph_points=(0, 1), segment_color="brown",
+                  glyph_colors=("red", "blue"), line_width=4, point_size=10)
+arm_points = np.empty((3, 3))  # shoulder, elbow, wrist
+arm_points[0] = SHOULDER_POS
+arm_points[1] = elbow_pos
+arm_points[2] = wrist_pos
+arm.update(arm_points)
 
 # Create plane for the image
 image_plane = pv.Plane(center=(0, 0.5, 0), direction=(0, 0, 1), i_size=1, j_size=1)  # Adjust center to connect handle
 image_plane.rotate_z(180)  # Rotate the plane to align the handle correctly
 image_plane_actor = plotter.add_mesh(image_plane, texture=image_texture, name="ImagePlane")
 
-# Function to interpolate positions
-def interpolate_positions(start, end, num_points=10):
-    """Interpolate positions between two points."""
-    line = pv.Line(start, end, resolution=num_points - 1)
-    return line.points
+# Interpolated substeps between frames, generated lazily in bounded chunks
+NUM_SUBSTEPS = 10
+interpolator = Interpolator(positions, substeps=NUM_SUBSTEPS, timestamps=frame_times)
 
-# Update function with interpolation
-def update_scene():
-    global frame_index
-
-    # Get current and next frame data (angles)
-    current_angles = frames[frame_index]
-    next_frame_index = (frame_index + 1) % len(frames)
-    next_angles = frames[next_frame_index]
-
-    # Compute joint positions for current and next frames
-    current_elbow, current_wrist, current_racket_end = compute_positions(*current_angles)
-    next_elbow, next_wrist, next_racket_end = compute_positions(*next_angles)
-
-    # Interpolate positions
-    interpolated_elbow = interpolate_positions(current_elbow, next_elbow)
-    interpolated_wrist = interpolate_positions(current_wrist, next_wrist)
-    interpolated_racket = interpolate_positions(current_racket_end, next_racket_end)
+# Wall-clock playback tied to the recorded sample times (Up/Down change speed 0.1x-10x)
+clock = PlaybackClock(frame_times, n_frames=len(positions), substeps=NUM_SUBSTEPS)
+add_speed_keys(plotter, clock)
 
-    # Update line positions with interpolated points
-    for i in range(len(interpolated_elbow)):
-        upper_line.points[1] = interpolated_elbow[i]
-        forearm_line.points[0] = interpolated_elbow[i]
-        forearm_line.points[1] = interpolated_wrist[i]
-        # racket_line.points[0] = interpolated_wrist[i]
-        # racket_line.points[1] = interpolated_racket[i]
+# Stroke seeking from the capture's stroke index (Right/Left: next/previous stroke,
+# l: loop the stroke, i: skip the idle time between strokes)
+navigator = StrokeNavigator(clock, load_strokes(filename) if frame_times is not None else [])
+add_stroke_keys(plotter, navigator)
+stats_actor = plotter.add_text(clock.status(), position="upper_left", font_size=8, name="PlaybackStats")
 
-        elbow_marker_actor.SetPosition(*interpolated_elbow[i])
-        image_plane_actor.SetPosition(*interpolated_wrist[i])  # Connect handle to forearm
-
-        plotter.update()  # Update the plotter for smooth animation
-
-    # Move to next frame
-    frame_index = next_frame_index
+# Update function with interpolation
+def update_scene():
+    if live is not None:
+        update_live()
+        return
+
+    # Only the latest due substep is drawn; stale ones are dropped
+    navigator.update()
+    due = clock.tick()
+    if due is None:
+        return
+    frame_index, substep = due
+
+    # Interpolated positions at this substep: elbow, wrist, racket end
+    interpolated_elbow, interpolated_wrist, interpolated_racket = interpolator.frame(frame_index)[substep]
+
+    # Update the whole arm with interpolated points
+    arm_points[1] = interpolated_elbow
+    arm_points[2] = interpolated_wrist
+    arm.update(arm_points)
+
+    image_plane_actor.SetPosition(*interpolated_wrist)  # Connect handle to forearm
+
+    stats_actor.SetText(2, f"{clock.status()}  {navigator.status()}")
+    plotter.update()
+
+# Live update: draw the newest sensor frame, skipping any older ones
+def update_live():
+    sample = live.latest()
+    if sample is None:
+        return
+    sample_time, angles = sample
+
+    # Positions for this one frame: elbow, wrist, racket end
+    if USE_KINEMATIC_CHAIN:
+        elbow, wrist, racket_end = chain.solve_euler(angles[None])[0][0, 1:]
+    else:
+        elbow, wrist, racket_end = forward_kinematics(angles[None], SEGMENT_LENGTHS, SHOULDER_POS)[0]
+
+    arm_points[1] = elbow
+    arm_points[2] = wrist
+    arm.update(arm_points)
+    image_plane_actor.SetPosition(*wrist)  # Connect handle to forearm
+
+    stats_actor.SetText(2, live.status())
+    plotter.update()
+    live.rendered(sample_time)
 
 # # Slider callbacks
 # def on_elbow_slider(value):
@@ -193,7 +206,13 @@ def update_scene():
 #                           pointa=(0.025, 0.05), pointb=(0.31, 0.05))
 
 # Start animation loop
-plotter.add_callback(update_scene, interval=25)  # Runs update_scene every 50ms
+plotter.add_callback(update_scene, interval=10)  # Polls the playback clock every 10ms
+
+# Live mode: BLE runs on its own asyncio loop in a background thread
+if live_sensors is not None:
+    live = LiveStream(live_sensors, LIVE_JOINTS, args.rate).start()
 
 # Keep window open
 plotter.app.exec_()
+if live is not None:
+    live.stop()
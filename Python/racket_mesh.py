@@ -0,0 +1,95 @@
+import numpy as np
+from PIL import Image
+
+# Textured racket surface for racketVis.
+#
+# The racket is a flat grid of quads coloured from an image. Rotated facet
+# vertices are computed for many frames at once as float32 arrays and handed
+# straight to the Poly3DCollection, so a frame update is an array lookup
+# rather than a rebuild through nested Python lists. The texture resolution
+# (level of detail) sets the number of quads: size x size pixels -> (size-1)^2.
+
+DEFAULT_TEXTURE_SIZE = 100
+RACKET_HALF_WIDTH = 5.0        # grid spans -5..5 in x and y
+HANDLE_PIVOT = (0.0, 5.0, 0.0)  # rotate about the handle, not the centre
+CHUNK_FRAMES = 64               # frames of vertices kept in memory at a time
+BACKGROUND_THRESHOLD = 0.05     # nearly black pixels become transparent
+
+
+def load_texture(path, size=DEFAULT_TEXTURE_SIZE, threshold=BACKGROUND_THRESHOLD):
+    """RGBA texture in [0, 1] at size x size, with a black background made transparent."""
+    image = Image.open(path).convert("RGB").resize((size, size))
+    rgba = np.ones((size, size, 4))
+    rgba[..., :3] = np.asarray(image, dtype=np.float64) / 255.0
+    rgba[np.all(rgba[..., :3] < threshold, axis=-1), 3] = 0
+    return rgba
+
+
+def make_grid(rows, cols, half_width=RACKET_HALF_WIDTH):
+    """Flat x, y, z grids of shape (rows, cols)."""
+    x, y = np.meshgrid(np.linspace(-half_width, half_width, cols),
+                       np.linspace(-half_width, half_width, rows))
+    return x, y, np.zeros_like(x)
+
+
+def facet_indices(rows, cols):
+    """(facets, 4) point indices of every grid quad, in compute_facets order."""
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    return np.stack([ids[:-1, :-1], ids[:-1, 1:], ids[1:, 1:], ids[1:, :-1]], axis=-1).reshape(-1, 4)
+
+
+def compute_facets(xgrid, ygrid, zgrid):
+    """(facets, 4, 3) quad vertices of a grid."""
+    points = np.stack([xgrid.ravel(), ygrid.ravel(), zgrid.ravel()], axis=-1)
+    return points[facet_indices(*xgrid.shape)]
+
+
+def compute_facet_colors(image_arr):
+    """(facets, 4) RGBA per quad: the mean of its four corner pixels."""
+    colors = (image_arr[:-1, :-1, :] +
+              image_arr[:-1, 1:, :] +
+              image_arr[1:, :-1, :] +
+              image_arr[1:, 1:, :]) / 4.0
+    return colors.reshape(-1, 4)
+
+
+class FacetCache:
+    """Rotated facet vertices for every frame, produced in float32 chunks.
+
+    rotations: (frames, 3, 3) matrices; grid: (x, y, z) arrays of the flat
+    racket. Only the grid points are rotated (each is shared by up to four
+    quads); facets are then gathered with a fixed index array.
+    """
+
+    def __init__(self, rotations, grid, pivot=HANDLE_PIVOT, chunk_frames=CHUNK_FRAMES, dtype=np.float32):
+        x, y, z = grid
+        self.rotations = np.asarray(rotations, dtype=dtype)
+        self.pivot = np.asarray(pivot, dtype=dtype)
+        self.points = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=-1).astype(dtype) - self.pivot
+        self.indices = facet_indices(*x.shape)
+        self.chunk_frames = int(chunk_frames)
+
+        self._cached_start = None
+        self._cached = None
+
+    def __len__(self):
+        return len(self.rotations)
+
+    @property
+    def n_facets(self):
+        return len(self.indices)
+
+    def compute(self, start, stop):
+        """(stop - start, facets, 4, 3) vertices for frames [start, stop)."""
+        # (n, points, 3): p' = R p for every point, i.e. p @ R^T
+        rotated = np.matmul(self.points, self.rotations[start:stop].transpose(0, 2, 1))
+        rotated += self.pivot
+        return rotated[:, self.indices]
+
+    def frame(self, index):
+        """(facets, 4, 3) vertices for one frame, from the cached chunk."""
+        start = index - index % self.chunk_frames
+        if self._cached_start != start:
+            self._cached = self.compute(start, min(start + self.chunk_frames, len(self)))
+            self._cached_start = start
+        return self._cached[index - start]
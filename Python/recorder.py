@@ -0,0 +1,266 @@
+import argparse
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from session_format import DTYPE_CODES, DTYPE_LOOKUP, SESSION_SUFFIX, SessionWriter
+
+# Append-only session log for the live BLE pipeline (.aplog).
+#
+# Layout:
+#   [0, HEADER_SIZE)   file header (LOG_HEADER_STRUCT)
+#   chunk, chunk, ...  CHUNK_STRUCT header + zlib payload
+#
+# A chunk's payload is its samples' host times (float64), sequence numbers
+# (int64) and values (channels of the header's dtype), column after column,
+# compressed together. The chunk header carries the payload's size and CRC,
+# so after a crash the last chunk that was only partly written is detected
+# and cut off; everything before it is intact.
+#
+# The Recorder is a blocking reader of the live RingBuffer. A background
+# thread takes what has arrived, compresses it and appends it as one chunk,
+# and fsyncs in batches, so the BLE callbacks never wait on the disk.
+#
+#   python BLEConnection.py --record practice.aplog
+#   python recorder.py practice.aplog --convert     # -> practice.apms
+
+LOG_SUFFIX = ".aplog"
+LOG_MAGIC = b"APML"
+LOG_VERSION = 1
+HEADER_SIZE = 64
+CHUNK_MAGIC = b"CHNK"
+
+# magic, version, header size, channels, dtype code, sample rate, created (epoch seconds)
+LOG_HEADER_STRUCT = struct.Struct("<4sHHHB5xdd")
+# magic, samples, payload bytes, first sequence number, CRC-32 of the payload
+CHUNK_STRUCT = struct.Struct("<4sIIqI")
+
+CHUNK_SAMPLES = 4096   # write a chunk once this many samples are waiting...
+MAX_CHUNK_AGE = 1.0    # ...or once the oldest of them is this many seconds old
+FSYNC_INTERVAL = 2.0   # seconds between fsyncs; at most this much is lost on power failure
+POLL_INTERVAL = 0.05
+COMPRESSION_LEVEL = 1  # fast; sensor data compresses about as well at higher levels
+
+
+class LogFormatError(Exception):
+    pass
+
+
+def _pack_header(channels, dtype, sample_rate, created):
+    header = LOG_HEADER_STRUCT.pack(LOG_MAGIC, LOG_VERSION, HEADER_SIZE, channels,
+                                    DTYPE_LOOKUP[dtype], sample_rate, created)
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def read_log_header(f):
+    raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise LogFormatError("truncated log header")
+    magic, version, header_size, channels, dtype_code, sample_rate, created = LOG_HEADER_STRUCT.unpack_from(raw)
+    if magic != LOG_MAGIC:
+        raise LogFormatError("not a session log")
+    if version != LOG_VERSION or header_size != HEADER_SIZE:
+        raise LogFormatError(f"unsupported log version {version}")
+    if dtype_code not in DTYPE_CODES:
+        raise LogFormatError(f"unknown value type {dtype_code}")
+    return {"channels": channels, "dtype": DTYPE_CODES[dtype_code],
+            "sample_rate": sample_rate, "created": created}
+
+
+def encode_chunk(times, seqs, values, level=COMPRESSION_LEVEL):
+    payload = zlib.compress(b"".join([np.ascontiguousarray(times, dtype="<f8").tobytes(),
+                                      np.ascontiguousarray(seqs, dtype="<i8").tobytes(),
+                                      np.ascontiguousarray(values).tobytes()]), level)
+    first = int(seqs[0]) if len(seqs) else 0
+    return CHUNK_STRUCT.pack(CHUNK_MAGIC, len(times), len(payload), first, zlib.crc32(payload)) + payload
+
+
+def decode_chunk(payload, n, channels, dtype):
+    raw = zlib.decompress(payload)
+    times = np.frombuffer(raw, dtype="<f8", count=n)
+    seqs = np.frombuffer(raw, dtype="<i8", count=n, offset=8 * n)
+    values = np.frombuffer(raw, dtype=dtype, count=n * channels, offset=16 * n).reshape(n, channels)
+    return times, seqs, values
+
+
+def scan_chunks(f):
+    """Yields (offset, samples, payload) of every intact chunk, stopping at the first bad one."""
+    offset = f.tell()
+    while True:
+        raw = f.read(CHUNK_STRUCT.size)
+        if len(raw) < CHUNK_STRUCT.size:
+            return
+        magic, n, size, _, crc = CHUNK_STRUCT.unpack(raw)
+        if magic != CHUNK_MAGIC:
+            return
+        payload = f.read(size)
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        yield offset, n, payload
+        offset = f.tell()
+
+
+def recover(path):
+    """Cut off a partly written last chunk. Returns (chunks, samples, bytes removed)."""
+    with open(path, "r+b") as f:
+        read_log_header(f)
+        end = HEADER_SIZE
+        chunks = samples = 0
+        for offset, n, payload in scan_chunks(f):
+            end = offset + CHUNK_STRUCT.size + len(payload)
+            chunks += 1
+            samples += n
+        size = os.fstat(f.fileno()).st_size
+        if size > end:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return chunks, samples, size - end
+
+
+def read_log(path):
+    """(header, times, seqs, values) of every intact chunk, concatenated."""
+    with open(path, "rb") as f:
+        header = read_log_header(f)
+        parts = [decode_chunk(payload, n, header["channels"], header["dtype"]) for _, n, payload in scan_chunks(f)]
+    if not parts:
+        return header, np.empty(0), np.empty(0, dtype=np.int64), np.empty((0, header["channels"]), header["dtype"])
+    return (header,) + tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def convert(path, dst=None, joints=1):
+    """Write a log's frames to a .apms session (channels split evenly over joints)."""
+    header, times, _, values = read_log(path)
+    if dst is None:
+        dst = os.path.splitext(path)[0] + SESSION_SUFFIX
+    channels = header["channels"] // joints
+    with SessionWriter(dst, len(values), joints, channels, True, sample_rate=header["sample_rate"],
+                       dtype=header["dtype"]) as writer:
+        if len(values):
+            writer.write(values.reshape(len(values), joints, channels), times)
+    return dst
+
+
+class Recorder:
+    """Appends everything written to a RingBuffer to a session log, off the event loop.
+
+    Existing logs are recovered and appended to. The ring reader is blocking,
+    so a ring with the "drop" policy never overwrites unrecorded samples.
+    """
+
+    def __init__(self, path, ring, sample_rate=0.0, chunk_samples=CHUNK_SAMPLES,
+                 max_chunk_age=MAX_CHUNK_AGE, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.ring = ring
+        self.chunk_samples = chunk_samples
+        self.max_chunk_age = max_chunk_age
+        self.fsync_interval = fsync_interval
+        dtype = np.dtype(ring.values.dtype).newbyteorder("<")
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                header = read_log_header(f)
+            if header["channels"] != ring.channels or header["dtype"] != dtype:
+                raise LogFormatError(f"{path}: log has {header['channels']} {header['dtype']} channels, "
+                                     f"ring has {ring.channels} {dtype}")
+            _, _, self.recovered_bytes = recover(path)
+            self._file = open(path, "ab")
+        else:
+            self.recovered_bytes = 0
+            self._file = open(path, "wb")
+            self._file.write(_pack_header(ring.channels, dtype, sample_rate, time.time()))
+
+        self.reader = ring.reader("recorder", blocking=True)
+        self.chunks = 0
+        self.samples = 0
+        self.bytes = 0
+        self.fsyncs = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _write_chunk(self):
+        times, seqs, values = self.reader.read_all()
+        if not len(times):
+            return
+        data = encode_chunk(times, seqs, values)
+        self._file.write(data)
+        self.chunks += 1
+        self.samples += len(times)
+        self.bytes += len(data)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+
+    def _run(self):
+        waiting_since = None
+        last_sync = time.monotonic()
+        try:
+            while not self._stop.wait(POLL_INTERVAL):
+                now = time.monotonic()
+                if self.reader.available:
+                    waiting_since = waiting_since or now
+                    if self.reader.available >= self.chunk_samples or now - waiting_since >= self.max_chunk_age:
+                        self._write_chunk()
+                        waiting_since = None
+                if now - last_sync >= self.fsync_interval:
+                    self._sync()
+                    last_sync = now
+            self._write_chunk()
+            self._sync()
+        except OSError as e:
+            self.error = e
+            print(f"Recorder stopped: {e}")
+        finally:
+            self._file.close()
+            self.ring.remove_reader(self.reader)
+
+    def close(self):
+        """Write what is left, fsync and stop the thread."""
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def ratio(self):
+        raw = self.samples * (16 + self.ring.channels * self.ring.values.itemsize)
+        return raw / self.bytes if self.bytes else 0.0
+
+    def status(self):
+        return (f"recorded {self.samples} samples in {self.chunks} chunks, {self.bytes / 1e6:.2f} MB "
+                f"({self.ratio:.1f}x), {self.fsyncs} fsyncs, overruns {self.reader.overruns}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, repair or convert a recorded session log.")
+    parser.add_argument("log", help=f"{LOG_SUFFIX} file")
+    parser.add_argument("--recover", action="store_true", help="cut off a partly written last chunk")
+    parser.add_argument("--convert", nargs="?", const="", metavar="OUT",
+                        help=f"write the frames to a {SESSION_SUFFIX} session")
+    parser.add_argument("--joints", type=int, default=1, help="joints the channels are split over")
+    args = parser.parse_args()
+
+    if args.recover:
+        chunks, samples, removed = recover(args.log)
+        print(f"{chunks} intact chunks, {samples} samples; removed {removed} bytes")
+    header, times, seqs, _ = read_log(args.log)
+    span = times[-1] - times[0] if len(times) else 0.0
+    print(f"{len(times)} samples, {header['channels']} channels, {span:.1f} s "
+          f"(recorded {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['created']))})")
+    if len(seqs) > 1:
+        print(f"sequence {seqs[0]}..{seqs[-1]}, {int(np.sum(np.diff(seqs) > 1))} gaps")
+    if args.convert is not None:
+        print(f"Wrote {convert(args.log, args.convert or None, args.joints)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import time
+
+import numpy as np
+
+from data_loader import load_session
+from session_format import DEFAULT_SAMPLE_RATE, write_session
+
+# Puts separately recorded joint streams on one common time grid.
+#
+# Every stream keeps its own sample times: real timestamps where the capture
+# has them (ISO stamps, host arrival times from a recorder log), otherwise
+# i / sample_rate. Angles are interpolated the short way round, so a heading
+# going 359 -> 1 passes through 0 rather than sweeping back through 180, and
+# wrapped into their original range again afterwards. All columns of a stream
+# are interpolated at once with one searchsorted over the grid.
+#
+#   python resample.py "../Data/Bella shoulder1.csv" "../Data/Bella elbow 1.csv" "../Data/Bella wrist 1.csv" -o bella.apms
+
+SPANS = ("union", "overlap")
+
+
+def stream_times(session, sample_rate=None):
+    """(frames,) seconds: the session's timestamps, or frame / sample_rate without them.
+
+    Aligned sessions always keep their timestamps: the offset was measured
+    against those times.
+    """
+    if session.timestamps is not None and (sample_rate is None or session.offset is not None):
+        return np.asarray(session.timestamps, dtype=np.float64)
+    rate = sample_rate or session.sample_rate or DEFAULT_SAMPLE_RATE
+    return np.arange(len(session), dtype=np.float64) / rate
+
+
+def clean_times(times, values):
+    """Sorted, strictly increasing times (duplicates keep their first sample).
+
+    Samples with a missing (NaN) channel, e.g. incomplete live frames, are dropped.
+    """
+    complete = ~np.isnan(values.reshape(len(values), -1)).any(axis=1)
+    if not complete.all():
+        times, values = times[complete], values[complete]
+    if np.all(np.diff(times) > 0):  # the usual case; skip the sort
+        return times, values
+    times, first = np.unique(times, return_index=True)
+    return times, values[first]
+
+
+def wrap_like(values, reference):
+    """Wrap degrees into [0, 360) for columns whose reference is never negative, else [-180, 180)."""
+    nonnegative = np.nanmin(reference, axis=0) >= 0 if len(reference) else np.zeros(values.shape[1:], bool)
+    low = np.where(nonnegative, 0.0, -180.0)
+    return values - 360.0 * np.floor((values - low) / 360.0)
+
+
+def resample_angles(times, angles, grid):
+    """Wrap-aware linear interpolation of (frames, ...) degrees at the grid times.
+
+    Each step is taken the short way round (359 -> 1 is +2 degrees), so no
+    full unwrap of the stream is needed. Grid times outside the stream's span
+    hold its first or last value.
+    """
+    angles = np.asarray(angles, dtype=np.float64)
+    if len(times) == 1:
+        return np.repeat(angles, len(grid), axis=0)
+
+    right = np.clip(np.searchsorted(times, grid, side="right"), 1, len(times) - 1)
+    left = right - 1
+    w = np.clip((grid - times[left]) / (times[right] - times[left]), 0.0, 1.0)
+    w = w.reshape((-1,) + (1,) * (angles.ndim - 1))
+    start = angles[left]
+    step = angles[right] - start
+    step -= 360.0 * np.round(step / 360.0)
+    step *= w
+    step += start
+    return wrap_like(step, angles)
+
+
+def common_grid(streams, sample_rate=None, span="union"):
+    """Uniform grid over the streams' time spans (all of them, or where they all overlap).
+
+    The grid rate defaults to the fastest stream's median rate.
+    """
+    if span not in SPANS:
+        raise ValueError(f"span must be one of {SPANS}, got {span!r}")
+    starts = [t[0] for t, _ in streams]
+    ends = [t[-1] for t, _ in streams]
+    start, end = (min(starts), max(ends)) if span == "union" else (max(starts), min(ends))
+    if end < start:
+        raise ValueError("the streams do not overlap in time")
+    if sample_rate is None:
+        steps = [np.median(np.diff(t)) for t, _ in streams if len(t) > 1]
+        sample_rate = 1.0 / min(steps) if steps else DEFAULT_SAMPLE_RATE
+    return start + np.arange(int(np.floor((end - start) * sample_rate + 1e-9)) + 1) / sample_rate
+
+
+def merge_streams(streams, sample_rate=None, span="union"):
+    """(grid, (grid frames, streams, channels)) from a list of (times, (frames, channels) angles)."""
+    streams = [clean_times(np.asarray(t, dtype=np.float64), np.asarray(a)) for t, a in streams]
+    grid = common_grid(streams, sample_rate, span)
+    merged = np.stack([resample_angles(t, a, grid) for t, a in streams], axis=1)
+    return grid, merged
+
+
+def merge_sessions(sessions, joint=0, sample_rate=None, span="union", grid_rate=None):
+    """Merge one joint from each session into (grid, (frames, sessions, channels)).
+
+    Timestamped sessions are aligned on their absolute times. If any session
+    lacks timestamps, every stream starts at 0 and untimed ones use
+    sample_rate (or their declared rate); sessions aligned by align_joints.py
+    keep their offset times either way. grid_rate sets the output rate.
+    """
+    times = [stream_times(s, sample_rate) for s in sessions]
+    if any(s.timestamps is None for s in sessions) or sample_rate is not None:
+        times = [t if s.offset is not None else t - t[0] for t, s in zip(times, sessions)]
+    streams = [(t, np.asarray(s.angles[:, joint])) for t, s in zip(times, sessions)]
+    return merge_streams(streams, grid_rate, span)
+
+
+def describe_spans(sessions, grid, sample_rate=None):
+    """One line per session: frames and duration, to show what the merge had to fill in."""
+    lines = []
+    for s in sessions:
+        t = stream_times(s, sample_rate)
+        lines.append(f"{s.path}: {len(t)} frames over {t[-1] - t[0]:.2f} s")
+    lines.append(f"merged: {len(grid)} frames over {grid[-1] - grid[0]:.2f} s")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-joint captures onto one common time grid.")
+    parser.add_argument("files", nargs="+", help="one capture per joint, in joint order")
+    parser.add_argument("-o", "--output", help="write the merged session (.apms)")
+    parser.add_argument("--sample-rate", type=float, help="declared rate of captures without timestamps")
+    parser.add_argument("--grid-rate", type=float, help="output rate (default: the fastest input)")
+    parser.add_argument("--span", choices=SPANS, default="union",
+                        help="cover every stream (holding the ends of shorter ones) or only their overlap")
+    args = parser.parse_args()
+
+    sessions = [load_session(path) for path in args.files]
+    start = time.perf_counter()
+    grid, merged = merge_sessions(sessions, sample_rate=args.sample_rate, span=args.span, grid_rate=args.grid_rate)
+    elapsed = time.perf_counter() - start
+    print("\n".join(describe_spans(sessions, grid, args.sample_rate)))
+    print(f"merged in {1000 * elapsed:.1f} ms")
+    if args.output:
+        write_session(args.output, merged, grid, sample_rate=1.0 / np.median(np.diff(grid)) if len(grid) > 1 else 0.0)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+
+# Fixed-capacity ring buffer for live sensor samples.
+#
+# Samples are stored column-wise in preallocated arrays (host time, sequence
+# number, channels), so a sample costs no Python objects and memory is fixed
+# for the whole session. There is one writer (the BLE client) and any number
+# of readers (recorder, analyzer, live viewer), each with its own cursor; a
+# read returns views into the buffer, not copies.
+#
+# Positions are absolute sample counts; the slot of position p is
+# p % capacity. When the writer laps a reader, the reader skips ahead to the
+# oldest sample still held and counts the skipped samples as an overrun.
+#
+# Drop policies when a blocking reader (e.g. the recorder) would be overrun:
+#   "overwrite"  keep writing; the oldest samples are lost for slow readers
+#   "drop"       discard the new samples instead and count them as dropped
+
+POLICIES = ("overwrite", "drop")
+
+
+def capacity_for(hours, sample_rate):
+    """Samples needed to hold `hours` of data at sample_rate Hz."""
+    return int(np.ceil(hours * 3600.0 * sample_rate))
+
+
+class RingReader:
+    """Cursor of one reader. Use RingBuffer.reader() to create it."""
+
+    def __init__(self, ring, name, blocking):
+        self.ring = ring
+        self.name = name
+        self.blocking = blocking
+        self.cursor = ring.head  # new readers start with the next sample
+        self.overruns = 0
+
+    @property
+    def available(self):
+        return min(self.ring.head - self.cursor, self.ring.capacity)
+
+    @property
+    def fill(self):
+        """Fraction of the buffer this reader has yet to consume."""
+        return self.available / self.ring.capacity
+
+    def _catch_up(self):
+        head = self.ring.head
+        oldest = head - self.ring.capacity
+        if self.cursor < oldest:
+            self.overruns += oldest - self.cursor
+            self.cursor = oldest
+        return head
+
+    def read(self, max_samples=None):
+        """(time, seq, values) views of the next contiguous run of unread samples.
+
+        Returns at most up to the end of the underlying arrays, so call again
+        (or use read_all) after a wrap. The views stay valid until the writer
+        laps them; copy anything that has to outlive that.
+        """
+        head = self._catch_up()
+        start = self.cursor % self.ring.capacity
+        n = min(head - self.cursor, self.ring.capacity - start)
+        if max_samples is not None:
+            n = min(n, max_samples)
+        self.cursor += n
+        ring = self.ring
+        return ring.time[start:start + n], ring.seq[start:start + n], ring.values[start:start + n]
+
+    def read_all(self):
+        """Every unread sample as (time, seq, values) copies, across the wrap."""
+        parts = [self.read()]
+        if self.available:
+            parts.append(self.read())
+        if len(parts) == 1:
+            return tuple(np.array(a) for a in parts[0])
+        return tuple(np.concatenate(a) for a in zip(*parts))
+
+    def latest(self):
+        """(time, seq, values) of the newest sample, or None if nothing new was written.
+
+        Everything older is marked as read, which is what a live display wants.
+        """
+        head = self.ring.head
+        if head == self.cursor:
+            return None
+        self.cursor = head
+        i = (head - 1) % self.ring.capacity
+        return self.ring.time[i], self.ring.seq[i], self.ring.values[i]
+
+    def skip(self):
+        """Drop everything unread (e.g. a live viewer that only wants the newest sample)."""
+        self._catch_up()
+        self.cursor = self.ring.head
+
+
+class RingBuffer:
+    """Single-writer, multi-reader ring of (time, seq, channels) samples."""
+
+    def __init__(self, capacity, channels, dtype=np.float32, policy="overwrite"):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, got {policy!r}")
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.policy = policy
+
+        self.time = np.zeros(self.capacity, dtype=np.float64)
+        self.seq = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros((self.capacity, channels), dtype=dtype)
+
+        self.head = 0      # total samples ever written
+        self.dropped = 0   # samples rejected under the "drop" policy
+        self.readers = []
+        self._lock = threading.Lock()  # guards the reader list only
+        self.closed = False
+
+    @property
+    def nbytes(self):
+        return self.time.nbytes + self.seq.nbytes + self.values.nbytes
+
+    def reader(self, name="", blocking=False):
+        """Register a reader. Blocking readers are protected by the "drop" policy."""
+        with self._lock:
+            r = RingReader(self, name, blocking)
+            self.readers.append(r)
+        return r
+
+    def remove_reader(self, reader):
+        with self._lock:
+            self.readers.remove(reader)
+
+    def _space(self):
+        """Samples that can be written without overrunning a blocking reader."""
+        tails = [r.cursor for r in self.readers if r.blocking]
+        if not tails:
+            return self.capacity
+        return self.capacity - (self.head - min(tails))
+
+    def write(self, t, seq, values):
+        """Append one sample. Returns False if it was dropped."""
+        if self.policy == "drop" and self._space() < 1:
+            self.dropped += 1
+            return False
+        i = self.head % self.capacity
+        self.time[i] = t
+        self.seq[i] = seq
+        self.values[i] = values
+        self.head += 1  # publish after the data is in place
+        return True
+
+    def write_many(self, times, seqs, values):
+        """Append a block of samples. Returns the number written."""
+        n = len(values)
+        if self.policy == "drop":
+            space = max(self._space(), 0)
+            if n > space:
+                self.dropped += n - space
+                n = space
+        if n > self.capacity:  # only the newest capacity samples can survive
+            skip = n - self.capacity
+            times, seqs, values = times[skip:n], seqs[skip:n], values[skip:n]
+            self.head += skip
+            n = self.capacity
+        start = self.head % self.capacity
+        first = min(n, self.capacity - start)
+        self.time[start:start + first] = times[:first]
+        self.seq[start:start + first] = seqs[:first]
+        self.values[start:start + first] = values[:first]
+        rest = n - first
+        if rest:
+            self.time[:rest] = times[first:n]
+            self.seq[:rest] = seqs[first:n]
+            self.values[:rest] = values[first:n]
+        self.head += n
+        return n
+
+    def close(self):
+        """Mark the end of the stream for readers."""
+        self.closed = True
+
+    def fill(self):
+        """Fill level as seen by the slowest reader (0..1)."""
+        if not self.readers:
+            return min(self.head, self.capacity) / self.capacity
+        return max(r.fill for r in self.readers)
+
+    @property
+    def overruns(self):
+        return sum(r.overruns for r in self.readers)
+
+    def status(self):
+        return (f"fill {100 * self.fill():.0f}%  written {self.head}  dropped {self.dropped}  "
+                f"overruns {self.overruns}")
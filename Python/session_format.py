@@ -0,0 +1,268 @@
+import os
+import struct
+import argparse
+
+import numpy as np
+
+# Binary columnar session container (.apms)
+#
+# Layout:
+#   [0, HEADER_SIZE)      fixed-width header (see HEADER_STRUCT + joint names)
+#   angle columns         one contiguous column per (joint, channel), n_frames values each
+#   timestamp column      optional float64 seconds, n_frames values, 8-byte aligned
+#
+# Every column is contiguous on disk, so a loader can memory-map the whole
+# block and hand out (frames, joints, channels) views without reading it.
+
+SESSION_SUFFIX = ".apms"
+MAGIC = b"APMS"
+VERSION = 1
+HEADER_SIZE = 256
+MAX_JOINTS = 12
+JOINT_NAME_SIZE = 16
+
+# magic, version, header size, frames, joints, channels, dtype code, flags, sample rate
+HEADER_STRUCT = struct.Struct("<4sHHQHHBB6xd")
+
+FLAG_TIMESTAMPS = 0x01
+
+DTYPE_CODES = {1: np.dtype("<f4"), 2: np.dtype("<f8")}
+DTYPE_LOOKUP = {dtype: code for code, dtype in DTYPE_CODES.items()}
+
+DEFAULT_JOINT_NAMES = ("shoulder", "elbow", "wrist", "racket")
+
+# Firmware samples the BNO055 every 100 ms (BNO055_SAMPLERATE_DELAY_MS)
+DEFAULT_SAMPLE_RATE = 10.0
+
+
+class SessionFormatError(Exception):
+    pass
+
+
+class Session:
+    """Zero-copy view of a session's angle and timestamp columns."""
+
+    def __init__(self, angles, timestamps=None, joint_names=None, sample_rate=0.0, path=None, offset=None):
+        self.angles = angles  # (frames, joints, channels)
+        self.timestamps = timestamps  # (frames,) seconds or None
+        self.joint_names = list(joint_names) if joint_names else default_joint_names(angles.shape[1])
+        self.sample_rate = float(sample_rate)
+        self.path = path
+        self.offset = offset  # seconds from an align_joints.py sidecar, already in timestamps; None if unaligned
+
+    def __len__(self):
+        return self.angles.shape[0]
+
+    @property
+    def n_joints(self):
+        return self.angles.shape[1]
+
+    def joint(self, name):
+        """Return the (frames, channels) view for one joint."""
+        return self.angles[:, self.joint_names.index(name)]
+
+    def times(self):
+        """Return per-frame times, falling back to the declared sample rate."""
+        if self.timestamps is not None:
+            return self.timestamps
+        rate = self.sample_rate if self.sample_rate > 0 else DEFAULT_SAMPLE_RATE
+        return np.arange(len(self), dtype=np.float64) / rate
+
+
+def default_joint_names(n_joints):
+    if n_joints <= len(DEFAULT_JOINT_NAMES):
+        return list(DEFAULT_JOINT_NAMES[:n_joints])
+    return [f"joint{i}" for i in range(n_joints)]
+
+
+def _column_bytes(n_frames, n_columns, dtype):
+    return n_frames * n_columns * dtype.itemsize
+
+
+def _timestamp_offset(n_frames, n_columns, dtype):
+    end = HEADER_SIZE + _column_bytes(n_frames, n_columns, dtype)
+    return (end + 7) // 8 * 8
+
+
+def _pack_header(n_frames, n_joints, n_channels, dtype, has_timestamps, sample_rate, joint_names):
+    if n_joints > MAX_JOINTS:
+        raise SessionFormatError(f"at most {MAX_JOINTS} joints are supported, got {n_joints}")
+    flags = FLAG_TIMESTAMPS if has_timestamps else 0
+    header = HEADER_STRUCT.pack(MAGIC, VERSION, HEADER_SIZE, n_frames, n_joints, n_channels,
+                                DTYPE_LOOKUP[dtype], flags, sample_rate)
+    for name in joint_names:
+        header += name.encode("ascii")[:JOINT_NAME_SIZE].ljust(JOINT_NAME_SIZE, b"\0")
+    return header.ljust(HEADER_SIZE, b"\0")
+
+
+def read_header(path):
+    """Read and validate the fixed-width header of a session file."""
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise SessionFormatError(f"{path}: truncated header")
+    magic, version, header_size, n_frames, n_joints, n_channels, dtype_code, flags, sample_rate = \
+        HEADER_STRUCT.unpack_from(raw)
+    if magic != MAGIC:
+        raise SessionFormatError(f"{path}: not a session file")
+    if version != VERSION or header_size != HEADER_SIZE:
+        raise SessionFormatError(f"{path}: unsupported session version {version}")
+    if dtype_code not in DTYPE_CODES:
+        raise SessionFormatError(f"{path}: unknown column type {dtype_code}")
+    names = []
+    pos = HEADER_STRUCT.size
+    for _ in range(n_joints):
+        names.append(raw[pos:pos + JOINT_NAME_SIZE].rstrip(b"\0").decode("ascii"))
+        pos += JOINT_NAME_SIZE
+    return {
+        "n_frames": n_frames,
+        "n_joints": n_joints,
+        "n_channels": n_channels,
+        "dtype": DTYPE_CODES[dtype_code],
+        "has_timestamps": bool(flags & FLAG_TIMESTAMPS),
+        "sample_rate": sample_rate,
+        "joint_names": names,
+    }
+
+
+class SessionWriter:
+    """Writes a session file of known length in chunks of frames.
+
+    The file is created at full size up front and filled through memory maps,
+    so a session larger than memory can be produced chunk by chunk. It only
+    appears under its final name once close() has been called.
+    """
+
+    def __init__(self, path, n_frames, n_joints, n_channels, has_timestamps=False,
+                 joint_names=None, sample_rate=0.0, dtype=np.float32):
+        self.path = path
+        self.n_frames = n_frames
+        self.n_joints = n_joints
+        self.n_channels = n_channels
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.has_timestamps = has_timestamps
+        joint_names = list(joint_names) if joint_names else default_joint_names(n_joints)
+        n_columns = n_joints * n_channels
+
+        header = _pack_header(n_frames, n_joints, n_channels, self.dtype, has_timestamps, sample_rate, joint_names)
+        ts_offset = _timestamp_offset(n_frames, n_columns, self.dtype)
+        total = ts_offset + (n_frames * 8 if has_timestamps else 0)
+
+        self._tmp_path = path + ".tmp"
+        with open(self._tmp_path, "wb") as f:
+            f.write(header)
+            f.truncate(total)
+
+        self._columns = self._timestamps = None
+        if n_frames:
+            self._columns = np.memmap(self._tmp_path, dtype=self.dtype, mode="r+", offset=HEADER_SIZE,
+                                      shape=(n_columns, n_frames))
+            if has_timestamps:
+                self._timestamps = np.memmap(self._tmp_path, dtype="<f8", mode="r+", offset=ts_offset,
+                                             shape=(n_frames,))
+        self.written = 0
+
+    def write(self, angles, timestamps=None):
+        """Append (frames, joints, channels) angles and, if the file has them, their timestamps."""
+        angles = np.asarray(angles)
+        n = len(angles)
+        if self.written + n > self.n_frames:
+            raise SessionFormatError(f"{self.path}: more than the {self.n_frames} frames declared")
+        stop = self.written + n
+        self._columns[:, self.written:stop] = angles.reshape(n, -1).T
+        if self.has_timestamps:
+            self._timestamps[self.written:stop] = timestamps
+        self.written = stop
+
+    def close(self):
+        for column in (self._columns, self._timestamps):
+            if column is not None:
+                column.flush()
+        self._columns = self._timestamps = None
+        if self.written != self.n_frames:
+            os.remove(self._tmp_path)
+            raise SessionFormatError(f"{self.path}: {self.written} of {self.n_frames} frames written")
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Drop the partly written file."""
+        self._columns = self._timestamps = None
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_session(path, angles, timestamps=None, joint_names=None, sample_rate=0.0, dtype=np.float32):
+    """Write a (frames, joints, channels) angle array to a session file."""
+    angles = np.asarray(angles)
+    if angles.ndim == 2:
+        angles = angles[:, None, :]
+    n_frames, n_joints, n_channels = angles.shape
+    with SessionWriter(path, n_frames, n_joints, n_channels, timestamps is not None,
+                       joint_names, sample_rate, dtype) as writer:
+        if n_frames:
+            writer.write(angles, timestamps)
+
+
+def open_session(path):
+    """Memory-map a session file; no column data is read until it is indexed."""
+    header = read_header(path)
+    n_frames = header["n_frames"]
+    n_joints = header["n_joints"]
+    n_channels = header["n_channels"]
+    dtype = header["dtype"]
+    n_columns = n_joints * n_channels
+
+    if n_frames == 0:
+        angles = np.empty((0, n_joints, n_channels), dtype=dtype)
+        timestamps = np.empty(0) if header["has_timestamps"] else None
+    else:
+        columns = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(n_columns, n_frames))
+        angles = columns.reshape(n_joints, n_channels, n_frames).transpose(2, 0, 1)
+        timestamps = None
+        if header["has_timestamps"]:
+            timestamps = np.memmap(path, dtype="<f8", mode="r",
+                                   offset=_timestamp_offset(n_frames, n_columns, dtype), shape=(n_frames,))
+
+    return Session(angles, timestamps, header["joint_names"], header["sample_rate"], path)
+
+
+def is_session_file(path):
+    return str(path).lower().endswith(SESSION_SUFFIX)
+
+
+# --- Conversion from the text captures in Data/ ---
+
+def convert(src, dst=None, channels=3, sample_rate=0.0, dtype=np.float32):
+    """Convert a text capture to a session file, returning the output path."""
+    from data_loader import load_values, values_to_angles  # data_loader builds on this module
+
+    if dst is None:
+        dst = os.path.splitext(src)[0] + SESSION_SUFFIX
+    values, timestamps = load_values(src)
+    angles = values_to_angles(values, channels)
+    write_session(dst, angles, timestamps, sample_rate=sample_rate, dtype=dtype)
+    return dst
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Data/ captures to the binary session format.")
+    parser.add_argument("files", nargs="+", help="text captures (.csv/.txt) to convert")
+    parser.add_argument("-o", "--output-dir", help="directory for the .apms files (default: next to input)")
+    parser.add_argument("--rate", type=float, default=0.0, help="declared sample rate in Hz")
+    parser.add_argument("--float64", action="store_true", help="store angles as float64")
+    args = parser.parse_args()
+
+    for src in args.files:
+        dst = None
+        if args.output_dir:
+            dst = os.path.join(args.output_dir, os.path.splitext(os.path.basename(src))[0] + SESSION_SUFFIX)
+        out = convert(src, dst, sample_rate=args.rate, dtype=np.float64 if args.float64 else np.float32)
+        print(f"{src} -> {out} ({len(open_session(out))} frames)")
@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import struct
+import time
+
+import numpy as np
+
+from alignment import FrameAligner
+from ring_buffer import RingBuffer, capacity_for
+from session_format import DEFAULT_JOINT_NAMES, DEFAULT_SAMPLE_RATE
+from discovery import (AXIS_CHARACTERISTICS, COUNTER_CHARACTERISTIC_UUID, DEVICE_NAME, DeviceNotFoundError,
+                       backoff, connect)
+
+# Concurrent multi-sensor sessions.
+#
+# One asyncio loop connects every sensor unit (e.g. shoulder, elbow and wrist
+# for each of several athletes) through discovery.connect, so each unit gets
+# the address cache (keyed by its athlete/joint), the service-filtered scan
+# and capped backoff on reconnects; there are no per-device threads. Each unit's x/y/z notifications are aligned into frames by its own
+# FrameAligner, and JointFrameMerger combines the latest frame of every unit
+# into one joint-aligned frame per tick of a common host clock. Merged frames
+# are written to a RingBuffer with channels laid out as (athletes, joints, 3).
+#
+#   python session_manager.py Bella/shoulder=D4:8A:FC:C9:CA:EA Bella/elbow=... Bella/wrist=...
+
+MAX_LATENCY = 0.15  # seconds a merged frame waits for slow units before it is written
+HISTORY = 8         # recent frames kept per unit to pick the one nearest each tick
+STALE_AFTER = 0.5   # seconds without data before a unit's joint is reported as NaN
+ARRIVALS = 256      # merged frames whose notification arrival time is kept (for latency)
+STATUS_INTERVAL = 1.0
+
+host_clock = time.monotonic  # common timebase for every unit
+
+
+class SensorSpec:
+    """One sensor unit: which athlete and joint it is on, and how to find it."""
+
+    def __init__(self, athlete, joint, target):
+        self.athlete = athlete
+        self.joint = joint
+        self.target = target  # BLE address or advertised name
+
+    @classmethod
+    def parse(cls, text):
+        """'athlete/joint=address-or-name'"""
+        role, _, target = text.partition("=")
+        athlete, _, joint = role.partition("/")
+        if not (athlete and joint and target):
+            raise ValueError(f"expected athlete/joint=address, got {text!r}")
+        return cls(athlete, joint, target)
+
+    @property
+    def unit(self):
+        """Label of the unit in the discovery address cache."""
+        return f"{self.athlete}/{self.joint}"
+
+    @property
+    def is_address(self):
+        return self.target.count(":") == 5 or self.target.count("-") == 4
+
+    def __repr__(self):
+        return f"{self.athlete}/{self.joint}={self.target}"
+
+
+def check_targets(specs):
+    """Raise ValueError if two units share a target: name matches would be bound in discovery order."""
+    seen = {}
+    for spec in specs:
+        key = spec.target.upper() if spec.is_address else spec.target
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {spec} have the same target; "
+                             "give each unit its own address (or a unique name)")
+        seen[key] = spec
+
+
+def joint_layout(specs):
+    """(athletes, joints) in first-seen athlete order and the usual joint order."""
+    athletes = list(dict.fromkeys(s.athlete for s in specs))
+    joints = [j for j in DEFAULT_JOINT_NAMES if any(s.joint == j for s in specs)]
+    joints += [j for j in dict.fromkeys(s.joint for s in specs) if j not in joints]
+    return athletes, joints
+
+
+class JointFrameMerger:
+    """Merges per-unit frames into joint-aligned frames on a common clock.
+
+    Frame k covers host time start + k * period and holds, for every unit, its
+    recent frame nearest to that time. It is written once every live unit
+    has reported past that time, or after max_latency if some unit lags;
+    units with nothing within stale_after of it contribute NaN. A unit that
+    has been silent for stale_after (or never reported) is not waited for.
+    arrival(seq) gives the host arrival time of the newest notification that
+    went into a recent merged frame.
+    """
+
+    def __init__(self, specs, ring, sample_rate=DEFAULT_SAMPLE_RATE,
+                 max_latency=MAX_LATENCY, stale_after=STALE_AFTER):
+        self.athletes, self.joints = joint_layout(specs)
+        self.slots = [(self.athletes.index(s.athlete), self.joints.index(s.joint)) for s in specs]
+
+        self.ring = ring
+        self.period = 1.0 / sample_rate
+        self.max_latency = max_latency
+        self.stale_after = stale_after
+
+        n = len(specs)
+        self.history = np.full((n, HISTORY, 3), np.nan)
+        self.history_time = np.full((n, HISTORY), -np.inf)
+        self._slot = np.zeros(n, dtype=int)
+        self.latest_time = np.full(n, -np.inf)
+        self.frame = np.full((len(self.athletes), len(self.joints), 3), np.nan)
+        self.arrivals = np.full(ARRIVALS, np.nan)
+        self.next_time = None
+        self.frames = 0
+
+    def push(self, unit, t, values):
+        """A complete (or NaN-padded) frame from one unit at host time t."""
+        i = self._slot[unit]
+        self.history[unit, i] = values
+        self.history_time[unit, i] = t
+        self._slot[unit] = (i + 1) % HISTORY
+        self.latest_time[unit] = max(self.latest_time[unit], t)
+        if self.next_time is None:
+            self.next_time = t
+        self.emit(t)
+
+    def emit(self, now):
+        """Write every merged frame that is due at host time now."""
+        while self.next_time is not None:
+            waiting = (self.latest_time < self.next_time) & \
+                (self.latest_time >= self.next_time - self.stale_after)
+            if waiting.any() and now - self.next_time < self.max_latency:
+                break
+            distance = np.abs(self.history_time - self.next_time)
+            nearest = distance.argmin(axis=1)
+            stale = distance[np.arange(len(nearest)), nearest] > self.stale_after
+            for unit, (a, j) in enumerate(self.slots):
+                self.frame[a, j] = np.nan if stale[unit] else self.history[unit, nearest[unit]]
+            used = self.history_time[np.arange(len(nearest)), nearest][~stale]
+            self.arrivals[self.frames % ARRIVALS] = used.max() if len(used) else np.nan
+            self.ring.write(self.next_time, self.frames, self.frame.ravel())
+            self.frames += 1
+            self.next_time += self.period
+
+    def arrival(self, seq):
+        """Host arrival time behind merged frame seq (NaN if unknown or too old)."""
+        if not self.frames - ARRIVALS < seq <= self.frames:  # seq == frames: written, not yet counted
+            return np.nan
+        return float(self.arrivals[seq % ARRIVALS])
+
+
+class SensorLink:
+    """Connection to one sensor unit, kept alive with reconnects."""
+
+    def __init__(self, spec, unit, merger, connect_lock, peers=()):
+        self.spec = spec
+        self.unit = unit
+        self.merger = merger
+        self.connect_lock = connect_lock
+        self.peers = peers  # every link of the session; their addresses are skipped when scanning
+        self.aligner = FrameAligner(list(AXIS_CHARACTERISTICS), on_frame=self._on_frame,
+                                    sample_rate=1.0 / merger.period, clock=host_clock)
+        self.address = None
+        self.connected = False
+        self.frames = 0
+
+    def _on_frame(self, frame):
+        self.frames += 1
+        self.merger.push(self.unit, frame.time, frame.values)
+
+    def _counter_handler(self, characteristic, data):
+        self.aligner.push_counter(struct.unpack_from("<I", data)[0], host_clock())
+
+    def _axis_handler(self, axis):
+        def handler(characteristic, data):
+            self.aligner.push_value(axis, struct.unpack_from("<f", data)[0], host_clock())
+        return handler
+
+    def _peer_addresses(self):
+        return {link.address for link in self.peers if link is not self and link.address}
+
+    async def _connect(self, stop, lost):
+        """Connected client via discovery.connect, retried with its capped backoff (None once stopped)."""
+        name, address = (DEVICE_NAME, self.spec.target) if self.spec.is_address else (self.spec.target, None)
+        async for attempt in backoff(None):
+            if stop.is_set():
+                return None
+            try:
+                # One unit at a time; most BLE stacks reject parallel connection attempts
+                async with self.connect_lock:
+                    return await connect(name, address, unit=self.spec.unit, attempts=1, verbose=False,
+                                         exclude=self._peer_addresses(),
+                                         disconnected_callback=lambda c: lost.set())
+            except DeviceNotFoundError as e:
+                if attempt == 0:
+                    print(f"{self.spec}: {e}; retrying")
+
+    async def run(self, stop):
+        while not stop.is_set():
+            lost = asyncio.Event()
+            client = await self._connect(stop, lost)
+            if client is None:
+                return
+            try:
+                self.address = client.address
+                self.connected = True
+                print(f"{self.spec}: connected to {client.address}")
+                await client.start_notify(COUNTER_CHARACTERISTIC_UUID, self._counter_handler)
+                for axis, uuid in AXIS_CHARACTERISTICS.items():
+                    await client.start_notify(uuid, self._axis_handler(axis))
+                stop_wait = asyncio.ensure_future(stop.wait())
+                lost_wait = asyncio.ensure_future(lost.wait())
+                await asyncio.wait([stop_wait, lost_wait], return_when=asyncio.FIRST_COMPLETED)
+                stop_wait.cancel()
+                lost_wait.cancel()
+            except Exception as e:
+                print(f"{self.spec}: {e}")
+            finally:
+                self.connected = False
+                self.aligner.flush(everything=True)
+                if client.is_connected:
+                    await client.disconnect()
+            if not stop.is_set():
+                print(f"{self.spec}: connection lost, reconnecting")
+
+
+class SessionManager:
+    """Runs every sensor link on the current loop and merges their frames."""
+
+    def __init__(self, specs, sample_rate=DEFAULT_SAMPLE_RATE, hours=3.0):
+        self.specs = list(specs)
+        check_targets(self.specs)
+        self.sample_rate = sample_rate
+        athletes, joints = joint_layout(self.specs)
+        self.ring = RingBuffer(capacity_for(hours, sample_rate), len(athletes) * len(joints) * 3)
+        self.merger = JointFrameMerger(self.specs, self.ring, sample_rate)
+        self.stop = asyncio.Event()
+        lock = asyncio.Lock()
+        self.links = []
+        self.links.extend(SensorLink(spec, i, self.merger, lock, self.links) for i, spec in enumerate(self.specs))
+
+    @property
+    def layout(self):
+        """(athletes, joints): how to reshape a ring sample's channels (with a trailing 3)."""
+        return self.merger.athletes, self.merger.joints
+
+    async def _tick(self):
+        # Keeps merged frames flowing when a unit goes quiet
+        while not self.stop.is_set():
+            await asyncio.sleep(self.merger.period)
+            for link in self.links:
+                link.aligner.flush(host_clock())
+            self.merger.emit(host_clock())
+
+    async def _report(self):
+        while not self.stop.is_set():
+            await asyncio.sleep(STATUS_INTERVAL)
+            units = "  ".join(f"{l.spec.athlete}/{l.spec.joint}:{'up' if l.connected else 'down'} {l.frames}"
+                              for l in self.links)
+            print(f"frames {self.merger.frames}  {self.ring.status()}  {units}")
+
+    async def run(self, duration=None, report=True):
+        links = [asyncio.ensure_future(link.run(self.stop)) for link in self.links]
+        tasks = list(links)
+        tasks.append(asyncio.ensure_future(self._tick()))
+        if report:
+            tasks.append(asyncio.ensure_future(self._report()))
+        try:
+            if duration is None:
+                await self.stop.wait()
+            else:
+                await asyncio.wait_for(self.stop.wait(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.stop.set()
+            for link, task in zip(self.links, links):
+                if not link.connected:
+                    task.cancel()  # don't sit out a backoff delay; connected links disconnect cleanly
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.ring.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream several sensor units into one joint-aligned session.")
+    parser.add_argument("sensors", nargs="+", help="athlete/joint=address-or-name, one per unit")
+    parser.add_argument("--rate", type=float, default=DEFAULT_SAMPLE_RATE, help="merged frame rate (Hz)")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    specs = [SensorSpec.parse(s) for s in args.sensors]
+
+    async def run():
+        manager = SessionManager(specs, args.rate)
+        athletes, joints = manager.layout
+        print(f"athletes {athletes}, joints {joints}, {manager.ring.channels} channels")
+        await manager.run(args.duration)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
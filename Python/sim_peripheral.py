@@ -0,0 +1,342 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from data_loader import load_session
+from discovery import AXIS_CHARACTERISTICS, COUNTER_CHARACTERISTIC_UUID, DEVICE_NAME, SERVICE_UUID
+from packets import PACKED_CHARACTERISTIC_UUID, encode_packet
+
+# In-process stand-in for the BLE layer.
+#
+# SimulatedPeripheral replays a Data/ file (or a synthetic swing) as the
+# notifications the firmware sends: the uint32 counter followed by x, y and z
+# float32 values on the real characteristic UUIDs, or packed multi-sample
+# packets. SimulatedScanner and SimulatedClient mimic the parts of
+# BleakScanner/BleakClient the ingest code uses, and simulated() swaps them
+# into discovery, which every connection goes through, so the whole
+# ingest-to-render path can run with no radio. Rates from 10 Hz to several kHz are paced on the wall
+# clock in bursts; jitter, loss and reordering are applied per notification.
+#
+#   python sim_peripheral.py ../Data/Rish_Shoulder_Armside_1.csv --rate 2000 --loss 0.01 --duration 10
+
+PACE_INTERVAL = 0.002  # seconds between pacing wake-ups; due notifications are sent in a burst
+
+
+class SimulatedCharacteristic:
+    def __init__(self, uuid):
+        self.uuid = uuid
+
+    def __repr__(self):
+        return self.uuid
+
+
+class SimulatedDevice:
+    def __init__(self, address, name):
+        self.address = address
+        self.name = name
+
+
+class SimulatedAdvertisement:
+    def __init__(self, local_name, service_uuids):
+        self.local_name = local_name
+        self.service_uuids = service_uuids
+
+
+def synthetic_swing(n=1000, sample_rate=100.0):
+    """(n, 3) smooth pitch/roll/yaw angles in degrees: one swing per second."""
+    t = np.arange(n) / sample_rate
+    phase = 2 * np.pi * t
+    return np.column_stack([60 * np.sin(phase), 30 * np.sin(2 * phase), 90 * np.cos(phase)])
+
+
+class SimulatedPeripheral:
+    """Replays angles as firmware notifications.
+
+    values: (frames, 3) array, looped for as long as someone is subscribed.
+    jitter: standard deviation (s) of an extra delivery delay per notification
+    (order is kept, as on a real connection). loss: probability a
+    notification is dropped. reorder: probability it is held back and
+    delivered after the next one. packed: samples per packed
+    notification (0 sends the firmware's per-axis notifications).
+    """
+
+    def __init__(self, values, rate=10.0, name=DEVICE_NAME, address="SIM:00:00:00:00:01",
+                 jitter=0.0, loss=0.0, reorder=0.0, packed=0, seed=0):
+        self.values = np.asarray(values, dtype=np.float32)
+        self.rate = rate
+        self.device = SimulatedDevice(address, name)
+        self.advertisement = SimulatedAdvertisement(name, [SERVICE_UUID])
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.packed = packed
+        self.rng = np.random.default_rng(seed)
+
+        self.subscribers = {}  # uuid -> handler
+        self.sent = 0
+        self.lost = 0
+        self.reordered = 0
+        self._held = None
+        self._last_delivery = 0.0
+        self._task = None
+
+    @classmethod
+    def from_file(cls, path, joint=0, **kwargs):
+        return cls(load_session(path).angles[:, joint], **kwargs)
+
+    # --- Notification delivery ---
+
+    def _deliver(self, uuid, data):
+        handler = self.subscribers.get(uuid)
+        if handler is None:
+            return
+        result = handler(SimulatedCharacteristic(uuid), bytearray(data))
+        if asyncio.iscoroutine(result):
+            asyncio.ensure_future(result)
+
+    def _notify(self, uuid, data):
+        if self.loss and self.rng.random() < self.loss:
+            self.lost += 1
+            return
+        if self.reorder and self._held is None and self.rng.random() < self.reorder:
+            self._held = (uuid, data)
+            self.reordered += 1
+            return
+        self._send(uuid, data)
+        if self._held is not None:
+            held, self._held = self._held, None
+            self._send(*held)
+
+    def _send(self, uuid, data):
+        self.sent += 1
+        if self.jitter:
+            loop = asyncio.get_running_loop()
+            # Strictly increasing: the loop's timer heap does not keep ties in order
+            at = max(loop.time() + abs(self.rng.normal(0.0, self.jitter)), self._last_delivery + 1e-9)
+            self._last_delivery = at
+            loop.call_at(at, self._deliver, uuid, data)
+        else:
+            self._deliver(uuid, data)
+
+    def _emit_sample(self, counter):
+        x, y, z = self.values[counter % len(self.values)]
+        self._notify(COUNTER_CHARACTERISTIC_UUID, struct.pack("<I", counter & 0xFFFFFFFF))
+        self._notify(AXIS_CHARACTERISTICS["x"], struct.pack("<f", x))
+        self._notify(AXIS_CHARACTERISTICS["y"], struct.pack("<f", y))
+        self._notify(AXIS_CHARACTERISTICS["z"], struct.pack("<f", z))
+
+    async def _run(self):
+        start = time.perf_counter()
+        emitted = 0
+        packets = 0
+        while True:
+            due = int((time.perf_counter() - start) * self.rate)
+            if self.packed:
+                while due - emitted >= self.packed:
+                    rows = np.arange(emitted, emitted + self.packed) % len(self.values)
+                    self._notify(PACKED_CHARACTERISTIC_UUID, encode_packet(packets, self.values[rows]))
+                    emitted += self.packed
+                    packets += 1
+            else:
+                while emitted < due:
+                    self._emit_sample(emitted)
+                    emitted += 1
+            await asyncio.sleep(min(PACE_INTERVAL, 1.0 / self.rate))
+
+    def subscribe(self, uuid, handler):
+        self.subscribers[uuid] = handler
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def unsubscribe(self, uuid):
+        self.subscribers.pop(uuid, None)
+        if not self.subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self):
+        return f"sent {self.sent}  lost {self.lost}  reordered {self.reordered}"
+
+
+# --- Bleak stand-ins ---
+
+_peripherals = []
+
+
+def _lookup(target):
+    for p in _peripherals:
+        if target is p.device or target == p.device.address:
+            return p
+    return None
+
+
+class SimulatedScanner:
+    """BleakScanner stand-in: reports every simulated peripheral as advertising."""
+
+    def __init__(self, detection_callback=None, service_uuids=None, **kwargs):
+        self.callback = detection_callback
+        self.service_uuids = [u.lower() for u in service_uuids or []]
+        self._task = None
+
+    async def _advertise(self):
+        while True:
+            for p in _peripherals:
+                uuids = [u.lower() for u in p.advertisement.service_uuids]
+                if not self.service_uuids or set(self.service_uuids) & set(uuids):
+                    self.callback(p.device, p.advertisement)
+            await asyncio.sleep(0.1)  # advertising interval
+
+    async def __aenter__(self):
+        if self.callback is not None:
+            self._task = asyncio.ensure_future(self._advertise())
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._task is not None:
+            self._task.cancel()
+
+    @staticmethod
+    async def find_device_by_name(name, timeout=10.0):
+        return next((p.device for p in _peripherals if p.device.name == name), None)
+
+
+class SimulatedClient:
+    """BleakClient stand-in connected to a SimulatedPeripheral."""
+
+    def __init__(self, target, disconnected_callback=None, timeout=10.0, **kwargs):
+        self.peripheral = _lookup(target)
+        self.address = getattr(target, "address", target)
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+
+    async def connect(self):
+        if self.peripheral is None:
+            raise asyncio.TimeoutError(f"no simulated device at {self.address}")
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        if self.is_connected:
+            for uuid in list(self.peripheral.subscribers):
+                self.peripheral.unsubscribe(uuid)
+            self.is_connected = False
+            if self.disconnected_callback is not None:
+                self.disconnected_callback(self)
+        return True
+
+    async def start_notify(self, uuid, handler):
+        self.peripheral.subscribe(uuid, handler)
+
+    async def stop_notify(self, uuid):
+        self.peripheral.unsubscribe(uuid)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+
+@contextlib.contextmanager
+def simulated(*peripherals):
+    """Route discovery (and so session_manager) to the given simulated peripherals."""
+    import discovery
+
+    saved = discovery.BleakClient, discovery.BleakScanner, discovery.DEVICE_CACHE
+    _peripherals[:] = peripherals
+    discovery.BleakClient = SimulatedClient
+    discovery.BleakScanner = SimulatedScanner
+    # Keep simulated addresses out of the real device cache
+    with tempfile.TemporaryDirectory() as tmp:
+        discovery.DEVICE_CACHE = os.path.join(tmp, "devices.json")
+        try:
+            yield list(peripherals)
+        finally:
+            discovery.BleakClient, discovery.BleakScanner, discovery.DEVICE_CACHE = saved
+            _peripherals.clear()
+
+
+# --- Ingest load test ---
+
+async def run_ingest(peripheral, duration, packed=False, record=None):
+    """Runs BLEConnection's client against the peripheral; returns (frames, aligner, latencies, recorder)."""
+    import BLEConnection
+    from alignment import FrameAligner
+    from packets import PacketDecoder
+    from recorder import Recorder
+    from ring_buffer import RingBuffer, capacity_for
+
+    ring = RingBuffer(capacity_for(duration / 3600.0 + 0.01, peripheral.rate), 3)
+    recorder = Recorder(record, ring, peripheral.rate).start() if record else None
+    data_ready = asyncio.Event()
+    reader = ring.reader("load-test")
+    latencies = []
+
+    def on_frame(frame):
+        ring.write(frame.time, frame.counter, frame.values)
+        data_ready.set()
+
+    decoder = PacketDecoder(3) if packed else None
+    aligner = None if packed else FrameAligner(list(AXIS_CHARACTERISTICS), on_frame=on_frame,
+                                               sample_rate=peripheral.rate)
+
+    async def consume():
+        while not ring.closed:
+            await data_ready.wait()
+            data_ready.clear()
+            host_time, _, _ = reader.read_all()
+            if len(host_time):
+                latencies.append(time.time() - host_time[-1])
+
+    BLEConnection.duration = duration
+    consumer = asyncio.ensure_future(consume())
+    await BLEConnection.run_ble_client(ring, data_ready, aligner, decoder, peripheral.device.address)
+    await consumer
+    if recorder is not None:
+        recorder.close()
+    return ring.head, aligner, np.array(latencies), recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a session through a simulated BLE sensor and measure ingest.")
+    parser.add_argument("file", nargs="?", help="Data/ file to replay (synthetic swing if omitted)")
+    parser.add_argument("--rate", type=float, default=10.0, help="samples per second (10 to several thousand)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to stream")
+    parser.add_argument("--jitter", type=float, default=0.0, help="delivery jitter standard deviation (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="notification loss probability")
+    parser.add_argument("--reorder", type=float, default=0.0, help="notification reorder probability")
+    parser.add_argument("--packed", type=int, default=0, help="samples per packed notification (0 = per axis)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", metavar="LOG", help="also record the ingested frames to this session log")
+    args = parser.parse_args()
+
+    values = load_session(args.file).angles[:, 0] if args.file else synthetic_swing(sample_rate=args.rate)
+    peripheral = SimulatedPeripheral(values, args.rate, jitter=args.jitter, loss=args.loss,
+                                     reorder=args.reorder, packed=args.packed, seed=args.seed)
+
+    with simulated(peripheral):
+        start = time.perf_counter()
+        frames, aligner, latencies, recorder = asyncio.run(
+            run_ingest(peripheral, args.duration, bool(args.packed), args.record))
+        wall = time.perf_counter() - start
+
+    print(f"peripheral: {peripheral.status()}")
+    print(f"ingested {frames} frames in {wall:.1f} s ({frames / wall:.0f}/s, target {args.rate:.0f}/s)")
+    if aligner is not None:
+        print(f"aligner: {aligner.status()}")
+    if recorder is not None:
+        print(f"recorder: {recorder.status()}")
+    if len(latencies):
+        print(f"consumer latency: median {1000 * np.median(latencies):.2f} ms, "
+              f"p99 {1000 * np.percentile(latencies, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
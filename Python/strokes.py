@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from data_loader import load_offset, load_session
+
+# Swing detection and a per-session stroke index for seeking.
+#
+# The signal is the arm's angular speed: every channel of every joint, each
+# step taken the short way round, in degrees per second, smoothed with an
+# exponential moving average. A StrokeDetector runs a small state machine
+# over it, one sample at a time with constant work per sample:
+#
+#   rest   speed below REST_SPEED; the last such sample is the swing's start
+#   swing  speed rose above START_SPEED; the highest speed is the impact candidate
+#   finish speed stayed below REST_SPEED for REST_HOLD seconds since first dropping
+#
+# Swings that are too short or too slow to be strokes are dropped. The same
+# detector runs over file sessions in blocks and over live ring buffer
+# samples as they arrive. Each capture's strokes are stored next to it
+# (<file>.strokes.json) in its own time base, so the viewers can jump to
+# stroke N, loop one swing or skip the idle time between swings.
+#
+#   python strokes.py ../Data                 # index every capture in the folder
+#   python strokes.py session.apms --list     # print the strokes
+
+STROKES_SUFFIX = ".strokes.json"
+INDEX_VERSION = 1
+
+START_SPEED = 150.0   # degrees per second that starts a swing
+REST_SPEED = 60.0     # ...and that counts as still again
+PEAK_SPEED = 250.0    # slowest impact that still counts as a stroke
+REST_HOLD = 0.15      # seconds below REST_SPEED that end a swing
+MIN_DURATION = 0.2    # seconds from start to finish
+MAX_DURATION = 5.0    # longer "swings" are walking about, not strokes
+SMOOTHING = 0.05      # time constant of the speed average (seconds)
+MAX_GAP = 1.0         # a gap in the samples longer than this ends any swing
+BLOCK_FRAMES = 65536  # frames per block when detecting over a file
+PAD = 0.3             # seconds shown before a stroke's start and after its finish
+
+Stroke = namedtuple("Stroke", "start impact finish peak_speed")
+
+
+class StrokeDetector:
+    """Finds swings in a stream of joint angles, one sample or block at a time.
+
+    push() and push_many() return the strokes completed by the new samples;
+    all of them are also kept in .strokes. flush() ends a swing still in
+    progress when the stream stops.
+    """
+
+    def __init__(self, start_speed=START_SPEED, rest_speed=REST_SPEED, peak_speed=PEAK_SPEED,
+                 rest_hold=REST_HOLD, min_duration=MIN_DURATION, max_duration=MAX_DURATION,
+                 smoothing=SMOOTHING, on_stroke=None):
+        self.start_speed = start_speed
+        self.rest_speed = rest_speed
+        self.peak_speed = peak_speed
+        self.rest_hold = rest_hold
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.smoothing = smoothing
+        self.on_stroke = on_stroke
+        self.strokes = []
+        self.samples = 0
+        self.rejected = 0
+
+        self._last_time = None
+        self._last_angles = None
+        self._speed = 0.0
+        self._swinging = False
+        self._rest_time = None   # last sample below rest speed
+        self._start = self._impact = self._peak = 0.0
+        self._below_since = None
+
+    @property
+    def speed(self):
+        """Smoothed angular speed at the newest sample (degrees per second)."""
+        return self._speed
+
+    def push(self, t, angles):
+        """One sample: time in seconds and its angles in degrees (any shape)."""
+        return self.push_many(np.array([t], dtype=np.float64),
+                              np.asarray(angles, dtype=np.float64).reshape(1, -1))
+
+    def push_many(self, times, angles):
+        """A block of samples: (n,) times and (n, ...) angles."""
+        times = np.asarray(times, dtype=np.float64)
+        angles = np.asarray(angles, dtype=np.float64).reshape(len(times), -1)
+        complete = ~np.isnan(angles).any(axis=1)  # incomplete live frames carry NaNs
+        if not complete.all():
+            times, angles = times[complete], angles[complete]
+        if not len(times):
+            return []
+
+        # Speeds for the whole block at once; the state machine below is scalar
+        if self._last_angles is None:
+            self._last_time, self._last_angles = times[0], angles[0]
+            self._rest_time = times[0]
+        prev_times = np.concatenate([[self._last_time], times[:-1]])
+        prev_angles = np.concatenate([self._last_angles[None], angles[:-1]])
+        dt = times - prev_times
+        step = angles - prev_angles
+        step -= 360.0 * np.round(step / 360.0)
+        raw = np.linalg.norm(step, axis=1) / np.where(dt > 0, dt, np.inf)
+        alpha = 1.0 - np.exp(-np.maximum(dt, 0.0) / self.smoothing)
+        self._last_time, self._last_angles = times[-1], angles[-1]
+        self.samples += len(times)
+
+        done = []
+        speed = self._speed
+        rest, start = self.rest_speed, self.start_speed
+        for t, gap, v, a in zip(times.tolist(), dt.tolist(), raw.tolist(), alpha.tolist()):
+            if gap > MAX_GAP:
+                self._end(t - gap, done)  # dropout: the swing ended with the last sample before it
+                speed = 0.0
+                self._rest_time = t
+                continue
+            speed += a * (v - speed)
+            if not self._swinging:
+                if speed < rest:
+                    self._rest_time = t
+                elif speed >= start:
+                    self._swinging = True
+                    self._start = self._rest_time
+                    self._impact, self._peak = t, speed
+                    self._below_since = None
+            elif speed >= rest:
+                self._below_since = None
+                if speed > self._peak:
+                    self._impact, self._peak = t, speed
+            elif self._below_since is None:
+                self._below_since = t
+            elif t - self._below_since >= self.rest_hold:
+                self._end(self._below_since, done)
+                self._rest_time = t
+        self._speed = speed
+        return done
+
+    def _end(self, finish, done):
+        if not self._swinging:
+            return
+        self._swinging = False
+        if self._below_since is not None:
+            finish = self._below_since
+        duration = finish - self._start
+        if self._peak < self.peak_speed or not self.min_duration <= duration <= self.max_duration:
+            self.rejected += 1
+            return
+        stroke = Stroke(self._start, self._impact, finish, self._peak)
+        self.strokes.append(stroke)
+        done.append(stroke)
+        if self.on_stroke is not None:
+            self.on_stroke(stroke)
+
+    def flush(self):
+        """End a swing in progress at the newest sample."""
+        done = []
+        if self._last_time is not None:
+            self._end(self._last_time, done)
+        return done
+
+    def status(self):
+        return f"{len(self.strokes)} strokes in {self.samples} samples ({self.rejected} swings rejected)"
+
+
+# --- Offline detection ---
+
+def detect(times, angles, block=BLOCK_FRAMES, **params):
+    """All strokes in (frames,) times and (frames, ...) angles, in blocks."""
+    detector = StrokeDetector(**params)
+    for i in range(0, len(times), block):
+        detector.push_many(times[i:i + block], angles[i:i + block])
+    detector.flush()
+    return detector
+
+
+def detect_session(session, joints=None, **params):
+    """Strokes of a Session; joints selects which joints' speeds count (default all)."""
+    angles = session.angles if joints is None else session.angles[:, joints]
+    return detect(session.times(), angles, **params)
+
+
+# --- Index ---
+
+def index_path(path):
+    return str(path) + STROKES_SUFFIX
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime}
+
+
+def write_index(path, strokes):
+    """Store strokes next to the capture at path, in the capture's own (unaligned) times."""
+    columns = np.array([tuple(s) for s in strokes], dtype=np.float64).reshape(-1, 4)
+    index = {"version": INDEX_VERSION, "source": _source_stamp(path)}
+    for name, column in zip(Stroke._fields, columns.T):
+        index[name] = np.round(column, 4).tolist()
+    with open(index_path(path), "w") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+
+def read_index(path):
+    """Strokes stored for the capture at path, or None if there is no index or the capture changed."""
+    try:
+        with open(index_path(path)) as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION or index.get("source") != _source_stamp(path):
+            return None
+        return [Stroke(*row) for row in zip(*(index[name] for name in Stroke._fields))]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_strokes(path, aligned=True, rebuild=False):
+    """The capture's strokes, detected and indexed on first use.
+
+    With aligned set, the capture's align_joints offset is applied to the
+    times, matching load_session.
+    """
+    strokes = None if rebuild else read_index(path)
+    if strokes is None:
+        strokes = detect_session(load_session(path, aligned=False)).strokes
+        try:
+            write_index(path, strokes)
+        except OSError:
+            pass  # read-only data: detection is cheap enough to repeat
+    offset = load_offset(path) if aligned else 0.0
+    if offset:
+        strokes = [Stroke(s.start + offset, s.impact + offset, s.finish + offset, s.peak_speed) for s in strokes]
+    return strokes
+
+
+# --- Viewer navigation ---
+
+class StrokeNavigator:
+    """Stroke seeking for a PlaybackClock: next/previous stroke, loop one swing, skip idle time.
+
+    Call update() before every clock.tick(). Strokes outside the clock's
+    span (e.g. when only a window of the session was loaded) are ignored.
+    """
+
+    def __init__(self, clock, strokes, pad=PAD):
+        self.clock = clock
+        self.pad = pad
+        strokes = [s for s in strokes if s.start >= clock.start_time and s.finish <= clock.end_time]
+        self.starts = np.array([s.start for s in strokes], dtype=np.float64) - pad
+        self.ends = np.array([s.finish for s in strokes], dtype=np.float64) + pad
+        self.looping = None  # index of the looped stroke
+        self.skip_idle = False
+
+    def __len__(self):
+        return len(self.starts)
+
+    def current(self, t=None):
+        """Index of the last stroke starting at or before t (-1 before the first)."""
+        t = self.clock.session_time() if t is None else t
+        return int(np.searchsorted(self.starts, t + 1e-6, side="right")) - 1
+
+    def jump(self, i):
+        if not len(self):
+            return
+        i %= len(self)
+        if self.looping is not None:
+            self.looping = i
+        self.clock.start(self.starts[i])
+        self.clock.invalidate()
+
+    def next(self):
+        self.jump(self.current() + 1)
+
+    def previous(self):
+        # a little way into a stroke, "back" restarts it
+        t = self.clock.session_time()
+        i = self.current(t)
+        self.jump(i if i >= 0 and t - self.starts[i] > 2 * self.pad else i - 1)
+
+    def toggle_loop(self):
+        if self.looping is not None or not len(self):
+            self.looping = None
+            return
+        t = self.clock.session_time()
+        i = max(self.current(t), 0)
+        if t > self.ends[i] and i + 1 < len(self):
+            i += 1  # between strokes: loop the coming one
+        self.looping = i
+        self.jump(i)
+
+    def toggle_skip_idle(self):
+        self.skip_idle = not self.skip_idle
+
+    def update(self):
+        if not len(self):
+            return
+        t = self.clock.session_time()
+        if self.looping is not None:
+            if not self.starts[self.looping] <= t < self.ends[self.looping]:
+                self.jump(self.looping)
+        elif self.skip_idle:
+            i = self.current(t)
+            if i < 0 or t >= self.ends[i]:
+                if i + 1 < len(self):
+                    self.jump(i + 1)
+                elif self.clock.loop:
+                    self.jump(0)
+
+    def status(self):
+        if not len(self):
+            return "no strokes"
+        i = self.current()
+        mode = f"  looping {self.looping + 1}" if self.looping is not None else ""
+        mode += "  skipping idle" if self.skip_idle else ""
+        return f"stroke {max(i + 1, 0)}/{len(self)}{mode}"
+
+
+def add_stroke_keys(plotter, navigator):
+    """Bind Right/Left to the next/previous stroke, l to loop it and i to skip idle time."""
+    plotter.add_key_event("Right", navigator.next)
+    plotter.add_key_event("Left", navigator.previous)
+    plotter.add_key_event("l", navigator.toggle_loop)
+    plotter.add_key_event("i", navigator.toggle_skip_idle)
+
+
+# --- Command line ---
+
+def main():
+    from align_joints import find_captures
+
+    parser = argparse.ArgumentParser(description="Detect strokes and write each capture's stroke index.")
+    parser.add_argument("inputs", nargs="+", help="captures or folders of captures")
+    parser.add_argument("--list", action="store_true", help="print every stroke")
+    parser.add_argument("--start-speed", type=float, default=START_SPEED, help="deg/s that starts a swing")
+    parser.add_argument("--rest-speed", type=float, default=REST_SPEED, help="deg/s that ends one")
+    parser.add_argument("--peak-speed", type=float, default=PEAK_SPEED, help="slowest impact that counts")
+    parser.add_argument("--dry-run", action="store_true", help="detect without writing indexes")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.inputs:
+        paths.extend(find_captures(path) if os.path.isdir(path) else [path])
+
+    for path in paths:
+        session = load_session(path, aligned=False)
+        start = time.perf_counter()
+        detector = detect_session(session, start_speed=args.start_speed, rest_speed=args.rest_speed,
+                                  peak_speed=args.peak_speed)
+        elapsed = time.perf_counter() - start
+        times = session.times()
+        span = times[-1] - times[0] if len(times) else 0.0
+        print(f"{os.path.basename(path)}: {len(detector.strokes)} strokes in {span:.0f} s of data, "
+              f"detected in {1000 * elapsed:.0f} ms")
+        if args.list:
+            for i, s in enumerate(detector.strokes):
+                print(f"  {i + 1:4d}  {s.start - times[0]:9.2f} s  impact +{s.impact - s.start:.2f}  "
+                      f"finish +{s.finish - s.start:.2f}  peak {s.peak_speed:6.0f} deg/s")
+        if not args.dry_run:
+            write_index(path, detector.strokes)
+
+
+if __name__ == "__main__":
+    main()
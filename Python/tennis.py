@@ -1,65 +1,93 @@
-from PIL import Image
-import sys
+import argparse
 import numpy as np
 import matplotlib.pyplot as plt
-import time
-import csv
 
-from matplotlib.widgets import Slider
-import tkinter as tk
+from data_loader import load_session
+from playback import PlaybackClock
+
 from tkinter import filedialog
 
+# Shoulder-to-elbow viewer. The axes and the line artist are created once;
+# each frame only updates the line data and, where the backend supports it,
+# blits the line over a cached background instead of redrawing the figure.
+# Frames are scheduled on the wall clock at the recorded rate, so slow
+# draws drop frames rather than slowing playback down.
+
+parser = argparse.ArgumentParser(description="Animate the shoulder-to-elbow segment from recorded angles.")
+parser.add_argument("file", nargs="?", help="data or .apms session file (asks if omitted)")
+parser.add_argument("-q", "--quiet", action="store_true", help="do not print each row")
+parser.add_argument("--no-blit", action="store_true", help="redraw the whole figure every frame")
+parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier")
+args = parser.parse_args()
+
 def select_file():
     file_path = filedialog.askopenfilename(title="Select a file", filetypes=[("all files", "*.*")])
     return file_path if file_path else None
 
-filename = select_file()
+filename = args.file or select_file()
+
+session = load_session(filename)
+data = session.angles[:, 0]
 
-data = []
-with open(filename, 'r') as file:
-    reader = csv.reader(file, delimiter=' ')
-    for row in reader:
-        cleaned_row = [float(value) for value in row if value]
-        data.append(cleaned_row)
+# Elbow position for every frame: unit vector of the sines of the shoulder angles
+elbows = np.sin(np.radians(data))
+elbows /= np.linalg.norm(elbows, axis=1, keepdims=True)
+shoulder = np.array([0, 0, 0])
 
 fig = plt.figure()
 ax = fig.add_subplot(111, projection='3d')
+ax.set_xlim([-2, 2])
+ax.set_ylim([-2, 2])
+ax.set_zlim([-2, 2])
+ax.set_xlabel('X')
+ax.set_ylabel('Y')
+ax.set_zlabel('Z')
+ax.set_title('Shoulder to Elbow Animation')
+
+use_blit = fig.canvas.supports_blit and not args.no_blit
+
+# Draw the shoulder-to-elbow line (animated artists are left out of normal draws)
+line, = ax.plot([shoulder[0], elbows[0, 0]], [shoulder[1], elbows[0, 1]], [shoulder[2], elbows[0, 2]],
+                color='blue', linewidth=6, animated=use_blit)
+
+background = None
+
+def on_draw(event):
+    # Full redraws (first show, resize, rotating the view) refresh the cached background
+    global background
+    if use_blit:
+        background = fig.canvas.copy_from_bbox(fig.bbox)
+        ax.draw_artist(line)
+
+fig.canvas.mpl_connect('draw_event', on_draw)
+
+def draw_player(frame):
+    line.set_data_3d([shoulder[0], elbows[frame, 0]], [shoulder[1], elbows[frame, 1]], [shoulder[2], elbows[frame, 2]])
+    if use_blit and background is not None:
+        fig.canvas.restore_region(background)
+        ax.draw_artist(line)
+        fig.canvas.blit(fig.bbox)
+    else:
+        fig.canvas.draw_idle()
+
+clock = PlaybackClock(session.times(), speed=args.speed, loop=False)
 
-shoulder_angle = [0, 0, 0]
-
-def draw_player(shoulder_angle):
-    ax.cla()  # Clear the axes
-    shoulder = np.array([0, 0, 0])
-    elbow = shoulder + np.array([
-        np.sin(np.radians(shoulder_angle[0])),
-        np.sin(np.radians(shoulder_angle[1])),
-        np.sin(np.radians(shoulder_angle[2]))
-    ])
-    elbow = elbow / np.linalg.norm(elbow)
-    
-    # Draw the shoulder-to-elbow line
-    ax.plot([shoulder[0], elbow[0]], [shoulder[1], elbow[1]], [shoulder[2], elbow[2]], color='blue', linewidth=6)
-    
-    ax.set_xlim([-2, 2])
-    ax.set_ylim([-2, 2])
-    ax.set_zlim([-2, 2])
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_zlabel('Z')
-    ax.set_title('Shoulder to Elbow Animation')
-
-i = [0]
-
-draw_player(data[i[0]])
 plt.ion()
 plt.show()
+fig.canvas.draw()
+clock.start()
 
-while True:
-    if i[0] < len(data) - 1:
-        i[0] += 1
-        print(data[i[0]])
-        draw_player(data[i[0]])
-        plt.draw()
-        plt.pause(0.01)
-    else:
-        break
+while plt.fignum_exists(fig.number):
+    step = clock.tick()
+    if step is not None:
+        frame = step[0]
+        if not args.quiet:
+            print(data[frame])
+        draw_player(frame)
+        if frame == len(data) - 1:
+            break
+    fig.canvas.flush_events()
+    fig.canvas.start_event_loop(0.001)
+
+if not args.quiet:
+    print(clock.status())
@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from align_joints import align_take, write_offsets
+from data_loader import load_session, offset_path
+from resample import merge_sessions
+from session_format import write_session
+
+RATE = 100.0
+
+
+def swing(n, seed=0):
+    """(n, 3) degrees: smoothed random motion, wrapped to [0, 360)."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0.0, 1.0, (n, 3))
+    kernel = np.hanning(41)
+    steps = np.stack([np.convolve(steps[:, c], kernel / kernel.sum(), "same") for c in range(3)], axis=1)
+    return np.mod(180.0 + 40.0 * np.cumsum(steps, axis=0), 360.0)
+
+
+@pytest.fixture
+def shifted_take(tmp_path):
+    """Two copies of one recording, the second started 5.3 s later."""
+    angles = swing(9000)
+    shoulder, elbow = str(tmp_path / "shoulder.apms"), str(tmp_path / "elbow.apms")
+    write_session(shoulder, angles[:7000], sample_rate=RATE)
+    write_session(elbow, angles[530:], sample_rate=RATE)
+    return {"shoulder": shoulder, "elbow": elbow}
+
+
+def test_offset_found(shifted_take):
+    result, rate = align_take(shifted_take)
+    assert rate == pytest.approx(RATE)
+    assert result["shoulder"][1] == 0.0
+    assert result["elbow"][1] == pytest.approx(5.3, abs=0.005)
+    assert result["elbow"][2] > 0.9
+
+
+@pytest.mark.parametrize("sample_rate", [None, RATE])
+def test_merged_angles_match(shifted_take, sample_rate):
+    write_offsets(align_take(shifted_take)[0], shifted_take["shoulder"], RATE)
+    sessions = [load_session(shifted_take[j]) for j in ("shoulder", "elbow")]
+    assert sessions[0].offset == 0.0  # the reference keeps its times too
+
+    grid, merged = merge_sessions(sessions, sample_rate=sample_rate, span="overlap")
+    assert grid[0] == pytest.approx(5.3, abs=0.01)
+    step = merged[:, 0] - merged[:, 1]
+    step -= 360.0 * np.round(step / 360.0)
+    assert np.abs(step).max() < 0.5
+
+
+def test_unaligned_streams_start_together(shifted_take):
+    sessions = [load_session(shifted_take[j]) for j in ("shoulder", "elbow")]
+    assert all(s.offset is None and s.timestamps is None for s in sessions)
+    grid, _ = merge_sessions(sessions)
+    assert grid[0] == 0.0
+
+
+def test_sidecar_records_the_rate_used(shifted_take):
+    result, rate = align_take(shifted_take)
+    write_offsets(result, shifted_take["shoulder"], rate)
+    with open(offset_path(shifted_take["elbow"])) as f:
+        assert json.load(f)["rate"] == pytest.approx(RATE)
+
+
+def test_rejected_offset_removes_the_old_sidecar(shifted_take):
+    result, rate = align_take(shifted_take)
+    write_offsets(result, shifted_take["shoulder"], rate)
+    assert load_session(shifted_take["elbow"]).offset == pytest.approx(5.3, abs=0.005)
+
+    write_offsets(result, shifted_take["shoulder"], rate, min_score=1.01)  # nothing passes now
+    assert not os.path.exists(offset_path(shifted_take["elbow"]))
+    assert load_session(shifted_take["elbow"]).offset is None
@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from alignment import FrameAligner
+
+CHANNELS = ("x", "y", "z")
+
+
+def notifications(n, rate, loss=0.0, reorder=0.0, seed=0):
+    """(time, channel, value) as SimulatedPeripheral sends them: counter, x, y, z per reading.
+
+    Each value encodes its reading (4 * counter + axis) so the frame it lands
+    in can be checked. Loss drops a notification; reorder holds one back and
+    delivers it after the next one.
+    """
+    rng = np.random.default_rng(seed)
+    out, held = [], None
+    for k in range(n):
+        for i, channel in enumerate(("counter",) + CHANNELS):
+            item = (k / rate + i / rate / 8, channel, k if i == 0 else 4 * k + i - 1)
+            if loss and rng.random() < loss:
+                continue
+            if reorder and held is None and rng.random() < reorder:
+                held = item
+                continue
+            out.append(item)
+            if held is not None:
+                out.append((item[0],) + held[1:])
+                held = None
+    return out
+
+
+def replay(stream, rate):
+    frames = []
+    aligner = FrameAligner(CHANNELS, on_frame=frames.append, sample_rate=rate)
+    for t, channel, value in stream:
+        if channel == "counter":
+            aligner.push_counter(value, t)
+        else:
+            aligner.push_value(channel, float(value), t)
+    aligner.flush(everything=True)
+    return frames, aligner
+
+
+def misplaced(frames):
+    placed = wrong = 0
+    for frame in frames:
+        for c, value in enumerate(frame.values):
+            if not np.isnan(value):
+                placed += 1
+                wrong += value != 4 * frame.counter + c
+    return placed, wrong
+
+
+@pytest.mark.parametrize("rate", [10.0, 100.0, 1000.0])
+def test_clean_stream(rate):
+    frames, aligner = replay(notifications(500, rate), rate)
+    assert [f.counter for f in frames] == list(range(500))
+    assert all(f.complete for f in frames)
+    assert misplaced(frames) == (1500, 0)
+    assert aligner.late == 0
+
+
+@pytest.mark.parametrize("rate", [10.0, 100.0, 1000.0])
+def test_reordered_stream(rate):
+    frames, aligner = replay(notifications(3000, rate, reorder=0.05), rate)
+    assert [f.counter for f in frames] == list(range(3000))
+    assert all(f.complete for f in frames)
+    assert misplaced(frames) == (9000, 0)
+    assert aligner.late == 0
+
+
+@pytest.mark.parametrize("rate", [10.0, 100.0])
+def test_lossy_stream(rate):
+    stream = notifications(3000, rate, loss=0.02)
+    frames, aligner = replay(stream, rate)
+    placed, wrong = misplaced(frames)
+    assert wrong == 0
+    # Every value sent is either in its frame or counted as late (its counter was lost)
+    sent = sum(channel != "counter" for _, channel, _ in stream)
+    assert placed + aligner.late >= sent
+    assert aligner.complete + aligner.incomplete == len(frames)
+
+
+def test_lossy_reordered_stream():
+    frames, aligner = replay(notifications(3000, 10.0, loss=0.02, reorder=0.05), 10.0)
+    counters = [f.counter for f in frames]
+    assert counters == sorted(set(counters))
+    placed, wrong = misplaced(frames)
+    # Only a loss next to a reorder is ambiguous
+    assert wrong <= placed * 0.005
+
+
+def test_values_before_their_counter_are_held():
+    frames = []
+    aligner = FrameAligner(CHANNELS, on_frame=frames.append, sample_rate=10.0)
+    aligner.push_counter(0, 0.0)
+    for i, channel in enumerate(CHANNELS):
+        aligner.push_value(channel, float(i), 0.01)
+    aligner.push_value("x", 10.0, 0.1)  # counter 1 comes after x
+    aligner.push_counter(1, 0.11)
+    aligner.push_value("y", 11.0, 0.12)
+    aligner.push_value("z", 12.0, 0.13)
+    assert [list(f.values) for f in frames] == [[0.0, 1.0, 2.0], [10.0, 11.0, 12.0]]
+    assert aligner.late == 0
+
+
+def test_stale_counter_is_late():
+    frames = []
+    aligner = FrameAligner(CHANNELS, on_frame=frames.append, sample_rate=10.0)
+    aligner.push_counter(5, 0.0)
+    aligner.push_counter(4, 0.01)
+    assert aligner.late == 1
+    assert aligner.pending == 1
+
+
+def test_window_follows_sample_rate():
+    assert FrameAligner(sample_rate=10.0).window == pytest.approx(0.3)
+    assert FrameAligner(sample_rate=1000.0).window == pytest.approx(0.003)
+    assert FrameAligner(sample_rate=10.0, window=1.0).window == 1.0
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from analytics_batch import (content_hash, describe_capture, find_sessions, result_path, run_batch,
+                             session_metrics)
+from gen_data import Swings, wrap_angles
+from session_format import Session, write_session
+
+RATE = 100.0
+SECONDS = 60
+
+
+def swing_angles(seed, seconds=SECONDS):
+    """(frames, 1, 3) swing-mode angles and the swing start times that fall inside them."""
+    n = int(seconds * RATE)
+    swings = Swings((1, 3), RATE, np.random.default_rng(seed))
+    angles = wrap_angles(swings.chunk(n), swings.ranges)
+    schedule = Swings((1, 3), RATE, np.random.default_rng(seed))
+    schedule._schedule(n / RATE)
+    return angles, schedule.starts[schedule.starts <= (n - 1) / RATE]
+
+
+def write_capture(path, seed):
+    angles, _ = swing_angles(seed)
+    write_session(str(path), angles, 1000.0 + np.arange(len(angles)) / RATE, sample_rate=RATE)
+    return str(path)
+
+
+@pytest.fixture
+def captures(tmp_path):
+    data = tmp_path / "Data"
+    data.mkdir()
+    paths = [write_capture(data / f"Halla_Shoulder_Armside_{take}.apms", take) for take in (1, 2)]
+    return data, paths, str(tmp_path / "results")
+
+
+def test_session_metrics_counts_the_swings():
+    angles, starts = swing_angles(3)
+    metrics = session_metrics(Session(angles, np.arange(len(angles)) / RATE))
+    assert metrics["frames"] == len(angles)
+    assert metrics["duration"] == pytest.approx(SECONDS - 1 / RATE)
+    assert metrics["swings"] == len(starts)
+    assert metrics["swings_per_min"] == pytest.approx(len(starts) / metrics["duration"] * 60, abs=0.01)
+    assert 1.5 <= metrics["swing_interval"] <= 4.0
+    assert metrics["peak_speed"] >= metrics["swing_peak_speed"] > 0
+
+
+def test_rom_takes_the_wrap_the_short_way():
+    angles = np.zeros((5, 1, 3))
+    angles[:, 0, 0] = [350.0, 355.0, 0.0, 5.0, 10.0]
+    metrics = session_metrics(Session(angles, np.arange(5) / RATE))
+    assert metrics["rom_x"] == pytest.approx(20.0)
+    assert metrics["rom_y"] == metrics["rom_z"] == 0.0
+    assert metrics["swings"] == 0
+
+
+def test_rerun_only_computes_new_captures(captures):
+    data, paths, cache_dir = captures
+    results, computed, failures = run_batch(find_sessions([str(data)]), workers=2, cache_dir=cache_dir)
+    assert computed == 2 and not failures
+    assert sorted(results) == sorted(paths)
+    assert all(os.path.exists(result_path(content_hash(p), cache_dir)) for p in paths)
+
+    again, computed, failures = run_batch(find_sessions([str(data)]), workers=2, cache_dir=cache_dir)
+    assert computed == 0 and not failures
+    assert again == results
+
+    added = write_capture(data / "Halla_Shoulder_Armside_3.apms", 3)
+    more, computed, failures = run_batch(find_sessions([str(data)]), workers=2, cache_dir=cache_dir)
+    assert computed == 1 and not failures
+    assert sorted(more) == sorted(paths + [added])
+    assert {p: more[p] for p in paths} == results
+
+
+def test_cache_follows_the_contents(captures):
+    data, paths, cache_dir = captures
+    run_batch(paths, workers=1, cache_dir=cache_dir)
+    copy = data / "Halla_Shoulder_Armside_9.apms"
+    copy.write_bytes(open(paths[0], "rb").read())  # a copy hits the cache
+    results, computed, _ = run_batch([str(copy)], workers=1, cache_dir=cache_dir)
+    assert computed == 0
+    _, computed, _ = run_batch([str(copy)], workers=1, use_cache=False, cache_dir=cache_dir)
+    assert computed == 1
+    assert describe_capture(str(copy))["take"] == "9"
+
+
+def test_failures_are_reported_not_cached(captures, tmp_path):
+    _, _, cache_dir = captures
+    broken = tmp_path / "Halla_Shoulder_Armside_4.apms"
+    broken.write_bytes(b"not a session")
+    results, computed, failures = run_batch([str(broken)], workers=1, cache_dir=cache_dir)
+    assert computed == 0 and not results
+    assert list(failures) == [str(broken)]
+    _, computed, failures = run_batch([str(broken)], workers=1, cache_dir=cache_dir)
+    assert list(failures) == [str(broken)]
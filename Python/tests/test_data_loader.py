@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from data_loader import Dialect, load_session, parse_lines, parse_text
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Data")
+
+JUNK = [b"1 2 -", b"- - -", b"1-2 3 4", b"... . .", b"e e e", b"1.2.3 4 5", b"+-1 2 3"]
+
+
+@pytest.mark.parametrize("junk", JUNK)
+def test_junk_rows_are_dropped(junk):
+    raw = b"1 2 3\n" + junk + b"\n4 5 6\n"
+    values, timestamps, starts = parse_lines(raw, Dialect("whitespace", 3, False))
+    assert values.tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert timestamps is None
+    assert starts.tolist() == [0, len(raw) - 6]
+
+
+def test_junk_comma_rows_are_dropped():
+    values, _ = parse_text("Calibrating...\n-80.12, -72.69, -66.94\n-, -, -\n1.5, 2, 3\n")
+    assert values.tolist() == [[-80.12, -72.69, -66.94], [1.5, 2, 3]]
+
+
+@pytest.mark.parametrize("junk", [b"1 2 3 T:T", b"1 2 - 2025-03-25T13:16:20.6", b"1 2 3 2025-13-45T99:16:20"])
+def test_junk_timestamp_rows_are_dropped(junk):
+    raw = b"1 2 3 2025-03-25T13:16:20.5\n" + junk + b"\n4 5 6 2025-03-25T13:16:20.7\n"
+    values, timestamps, _ = parse_lines(raw, Dialect("whitespace", 3, True))
+    assert values.tolist() == [[1, 2, 3], [4, 5, 6]]
+    assert np.diff(timestamps) == pytest.approx([0.2])
+
+
+def test_clean_block():
+    raw = b"".join(b"%d %d %d\n" % (i, i + 1, i + 2) for i in range(1000))
+    values, _, starts = parse_lines(raw, Dialect("whitespace", 3, False))
+    assert values.shape == (1000, 3)
+    assert values[-1].tolist() == [999, 1000, 1001]
+    assert len(starts) == 1000
+
+
+@pytest.mark.parametrize("name", ["racket w white background.jpg", "racket.jpg"])
+def test_images_load_empty(name):
+    path = os.path.join(DATA, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not in Data/")
+    assert len(load_session(path, use_cache=False)) == 0
+
+
+def test_cache_applies_channels_and_rate_on_every_load(tmp_path, monkeypatch):
+    import data_loader
+
+    monkeypatch.setattr(data_loader, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "nine.txt"
+    path.write_text("".join(" ".join(str(9 * k + c) for c in range(9)) + "\n" for k in range(20)))
+
+    default = load_session(str(path))
+    assert default.angles.shape == (20, 3, 3) and default.sample_rate == 0.0
+    single = load_session(str(path), channels=1, sample_rate=100.0)
+    assert single.angles.shape == (20, 9, 1)
+    assert single.sample_rate == 100.0
+    assert single.times()[1] == pytest.approx(0.01)
+    np.testing.assert_array_equal(single.angles.reshape(20, 9), default.angles.reshape(20, 9))
+    np.testing.assert_array_equal(single.angles, load_session(str(path), 1, use_cache=False).angles)
+    assert len(os.listdir(tmp_path / "cache")) == 1  # one parse serves both
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bleak")
+
+import discovery  # noqa: E402
+from discovery import DeviceNotFoundError, cache_key, cached_address, connect, forget, remember  # noqa: E402
+from sim_peripheral import SimulatedPeripheral, simulated  # noqa: E402
+
+SHOULDER, ELBOW, OTHER = "SIM:00:00:00:00:01", "SIM:00:00:00:00:02", "SIM:00:00:00:00:09"
+
+
+@pytest.fixture(autouse=True)
+def cache_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(discovery, "DEVICE_CACHE", str(tmp_path / "devices.json"))
+    monkeypatch.setattr(discovery, "SCAN_TIMEOUT", 0.3)
+
+
+def units(*addresses):
+    """Simulated units advertising the same name, in this order."""
+    return [SimulatedPeripheral(np.zeros((10, 3)), address=a) for a in addresses]
+
+
+def run_connect(peripherals, **kwargs):
+    async def main():
+        client = await connect(verbose=False, **kwargs)
+        address = client.address
+        await client.disconnect()
+        return address
+
+    path = discovery.DEVICE_CACHE
+    with simulated(*peripherals):
+        discovery.DEVICE_CACHE = path  # simulated() swaps in a temporary cache; keep the test's
+        return asyncio.run(main())
+
+
+def test_units_with_one_name_have_their_own_entries():
+    remember(cache_key(unit="shoulder"), SHOULDER)
+    remember(cache_key(unit="wrist"), OTHER)
+    assert cached_address(cache_key(unit="shoulder")) == SHOULDER
+    assert cached_address(cache_key(unit="wrist")) == OTHER
+    assert cached_address(cache_key()) is None
+    assert cache_key("ESP32", "ABC") != cache_key("ESP32", "DEF")
+
+
+def test_address_is_never_cached_for_two_units():
+    assert remember(cache_key(unit="shoulder"), SHOULDER)
+    assert not remember(cache_key(unit="elbow"), SHOULDER.lower())
+    assert cached_address(cache_key(unit="elbow")) is None
+    assert remember(cache_key(unit="shoulder"), SHOULDER)  # refreshing its own entry is fine
+
+
+def test_cache_writes_are_atomic():
+    remember(cache_key(unit="shoulder"), SHOULDER)
+    remember(cache_key(unit="elbow"), ELBOW)
+    forget(cache_key(unit="shoulder"))
+    with open(discovery.DEVICE_CACHE) as f:
+        assert list(json.load(f)) == [cache_key(unit="elbow")]
+    assert not os.path.exists(discovery.DEVICE_CACHE + ".tmp")
+
+
+def test_stale_entry_scans_past_the_other_units():
+    remember(cache_key(unit="shoulder"), SHOULDER)
+    remember(cache_key(unit="elbow"), OTHER)  # that unit is gone
+    # The shoulder advertises first; the elbow's scan must not take it
+    address = run_connect(units(SHOULDER, ELBOW), unit="elbow", attempts=2)
+    assert address == ELBOW
+    assert cached_address(cache_key(unit="elbow")) == ELBOW
+    assert cached_address(cache_key(unit="shoulder")) == SHOULDER
+
+
+def test_connected_units_are_excluded():
+    address = run_connect(units(SHOULDER, ELBOW), unit="elbow", exclude=[SHOULDER], attempts=1)
+    assert address == ELBOW
+
+
+def test_explicit_address_only_accepts_that_device():
+    with pytest.raises(DeviceNotFoundError):
+        run_connect(units(SHOULDER, ELBOW), address=OTHER, unit="wrist", attempts=2)
+    assert cached_address(cache_key(unit="wrist")) is None
+    assert run_connect(units(SHOULDER, ELBOW), address=ELBOW, unit="elbow", attempts=1) == ELBOW
+
+
+def test_backoff_without_a_limit():
+    async def first(n):
+        seen = []
+        async for attempt in discovery.backoff(None, start=0.0):
+            seen.append(attempt)
+            if len(seen) == n:
+                return seen
+
+    assert asyncio.run(first(10)) == list(range(10))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("bleak")
+
+import live_stream  # noqa: E402
+from live_stream import LiveStream  # noqa: E402
+from session_manager import JointFrameMerger, SensorSpec  # noqa: E402
+
+SPECS = [SensorSpec.parse("a/shoulder=AA:00:00:00:00:01")]
+
+
+def test_start_raises_when_the_session_fails(monkeypatch):
+    class Broken:
+        def __init__(self, *args):
+            raise RuntimeError("no adapter")
+
+    monkeypatch.setattr(live_stream, "SessionManager", Broken)
+    stream = LiveStream(SPECS, ["shoulder"])
+    with pytest.raises(RuntimeError, match="no adapter"):
+        stream.start()
+    assert "no adapter" in stream.status()
+
+
+def test_arrival_is_the_newest_notification():
+    class Ring:
+        def __init__(self):
+            self.times = []
+
+        def write(self, t, seq, values):
+            self.times.append(t)
+
+    ring = Ring()
+    specs = SPECS + [SensorSpec.parse("a/elbow=AA:00:00:00:00:02")]
+    merger = JointFrameMerger(specs, ring, 10.0)
+    merger.push(0, 0.0, np.zeros(3))
+    merger.push(1, 0.0, np.zeros(3))
+    merger.push(0, 0.1, np.ones(3))
+    merger.push(1, 0.14, np.ones(3))  # the elbow's frame arrives 40 ms after the grid time
+    assert ring.times == pytest.approx([0.0, 0.1])
+    assert merger.arrival(1) == pytest.approx(0.14)
+    assert np.isnan(merger.arrival(5))
@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+
+from recorder import HEADER_SIZE, Recorder, _pack_header, convert, encode_chunk, read_log, recover
+from ring_buffer import RingBuffer
+from session_format import open_session
+
+
+def write_log(path, chunks, channels=3):
+    with open(path, "wb") as f:
+        f.write(_pack_header(channels, np.dtype("<f4"), 100.0, 0.0))
+        for times, seqs, values in chunks:
+            f.write(encode_chunk(times, seqs, values))
+
+
+def chunk(start, n, channels=3):
+    seqs = np.arange(start, start + n)
+    return seqs / 100.0, seqs, np.tile(seqs[:, None], (1, channels)).astype("<f4")
+
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / "live.aplog")
+    ring = RingBuffer(1000, 3)
+    recorder = Recorder(path, ring, 100.0, chunk_samples=64).start()
+    for k in range(300):
+        ring.write(k / 100.0, k, np.full(3, k, dtype=np.float32))
+    recorder.close()
+
+    header, times, seqs, values = read_log(path)
+    assert header["channels"] == 3 and header["sample_rate"] == 100.0
+    assert seqs.tolist() == list(range(300))
+    np.testing.assert_array_equal(times, np.arange(300) / 100.0)
+    np.testing.assert_array_equal(values[:, 2], np.arange(300))
+
+    session = open_session(convert(path))
+    np.testing.assert_array_equal(session.angles[:, 0, 0], np.arange(300))
+    np.testing.assert_array_equal(session.timestamps, times)
+
+
+def test_truncated_chunk_is_recovered(tmp_path):
+    path = str(tmp_path / "crash.aplog")
+    write_log(path, [chunk(0, 50), chunk(50, 50)])
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(encode_chunk(*chunk(100, 50))[:-10])  # power lost mid-write
+
+    assert read_log(path)[2].tolist() == list(range(100))
+    chunks, samples, removed = recover(path)
+    assert (chunks, samples) == (2, 100)
+    assert removed > 0 and os.path.getsize(path) == intact
+    assert recover(path)[2] == 0
+
+
+def test_corrupt_chunk_stops_the_scan(tmp_path):
+    path = str(tmp_path / "corrupt.aplog")
+    write_log(path, [chunk(0, 50), chunk(50, 50)])
+    with open(path, "r+b") as f:
+        f.seek(-5, os.SEEK_END)
+        f.write(b"xxxxx")
+    assert read_log(path)[2].tolist() == list(range(50))
+
+
+def test_recorder_appends_after_recovery(tmp_path):
+    path = str(tmp_path / "resume.aplog")
+    write_log(path, [chunk(0, 50)])
+    with open(path, "ab") as f:
+        f.write(b"CHNK\x05")  # a chunk header cut short
+    ring = RingBuffer(100, 3)
+    recorder = Recorder(path, ring, chunk_samples=10).start()
+    assert recorder.recovered_bytes == 5
+    for k in range(50, 60):
+        ring.write(k / 100.0, k, np.full(3, k, dtype=np.float32))
+    recorder.close()
+    assert read_log(path)[2].tolist() == list(range(60))
+
+
+def test_empty_log(tmp_path):
+    path = str(tmp_path / "empty.aplog")
+    write_log(path, [])
+    assert os.path.getsize(path) == HEADER_SIZE
+    header, times, seqs, values = read_log(path)
+    assert len(times) == 0 and values.shape == (0, 3)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from resample import clean_times, common_grid, merge_streams, resample_angles
+
+
+def test_interpolates_the_short_way_across_359_to_1():
+    times = np.array([0.0, 1.0, 2.0])
+    angles = np.array([[358.0, -179.0], [359.0, 179.0], [1.0, -179.0]])
+    out = resample_angles(times, angles, np.array([1.25, 1.5, 1.75]))
+    # 359 -> 1 goes up through 0, not back down through 180; the same for +/-180
+    assert out[:, 0] == pytest.approx([359.5, 0.0, 0.5])
+    assert out[:, 1] == pytest.approx([179.5, -180.0, -179.5])
+    assert np.all((out[:, 0] >= 0) & (out[:, 0] < 360))
+    assert np.all((out[:, 1] >= -180) & (out[:, 1] < 180))
+
+
+def test_holds_the_ends_outside_the_stream():
+    times = np.array([1.0, 2.0])
+    angles = np.array([[10.0], [20.0]])
+    assert resample_angles(times, angles, np.array([0.0, 1.5, 3.0]))[:, 0] == pytest.approx([10.0, 15.0, 20.0])
+
+
+def test_common_grid_union_and_overlap():
+    a = (np.arange(0.0, 10.01, 0.1), None)   # 10 Hz over 0..10 s
+    b = (np.arange(2.0, 12.01, 0.05), None)  # 20 Hz over 2..12 s
+    union = common_grid([a, b])
+    assert union[0] == pytest.approx(0.0) and union[-1] == pytest.approx(12.0)
+    assert np.diff(union) == pytest.approx(0.05)  # the fastest stream's rate
+    overlap = common_grid([a, b], sample_rate=10.0, span="overlap")
+    assert overlap[0] == pytest.approx(2.0) and overlap[-1] == pytest.approx(10.0)
+    assert len(overlap) == 81
+
+
+def test_common_grid_rejects_disjoint_streams():
+    a = (np.arange(0.0, 1.0, 0.1), None)
+    b = (np.arange(5.0, 6.0, 0.1), None)
+    with pytest.raises(ValueError, match="do not overlap"):
+        common_grid([a, b], span="overlap")
+    with pytest.raises(ValueError, match="span"):
+        common_grid([a, b], span="middle")
+
+
+def test_merge_drops_duplicate_and_incomplete_samples():
+    times = np.array([0.0, 0.5, 0.5, 1.0, 2.0])
+    angles = np.array([[0.0], [5.0], [99.0], [np.nan], [20.0]])
+    t, a = clean_times(times, angles)
+    assert t == pytest.approx([0.0, 0.5, 2.0])
+    assert a[:, 0] == pytest.approx([0.0, 5.0, 20.0])
+    grid, merged = merge_streams([(times, angles), (np.array([0.0, 2.0]), np.array([[1.0], [359.0]]))],
+                                 sample_rate=2.0)
+    assert merged.shape == (5, 2, 1)
+    assert merged[:, 1, 0] == pytest.approx([1.0, 0.5, 0.0, 359.5, 359.0])
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from session_format import SessionFormatError, SessionWriter, convert, open_session, write_session
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_round_trip(tmp_path, dtype):
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(-180, 180, (500, 3, 3)).astype(dtype)
+    times = np.cumsum(rng.uniform(0.009, 0.011, 500))
+    path = str(tmp_path / "take.apms")
+    write_session(path, angles, times, ["shoulder", "elbow", "wrist"], 100.0, dtype)
+
+    session = open_session(path)
+    assert session.angles.dtype == dtype
+    np.testing.assert_array_equal(session.angles, angles)
+    np.testing.assert_array_equal(session.timestamps, times)
+    assert session.joint_names == ["shoulder", "elbow", "wrist"]
+    assert session.sample_rate == 100.0
+    np.testing.assert_array_equal(session.joint("elbow"), angles[:, 1])
+
+
+def test_untimed_and_empty(tmp_path):
+    path = str(tmp_path / "untimed.apms")
+    write_session(path, np.zeros((10, 3)), sample_rate=20.0)
+    session = open_session(path)
+    assert session.timestamps is None
+    assert session.angles.shape == (10, 1, 3)
+    assert session.times()[-1] == pytest.approx(9 / 20.0)
+
+    path = str(tmp_path / "empty.apms")
+    write_session(path, np.zeros((0, 1, 3)))
+    assert len(open_session(path)) == 0
+
+
+def test_writer_in_chunks(tmp_path):
+    angles = np.arange(60, dtype=np.float32).reshape(20, 1, 3)
+    path = str(tmp_path / "chunks.apms")
+    with SessionWriter(path, 20, 1, 3) as writer:
+        for start in range(0, 20, 7):
+            writer.write(angles[start:start + 7])
+        with pytest.raises(SessionFormatError):
+            writer.write(angles[:1])
+    np.testing.assert_array_equal(open_session(path).angles, angles)
+
+
+def test_convert_text_capture(tmp_path):
+    src = tmp_path / "capture.csv"
+    src.write_text("booting...\n1.5 2 3\n4 5 6\n")
+    session = open_session(convert(str(src)))
+    assert session.angles[:, 0].tolist() == [[1.5, 2, 3], [4, 5, 6]]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("bleak")
+
+from session_manager import JointFrameMerger, SensorSpec, check_targets  # noqa: E402
+
+SHOULDER = "a/shoulder=AA:00:00:00:00:01"
+ELBOW = "a/elbow=AA:00:00:00:00:02"
+
+
+class RingStub:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, t, counter, values):
+        self.frames.append((t, values.copy()))
+
+
+def test_unit_that_never_reports_is_not_waited_for():
+    ring = RingStub()
+    merger = JointFrameMerger([SensorSpec.parse(SHOULDER), SensorSpec.parse(ELBOW)], ring, 10.0)
+    for k in range(10):
+        merger.push(0, k * 0.1, np.full(3, float(k)))
+    # Every frame up to the shoulder's newest is written as soon as it arrives
+    assert [round(t, 1) for t, _ in ring.frames] == [round(0.1 * k, 1) for k in range(len(ring.frames))]
+    assert len(ring.frames) >= 9
+    values = np.array([v for _, v in ring.frames]).reshape(-1, 1, 2, 3)
+    assert np.isnan(values[:, 0, 1]).all()
+    assert values[:, 0, 0, 0].tolist() == list(range(len(ring.frames)))
+
+
+def test_live_unit_is_waited_for():
+    ring = RingStub()
+    merger = JointFrameMerger([SensorSpec.parse(SHOULDER), SensorSpec.parse(ELBOW)], ring, 10.0)
+    merger.push(1, 0.0, np.zeros(3))
+    merger.push(0, 0.0, np.zeros(3))
+    merger.push(0, 0.1, np.ones(3))  # the elbow has not reported 0.1 yet
+    assert len(ring.frames) == 1
+    merger.push(1, 0.1, np.ones(3))
+    assert len(ring.frames) == 2
+
+
+def test_duplicate_targets_are_rejected():
+    with pytest.raises(ValueError):
+        check_targets([SensorSpec.parse("a/shoulder=ESP32"), SensorSpec.parse("a/elbow=ESP32")])
+    with pytest.raises(ValueError):
+        check_targets([SensorSpec.parse(SHOULDER), SensorSpec.parse("b/wrist=aa:00:00:00:00:01")])
+    check_targets([SensorSpec.parse(SHOULDER), SensorSpec.parse(ELBOW)])
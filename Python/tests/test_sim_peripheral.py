@@ -0,0 +1,39 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("bleak")
+
+from sim_peripheral import SimulatedPeripheral, run_ingest, simulated, synthetic_swing  # noqa: E402
+
+RATE = 100.0
+DURATION = 2.0
+
+
+def ingest(**kwargs):
+    peripheral = SimulatedPeripheral(synthetic_swing(), RATE, seed=3, **kwargs)
+    with simulated(peripheral):
+        frames, aligner, latencies, _ = asyncio.run(run_ingest(peripheral, DURATION))
+    readings = (peripheral.sent + peripheral.lost + (peripheral._held is not None)) // 4
+    return peripheral, frames, aligner, readings
+
+
+def test_clean_stream():
+    peripheral, frames, aligner, readings = ingest()
+    assert peripheral.lost == peripheral.reordered == 0
+    assert frames == aligner.complete == readings
+    assert aligner.incomplete == aligner.late == 0
+    assert frames >= 0.8 * RATE * DURATION
+
+
+def test_lossy_reordered_stream():
+    peripheral, frames, aligner, readings = ingest(loss=0.02, reorder=0.05)
+    assert peripheral.lost > 0 and peripheral.reordered > 0
+    assert aligner.complete + aligner.incomplete == frames
+    # A frame is only missing when its counter notification was lost
+    assert readings - peripheral.lost <= frames <= readings
+    # Incomplete frames and late values come from lost notifications only
+    assert aligner.incomplete <= peripheral.lost
+    assert aligner.late <= 3 * peripheral.lost
+    assert aligner.complete >= readings - 4 * peripheral.lost
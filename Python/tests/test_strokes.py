@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from gen_data import SWING_DURATION, Swings, generate
+from playback import PlaybackClock
+from strokes import PAD, Stroke, StrokeNavigator, detect
+
+RATE = 100.0
+HOURS = 3
+SEED = 1  # gen_data.py --mode swing --seed 1
+SHAPE = (3, 3)
+
+
+class Capture:
+    """Writer for gen_data.generate that keeps the frames in memory."""
+
+    def __init__(self):
+        self.times, self.angles = [], []
+
+    def write(self, angles, times):
+        self.times.append(times)
+        self.angles.append(angles)
+
+
+def swings():
+    # seeded the way gen_data.py's main seeds the first athlete
+    return Swings(SHAPE, RATE, np.random.default_rng(np.random.SeedSequence(SEED).spawn(1)[0]))
+
+
+@pytest.fixture(scope="module")
+def session():
+    n = int(HOURS * 3600 * RATE)
+    capture = Capture()
+    generate([capture], [swings()], n, RATE, 0.0)
+    times = np.concatenate(capture.times)
+    # the same seed replays the same swing times; keep those that begin in the session
+    schedule = swings()
+    schedule._schedule(times[-1])
+    return times, np.concatenate(capture.angles), schedule.starts[schedule.starts <= times[-1]]
+
+
+def test_detects_every_generated_swing(session):
+    times, angles, scheduled = session
+    detector = detect(times, angles)
+    starts = np.array([s.start for s in detector.strokes])
+    impacts = np.array([s.impact for s in detector.strokes])
+    assert len(detector.strokes) == len(scheduled) == 3924
+    assert detector.rejected == 0
+    assert np.abs(starts - scheduled).max() < 0.05
+    assert np.all((impacts > scheduled) & (impacts < scheduled + SWING_DURATION))
+
+
+def test_block_size_does_not_change_the_strokes(session):
+    times, angles, _ = session
+    n = int(600 * RATE)
+    assert detect(times[:n], angles[:n], block=777).strokes == detect(times[:n], angles[:n]).strokes
+
+
+# --- StrokeNavigator ---
+
+class FakeWall:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+STROKES = [Stroke(10.0, 10.3, 10.6, 500.0), Stroke(20.0, 20.3, 20.6, 500.0), Stroke(30.0, 30.3, 30.6, 500.0)]
+
+
+def navigator(loop=True):
+    wall = FakeWall()
+    clock = PlaybackClock(n_frames=int(40 * RATE), sample_rate=RATE, loop=loop, clock=wall)
+    clock.start(0.0)
+    return StrokeNavigator(clock, STROKES), clock, wall
+
+
+def test_next_and_previous():
+    nav, clock, wall = navigator()
+    nav.next()
+    assert clock.session_time() == pytest.approx(10.0 - PAD)
+    nav.next()
+    assert clock.session_time() == pytest.approx(20.0 - PAD)
+    wall.now += 0.1  # just started: back goes to the stroke before
+    nav.previous()
+    assert clock.session_time() == pytest.approx(10.0 - PAD)
+    wall.now += 1.0  # well into it: back restarts it
+    nav.previous()
+    assert clock.session_time() == pytest.approx(10.0 - PAD)
+    nav.previous()
+    assert clock.session_time() == pytest.approx(30.0 - PAD)  # wraps round
+    assert nav.status() == "stroke 3/3"
+
+
+def test_loop_replays_one_stroke():
+    nav, clock, wall = navigator()
+    clock.start(15.0)  # between strokes: loop the coming one
+    nav.toggle_loop()
+    assert nav.looping == 1
+    assert clock.session_time() == pytest.approx(20.0 - PAD)
+    wall.now += 1.5  # past the stroke's finish plus pad
+    nav.update()
+    assert clock.session_time() == pytest.approx(20.0 - PAD)
+    nav.toggle_loop()
+    assert nav.looping is None
+
+
+def test_skip_idle_jumps_to_the_next_stroke():
+    nav, clock, wall = navigator()
+    nav.toggle_skip_idle()
+    nav.update()
+    assert clock.session_time() == pytest.approx(10.0 - PAD)
+    wall.now += 0.5  # inside the stroke: no jump
+    nav.update()
+    assert clock.session_time() == pytest.approx(10.0 - PAD + 0.5)
+    wall.now += 1.0
+    nav.update()
+    assert clock.session_time() == pytest.approx(20.0 - PAD)
+
+
+def test_ignores_strokes_outside_the_clock():
+    clock = PlaybackClock(n_frames=int(25 * RATE), sample_rate=RATE, clock=FakeWall())
+    assert len(StrokeNavigator(clock, STROKES)) == 2
+    assert StrokeNavigator(clock, []).status() == "no strokes"
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pytest
+
+from data_loader import load_session, offset_path
+from recorder import _pack_header, encode_chunk
+from session_format import write_session
+from time_index import open_index, read_range, read_window
+
+N = 2000
+RATE = 50.0
+
+
+def angles(n=N):
+    k = np.arange(n)
+    return np.stack([k % 360, (2 * k) % 360, (k * 0.5) % 180], axis=1).astype(np.float64)
+
+
+def write_text(path, timestamps=False, separator=" "):
+    start = np.datetime64("2025-03-25T13:16:20.000000")
+    with open(path, "w") as f:
+        f.write("Booting...\nX: 125.00\n")
+        for k, row in enumerate(angles()):
+            line = separator.join(f"{v:.2f}" for v in row)
+            if timestamps:
+                line += f" {start + np.timedelta64(int(k * 1e6 / RATE), 'us')}"
+            f.write(line + "\n")
+            if k == 777:
+                f.write("1 2 -\n")  # junk mid-file
+
+
+def write_log(path):
+    a = angles().astype("<f4")
+    with open(path, "wb") as f:
+        f.write(_pack_header(3, np.dtype("<f4"), RATE, 0.0))
+        for start in range(0, N, 300):
+            seqs = np.arange(start, min(start + 300, N))
+            f.write(encode_chunk(100.0 + seqs / RATE, seqs, a[seqs]))
+
+
+@pytest.fixture(params=["text", "text-timestamps", "text-comma", "log", "apms"])
+def capture(request, tmp_path):
+    kind = request.param
+    if kind == "log":
+        path = str(tmp_path / "live.aplog")
+        write_log(path)
+    elif kind == "apms":
+        path = str(tmp_path / "take.apms")
+        write_session(path, angles(), np.arange(N) / RATE + 5.0, sample_rate=RATE)
+    else:
+        path = str(tmp_path / "capture.csv")
+        write_text(path, timestamps=kind == "text-timestamps", separator=", " if kind == "text-comma" else " ")
+    return path
+
+
+def expected(path, t0, t1):
+    session = load_session(path, use_cache=False)
+    times = np.asarray(session.times())
+    keep = (times >= t0) & (times <= t1)
+    return times[keep], np.asarray(session.angles)[keep]
+
+
+@pytest.mark.parametrize("every", [16, 256])
+def test_read_range_matches_load_session(capture, every):
+    index = open_index(capture, every=every)
+    assert index.frames == N
+    span = index.end_time - index.start_time
+    for a, b in [(0.0, 1.0), (0.1, 0.35), (0.5, 0.5), (0.9, 1.2), (-0.5, 0.01)]:
+        t0, t1 = index.start_time + a * span, index.start_time + b * span
+        window = index.read_range(t0, t1)
+        times, values = expected(capture, t0, t1)
+        np.testing.assert_allclose(window.times(), times)
+        np.testing.assert_allclose(window.angles, values, atol=1e-4)
+
+
+def test_sidecar_is_reused_and_rebuilt(capture):
+    first = open_index(capture)
+    second = open_index(capture)
+    assert second.frames == first.frames
+    if capture.endswith(".csv"):
+        with open(capture) as f:
+            row = f.readlines()[-1]
+        with open(capture, "a") as f:
+            f.write(row)  # the file changed: the sidecar is out of date
+        assert open_index(capture).frames == N + 1
+
+
+def test_offset_applies_like_load_session(tmp_path):
+    path = str(tmp_path / "capture.csv")
+    write_text(path)
+    with open(offset_path(path), "w") as f:
+        json.dump({"offset": 2.5}, f)
+    window = read_range(path, 3.0, 4.0)
+    times, values = expected(path, 3.0, 4.0)
+    assert times[0] >= 3.0
+    np.testing.assert_allclose(window.times(), times)
+    np.testing.assert_allclose(window.angles, values)
+    assert window.offset == 2.5
+
+
+def test_read_window(capture):
+    window = read_window(capture, 1.0, 2.0)
+    times = np.asarray(load_session(capture, use_cache=False).times())
+    assert window.times()[0] == pytest.approx(times[0] + 1.0, abs=1.0 / RATE)
+    assert window.times()[-1] <= times[0] + 3.0 + 1e-9
@@ -0,0 +1,261 @@
+import argparse
+import io
+import os
+import time
+
+import numpy as np
+
+from data_loader import (SNIFF_BYTES, Dialect, _iter_line_blocks, load_offset, parse_block, parse_lines,
+                         sniff_dialect, values_to_angles)
+from recorder import HEADER_SIZE as LOG_HEADER_SIZE, LOG_SUFFIX, decode_chunk, read_log_header, scan_chunks
+from session_format import DEFAULT_SAMPLE_RATE, Session, is_session_file, open_session
+
+# Random access by time into long recordings.
+#
+# A sidecar (<file>.index.npz) holds a checkpoint every INDEX_EVERY frames:
+# the byte offset where that frame's line (or a recorder log's chunk)
+# starts, and its time. It is built in one pass the first time a file is
+# opened and rebuilt when the file's size or mtime changes. read_range then
+# reads only the bytes between the checkpoints around [t0, t1], so a window
+# an hour into a capture costs a few kilobytes of I/O instead of a full parse.
+# Session files (.apms) need no sidecar: they are memory-mapped and searched
+# in place. Times are assumed to increase through the file.
+#
+#   python time_index.py practice.csv --start 2820 --duration 30   # minute 47
+
+INDEX_SUFFIX = ".index.npz"
+INDEX_VERSION = 1
+INDEX_EVERY = 256  # frames between checkpoints in text captures (logs use one per chunk)
+
+
+def index_path(path):
+    return str(path) + INDEX_SUFFIX
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime
+
+
+# --- Building ---
+
+def build_text_index(path, every=INDEX_EVERY):
+    """Checkpoint arrays for a text capture: one pass over the file, block by block."""
+    with open(path, "rb") as f:
+        dialect = sniff_dialect(f.read(SNIFF_BYTES).decode("utf-8", errors="replace"))
+        f.seek(0)
+        offsets, times = [], []
+        frames = 0
+        position = 0
+        end_time = 0.0
+        if dialect is not None:
+            for block in _iter_line_blocks(f):
+                _, timestamps, starts = parse_lines(block, dialect)
+                picks = np.arange(-frames % every, len(starts), every)
+                offsets.append(position + starts[picks])
+                if dialect.has_timestamp and len(starts):
+                    times.append(timestamps[picks])
+                    end_time = timestamps[-1]
+                frames += len(starts)
+                position += len(block)
+    offsets = np.concatenate(offsets + [[position]]).astype(np.int64)
+    checkpoints = np.arange(len(offsets) - 1, dtype=np.int64) * every
+    return {"kind": "text", "every": every, "offsets": offsets, "frames": np.append(checkpoints, frames),
+            "times": np.concatenate(times) if times else np.empty(0), "end_time": end_time,
+            "separator": dialect.separator if dialect else "", "n_columns": dialect.n_columns if dialect else 0,
+            "has_timestamp": bool(dialect and dialect.has_timestamp)}
+
+
+def build_log_index(path):
+    """Checkpoint arrays for a recorder log: one per intact chunk."""
+    offsets, frames, times = [], [0], []
+    end_time = 0.0
+    with open(path, "rb") as f:
+        header = read_log_header(f)
+        position = LOG_HEADER_SIZE
+        for offset, n, payload in scan_chunks(f):
+            chunk_times = decode_chunk(payload, n, header["channels"], header["dtype"])[0]
+            offsets.append(offset)
+            frames.append(frames[-1] + n)
+            times.append(chunk_times[0])
+            end_time = chunk_times[-1]
+            position = f.tell()
+    return {"kind": "log", "every": 0, "offsets": np.array(offsets + [position], dtype=np.int64),
+            "frames": np.array(frames, dtype=np.int64), "times": np.array(times), "end_time": end_time,
+            "separator": "", "n_columns": header["channels"], "has_timestamp": True}
+
+
+def write_index(path, index):
+    size, mtime = _source_stamp(path)
+    with open(index_path(path), "wb") as f:
+        np.savez(f, version=INDEX_VERSION, size=size, mtime=mtime, **index)
+
+
+def read_index(path):
+    """The stored checkpoints for path, or None if missing, unreadable or out of date."""
+    try:
+        with np.load(index_path(path), allow_pickle=False) as stored:
+            index = {key: stored[key] for key in stored.files}
+    except (OSError, ValueError, KeyError):
+        return None
+    if int(index.pop("version")) != INDEX_VERSION or \
+            (int(index.pop("size")), float(index.pop("mtime"))) != _source_stamp(path):
+        return None
+    for key in ("kind", "separator"):
+        index[key] = str(index[key])
+    for key in ("every", "n_columns"):
+        index[key] = int(index[key])
+    index["end_time"] = float(index["end_time"])
+    index["has_timestamp"] = bool(index["has_timestamp"])
+    return index
+
+
+# --- Reading ---
+
+class TimeIndex:
+    """Windows of one capture by time, in the same times load_session gives.
+
+    Text captures without timestamps use frame / sample_rate (the default
+    rate when none is given), like Session.times().
+    """
+
+    def __init__(self, path, index=None, channels=3, sample_rate=0.0, aligned=True):
+        self.path = path
+        self.index = index
+        self.channels = channels
+        self.sample_rate = float(sample_rate)
+        self.sidecar_offset = load_offset(path, None) if aligned else None
+        self.offset = self.sidecar_offset or 0.0
+        self._session = open_session(path) if index is None else None
+
+        if self._session is not None:
+            self.frames = len(self._session)
+            times = self._session.times()
+            first, last = (times[0], times[-1]) if self.frames else (0.0, 0.0)
+        else:
+            self.frames = int(index["frames"][-1])
+            self.dialect = Dialect(index["separator"], index["n_columns"], index["has_timestamp"])
+            if index["has_timestamp"]:
+                self._checkpoint_times = index["times"]
+                last = index["end_time"]
+            else:
+                self._checkpoint_times = index["frames"][:-1] / self._rate()
+                last = (self.frames - 1) / self._rate()
+            first = self._checkpoint_times[0] if self.frames else 0.0
+        self.start_time = float(first) + self.offset
+        self.end_time = float(last) + self.offset if self.frames else self.start_time
+
+    def _rate(self):
+        return self.sample_rate or DEFAULT_SAMPLE_RATE
+
+    def read_range(self, t0, t1):
+        """Session of the frames with t0 <= time <= t1 (seconds)."""
+        t0 -= self.offset
+        t1 -= self.offset
+        if self._session is not None:
+            times, angles = self._read_session(t0, t1)
+        elif self.index["kind"] == "log":
+            times, angles = self._read_log(t0, t1)
+        else:
+            times, angles = self._read_text(t0, t1)
+        keep = (times >= t0) & (times <= t1)
+        sample_rate = self.sample_rate if self._session is None else self._session.sample_rate
+        return Session(angles[keep], times[keep] + self.offset, sample_rate=sample_rate, path=self.path,
+                       offset=self.sidecar_offset)
+
+    def _span(self, t0, t1):
+        """Checkpoints [first, last) whose bytes cover [t0, t1]."""
+        times = self._checkpoint_times
+        first = max(int(np.searchsorted(times, t0, side="right")) - 1, 0)
+        last = max(int(np.searchsorted(times, t1, side="right")), first + 1)
+        return first, min(last, len(times))
+
+    def _read_bytes(self, first, last):
+        offsets = self.index["offsets"]
+        with open(self.path, "rb") as f:
+            f.seek(offsets[first])
+            return f.read(offsets[last] - offsets[first])
+
+    def _read_text(self, t0, t1):
+        if not len(self._checkpoint_times):
+            return np.empty(0), np.empty((0, 1, self.channels))
+        first, last = self._span(t0, t1)
+        values, timestamps = parse_block(self._read_bytes(first, last), self.dialect)
+        if timestamps is None:
+            timestamps = (self.index["frames"][first] + np.arange(len(values))) / self._rate()
+        return timestamps, values_to_angles(values, self.channels)
+
+    def _read_log(self, t0, t1):
+        if not len(self._checkpoint_times):
+            return np.empty(0), np.empty((0, 1, self.channels))
+        first, last = self._span(t0, t1)
+        raw = io.BytesIO(self._read_bytes(first, last))
+        n_channels = self.index["n_columns"]
+        with open(self.path, "rb") as f:
+            dtype = read_log_header(f)["dtype"]
+        parts = [decode_chunk(payload, n, n_channels, dtype) for _, n, payload in scan_chunks(raw)]
+        times = np.concatenate([p[0] for p in parts])
+        values = np.concatenate([p[2] for p in parts]).astype(np.float64)
+        return times, values_to_angles(values, self.channels)
+
+    def _read_session(self, t0, t1):
+        times = self._session.times()
+        lo = int(np.searchsorted(times, t0, side="left"))
+        hi = int(np.searchsorted(times, t1, side="right"))
+        return np.array(times[lo:hi], dtype=np.float64), np.array(self._session.angles[lo:hi])
+
+
+def open_index(path, channels=3, sample_rate=0.0, aligned=True, every=INDEX_EVERY):
+    """TimeIndex for a capture, building and storing its sidecar if needed."""
+    if is_session_file(path):
+        return TimeIndex(path, None, channels, sample_rate, aligned)
+    index = read_index(path)
+    if index is None or (index["kind"] == "text" and index["every"] != every):
+        if str(path).lower().endswith(LOG_SUFFIX):
+            index = build_log_index(path)
+        else:
+            index = build_text_index(path, every)
+        try:
+            write_index(path, index)
+        except OSError:
+            pass  # read-only data: the index just lives as long as this TimeIndex
+    return TimeIndex(path, index, channels, sample_rate, aligned)
+
+
+def read_range(path, t0, t1, channels=3, sample_rate=0.0, aligned=True):
+    """Session of only the frames of a capture between t0 and t1 (seconds, as in load_session)."""
+    return open_index(path, channels, sample_rate, aligned).read_range(t0, t1)
+
+
+def read_window(path, start, duration=None, channels=3, sample_rate=0.0, aligned=True):
+    """Session of duration seconds (None: to the end) from start seconds into the recording."""
+    index = open_index(path, channels, sample_rate, aligned)
+    t0 = index.start_time + start
+    return index.read_range(t0, index.end_time if duration is None else t0 + duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a capture's time index and read a window of it.")
+    parser.add_argument("file", help="text capture, session log or session file")
+    parser.add_argument("--start", type=float, default=0.0, help="seconds from the start of the recording")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to read")
+    parser.add_argument("--rate", type=float, default=0.0, help="sample rate of captures without timestamps")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(index_path(args.file)):
+        os.remove(index_path(args.file))
+    start = time.perf_counter()
+    index = open_index(args.file, sample_rate=args.rate)
+    opened = time.perf_counter() - start
+    print(f"{index.frames} frames over {index.end_time - index.start_time:.1f} s, "
+          f"index opened in {1000 * opened:.1f} ms")
+
+    start = time.perf_counter()
+    session = index.read_range(index.start_time + args.start, index.start_time + args.start + args.duration)
+    elapsed = time.perf_counter() - start
+    print(f"{len(session)} frames from {args.start:.1f} s read in {1000 * elapsed:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()